@@ -0,0 +1,112 @@
+# benchmarks/common.py
+import json
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Make the application modules importable, the same way the tests do
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+sys.path.insert(0, str(SRC_DIR))
+
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies_ms, wall_seconds, errors=0):
+    """Throughput and latency percentiles for a list of per-operation timings"""
+    values = sorted(latencies_ms)
+    return {
+        'ops': len(values),
+        'errors': errors,
+        'throughput': len(values) / wall_seconds if wall_seconds else 0.0,
+        'p50_ms': percentile(values, 50),
+        'p95_ms': percentile(values, 95),
+        'p99_ms': percentile(values, 99),
+        'max_ms': values[-1] if values else 0.0
+    }
+
+
+def environment(database=None):
+    env = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
+    if database:
+        env['database'] = database
+    return env
+
+
+def save_results(name, results, path=None, database=None):
+    """Write results as JSON and return the file path; database describes the server measured"""
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
+        path = RESULTS_DIR / f"{name}_{stamp}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(database), 'results': results}, f, indent=2)
+    return path
+
+
+def load_baseline(path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def baseline_environment(path):
+    """The environment block a baseline was recorded in"""
+    with open(path) as f:
+        return json.load(f).get('environment', {})
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results against a baseline.
+
+    Latency metrics regress when they grow by more than `tolerance`
+    (a fraction), throughput when it drops by more than `tolerance`.
+    Returns a list of human readable regression messages.
+    """
+    regressions = []
+    for name, current in results.items():
+        if current.get('errors'):
+            regressions.append(f"{name}: {current['errors']} failed operations")
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if metric in current and previous.get(metric):
+                limit = previous[metric] * (1 + tolerance)
+                if current[metric] > limit:
+                    regressions.append(
+                        f"{name}: {metric} {current[metric]:.2f} > {limit:.2f} (baseline {previous[metric]:.2f})"
+                    )
+        if 'throughput' in current and previous.get('throughput'):
+            limit = previous['throughput'] * (1 - tolerance)
+            if current['throughput'] < limit:
+                regressions.append(
+                    f"{name}: throughput {current['throughput']:.1f}/s < {limit:.1f}/s (baseline {previous['throughput']:.1f}/s)"
+                )
+    return regressions
+
+
+def print_table(results):
+    print(f"{'scenario':<32}{'ops':>8}{'errors':>8}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<32}{r['ops']:>8}{r.get('errors', 0):>8}{r['throughput']:>10.1f}"
+              f"{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}")
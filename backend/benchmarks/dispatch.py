@@ -0,0 +1,132 @@
+# benchmarks/dispatch.py
+"""
+Per-request dispatch overhead.
+
+Serves the same Resource (a list of in-memory tasks, no Mongo)
+three ways and times full test-client requests:
+
+    flask       plain Flask view returning the same list (the floor)
+    blueprint   the old layout: a blueprint view with @jwt_required() that
+                instantiates the Resource and calls .get(), with the restx
+                namespace also registered for Swagger
+    namespace   the current layout: restx dispatches straight to the
+                Resource, the namespace's jwt_required runs once
+
+Layouts are timed in interleaved rounds; overhead is each layout's best
+round minus the plain Flask floor.
+
+    python benchmarks/dispatch.py
+    python benchmarks/dispatch.py --docs 0 --requests 5000
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timezone
+
+from common import save_results
+
+from bson.objectid import ObjectId
+from flask import Blueprint, Flask
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required
+from flask_restx import Api, Namespace, Resource
+
+import models
+from microbench import make_task
+
+
+def build_app(layout, docs):
+    now = datetime.now(timezone.utc)
+    tasks = [make_task(n, now) for n in range(docs)]
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'dispatch-benchmark-key-of-sufficient-length'
+    JWTManager(app)
+
+    decorators = [jwt_required()] if layout == 'namespace' else []
+    ns = Namespace('tasks', decorators=decorators)
+
+    @ns.route('/')
+    class TaskList(Resource):
+        def get(self):
+            return [models.Task.from_bson(task).to_json() for task in tasks]
+
+    if layout == 'flask':
+        @app.route('/api/tasks/')
+        @jwt_required()
+        def list_tasks():
+            return [models.Task.from_bson(task).to_json() for task in tasks]
+    elif layout == 'blueprint':
+        api = Api(doc='/swagger')
+        api.add_namespace(ns)
+        api.init_app(app)
+        bp = Blueprint('tasks', __name__)
+
+        @bp.route('/', methods=['GET'])
+        @jwt_required()
+        def list_tasks():
+            return TaskList().get()
+
+        app.register_blueprint(bp, url_prefix='/api/tasks')
+    else:
+        api = Api(doc='/swagger')
+        api.add_namespace(ns, path='/api/tasks')
+        api.init_app(app)
+
+    with app.app_context():
+        token = create_access_token(identity=str(ObjectId()))
+    return app, {'Authorization': f'Bearer {token}'}
+
+
+def run_layouts(layouts, docs, requests, repeat):
+    clients = {}
+    for layout in layouts:
+        app, headers = build_app(layout, docs)
+        client = app.test_client()
+        assert client.get('/api/tasks/', headers=headers).status_code == 200
+        clients[layout] = (client, headers)
+
+    # Interleave the layouts so machine noise hits all of them alike
+    timings = {layout: [] for layout in layouts}
+    for _ in range(repeat):
+        for layout, (client, headers) in clients.items():
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get('/api/tasks/', headers=headers)
+            timings[layout].append((time.perf_counter() - start) / requests * 1e6)
+
+    results = {}
+    for layout, per_request_us in timings.items():
+        median = statistics.median(per_request_us)
+        results[layout] = {
+            'docs_per_request': docs,
+            'requests': requests * repeat,
+            'per_request_us_min': min(per_request_us),
+            'per_request_us_median': median,
+            'throughput': 1e6 / median
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure per-request routing and dispatch overhead')
+    parser.add_argument('--docs', type=int, default=1, help='Tasks returned per request')
+    parser.add_argument('--requests', type=int, default=1000, help='Requests per repeat')
+    parser.add_argument('--repeat', type=int, default=15)
+    parser.add_argument('--output', help='Result file (default: results/dispatch_<timestamp>.json)')
+    args = parser.parse_args()
+
+    results = run_layouts(('flask', 'blueprint', 'namespace'), args.docs, args.requests, args.repeat)
+    floor = results['flask']['per_request_us_min']
+    for result in results.values():
+        result['overhead_us'] = result['per_request_us_min'] - floor
+
+    print(f"{'layout':<12}{'us/req (min)':>14}{'us/req (med)':>14}{'overhead us':>13}{'req/s':>10}")
+    for layout, r in results.items():
+        print(f"{layout:<12}{r['per_request_us_min']:>14.1f}{r['per_request_us_median']:>14.1f}"
+              f"{r['overhead_us']:>13.1f}{r['throughput']:>10,.0f}")
+
+    print(f"\nResults written to {save_results('dispatch', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# benchmarks/list_responses.py
+"""
+Memory and throughput of building a large list response.
+
+Feeds the same synthetic sessions, one at a time as a cursor would, through
+the two ways a list endpoint has turned documents into a response body:
+
+    marshal   the old path: a transform to a snake_case dict, then restx
+              marshal() into OrderedDicts, then JSON
+    models    the current path: Session.from_bson(doc).to_json(), then JSON
+
+and reports time per document and the peak memory traced while the rows
+are built and once they are encoded as JSON. Also reports what holding every row costs in each form (Mongo
+document, transformed dict, marshalled OrderedDict, model instance).
+
+    python benchmarks/list_responses.py
+    python benchmarks/list_responses.py --size 100000 --repeat 3
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from common import save_results
+
+from flask_restx import marshal
+
+import models
+from microbench import make_session
+from routes.sessions import session_response_model
+
+
+def transform_session(session):
+    """The per-document transform the sessions list used before the models"""
+    return {
+        '_id': str(session['_id']),
+        'user_id': str(session['userId']),
+        'task_id': str(session['taskId']) if session.get('taskId') else None,
+        'timer_type_id': str(session['timerTypeId']) if session.get('timerTypeId') else None,
+        'status': session.get('status', ''),
+        'start_time': session.get('startTime'),
+        'end_time': session.get('endTime'),
+        'work_duration': session.get('workDuration', 0),
+        'break_duration': session.get('breakDuration', 0),
+        'active_seconds': session.get('activeSeconds', 0),
+        'paused_at': session.get('pausedAt'),
+        'created_at': session.get('createdAt'),
+        'updated_at': session.get('updatedAt'),
+        'version': session.get('version', 1)
+    }
+
+
+def cursor(size, now):
+    """Documents produced one by one, like a pymongo cursor"""
+    return (make_session(n, now) for n in range(size))
+
+
+def marshal_rows(docs):
+    return marshal([transform_session(doc) for doc in docs], session_response_model)
+
+
+def models_rows(docs):
+    return [models.Session.from_bson(doc).to_json() for doc in docs]
+
+
+PIPELINES = {'marshal': marshal_rows, 'models': models_rows}
+
+
+def run_pipeline(build, size, repeat):
+    now = datetime.now(timezone.utc)
+    # Generating the documents is part of both runs, so time it separately
+    start = time.perf_counter()
+    for _ in cursor(size, now):
+        pass
+    generate = time.perf_counter() - start
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        json.dumps(build(cursor(size, now)))
+        timings.append(max(time.perf_counter() - start - generate, 0) / size * 1e6)
+
+    # Peak while building the rows, then while encoding them as well
+    tracemalloc.start()
+    rows = build(cursor(size, now))
+    _, rows_peak = tracemalloc.get_traced_memory()
+    body = json.dumps(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(timings)
+    return {
+        'docs': size,
+        'per_doc_us_min': min(timings),
+        'per_doc_us_median': median,
+        'throughput': 1e6 / median if median else 0.0,
+        'rows_peak_mb': rows_peak / 2**20,
+        'peak_mb': peak / 2**20,
+        'body_mb': len(body) / 2**20
+    }
+
+
+def retained(size):
+    """Bytes per row of holding every row in each form; derived forms exclude the documents"""
+    now = datetime.now(timezone.utc)
+    tracemalloc.start()
+    docs = list(cursor(size, now))
+    results = {'document': tracemalloc.get_traced_memory()[0] / size}
+    tracemalloc.stop()
+
+    forms = {
+        'transformed': lambda: [transform_session(doc) for doc in docs],
+        'marshalled': lambda: marshal([transform_session(doc) for doc in docs], session_response_model),
+        'model': lambda: [models.Session.from_bson(doc) for doc in docs]
+    }
+    for name, build in forms.items():
+        tracemalloc.start()
+        rows = build()
+        results[name] = tracemalloc.get_traced_memory()[0] / size
+        tracemalloc.stop()
+        del rows
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure memory and time to build large list responses')
+    parser.add_argument('--size', type=int, default=50000, help='Sessions in the list')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Result file (default: results/list_responses_<timestamp>.json)')
+    args = parser.parse_args()
+
+    results = {name: run_pipeline(build, args.size, args.repeat) for name, build in PIPELINES.items()}
+
+    print(f"{'pipeline':<10}{'us/doc (min)':>14}{'us/doc (med)':>14}{'docs/s':>12}"
+          f"{'rows MB':>10}{'peak MB':>10}{'body MB':>10}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['per_doc_us_min']:>14.2f}{r['per_doc_us_median']:>14.2f}"
+              f"{r['throughput']:>12,.0f}{r['rows_peak_mb']:>10.1f}{r['peak_mb']:>10.1f}{r['body_mb']:>10.1f}")
+
+    per_row = retained(min(args.size, 20000))
+    print(f"\n{'form':<14}{'bytes/row':>10}")
+    for name, size in per_row.items():
+        print(f"{name:<14}{size:>10.0f}")
+    results['retained_bytes_per_row'] = per_row
+
+    print(f"\nResults written to {save_results('list_responses', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
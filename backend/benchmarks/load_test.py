@@ -0,0 +1,286 @@
+# benchmarks/load_test.py
+"""
+HTTP load-test and latency regression suite.
+
+Runs scripted scenarios against create_app() (through the Flask test client)
+backed by a local mongod, reports throughput and p50/p95/p99 latency, and
+compares the numbers against a stored baseline.
+
+    python benchmarks/load_test.py                       # all scenarios
+    python benchmarks/load_test.py --scenario list_tasks --sizes 10 1000
+    python benchmarks/load_test.py --update-baseline     # record a new baseline
+
+The target database is dropped before each run, so never point MONGO_URI at
+real data. Exits with status 1 when a scenario regresses past --tolerance.
+
+No baseline is committed: latency depends on the machine and the server, so
+record one with --update-baseline against the mongod the check runs on
+(benchmarks/baselines/load_test.json by default) before comparing. The
+baseline stores which server it measured; a run against a different one
+(another version or topology, or no real mongod at all) fails instead of
+comparing numbers that mean nothing.
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from common import (BASELINE_DIR, baseline_environment, compare, load_baseline, print_table, save_results,
+                    summarize)
+
+from bson.objectid import ObjectId
+
+DEFAULT_BASELINE = BASELINE_DIR / 'load_test.json'
+
+# Requests issued per list size; large lists are expensive to serve
+LIST_REQUESTS = {10: 200, 1000: 50, 100000: 3}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    response = fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return elapsed
+
+
+def run_pool(ops, concurrency):
+    """Run callables on a thread pool and return a latency summary"""
+    errors = []
+
+    def guarded(op):
+        try:
+            return op()
+        except Exception as e:
+            errors.append(str(e))
+            return None
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [ms for ms in pool.map(guarded, ops) if ms is not None]
+    wall = time.perf_counter() - start
+
+    if errors:
+        print(f"  {len(errors)} failed operations, first error: {errors[0]}")
+    return summarize(latencies, wall, len(errors))
+
+
+def make_user(app, db):
+    """Insert a user directly and return (user_id, auth headers)"""
+    from flask_jwt_extended import create_access_token
+
+    now = datetime.now(timezone.utc)
+    suffix = uuid.uuid4().hex[:12]
+    user_id = db.users.insert_one({
+        'email': f"load_{suffix}@example.com",
+        'password': 'not-a-real-hash',
+        'name': 'Load Test',
+        'username': f"load_{suffix}",
+        'userType': 'user',
+        'isActive': True,
+        'createdAt': now,
+        'updatedAt': now,
+        'lastLoginAt': now,
+        'version': 1
+    }).inserted_id
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+    return user_id, {'Authorization': f'Bearer {token}'}
+
+
+def describe_database(db):
+    """The server a run measures, e.g. 'mongod 7.0.14 standalone'"""
+    version = db.client.server_info().get('version', 'unknown')
+    hello = db.command('hello')
+    if hello.get('setName'):
+        topology = 'replica set'
+    elif hello.get('msg') == 'isdbgrid':
+        topology = 'sharded'
+    else:
+        topology = 'standalone'
+    return f"mongod {version} {topology}"
+
+
+def scenario_register_login(app, client, db, args):
+    def op(i):
+        def run():
+            user = {
+                'email': f"storm_{i}@example.com",
+                'password': 'storm-password',
+                'username': f"storm_{i}",
+                'name': 'Storm'
+            }
+            return (
+                timed(lambda: client.post('/api/auth/register', json=user)) +
+                timed(lambda: client.post('/api/auth/login', json={
+                    'email': user['email'], 'password': user['password']
+                }))
+            )
+        return run
+
+    return {'register_login': run_pool([op(i) for i in range(args.requests)], args.concurrency)}
+
+
+def scenario_list_tasks(app, client, db, args):
+    results = {}
+    for size in args.sizes:
+        user_id, headers = make_user(app, db)
+        now = datetime.now(timezone.utc)
+        for offset in range(0, size, 10000):
+            db.tasks.insert_many([
+                {
+                    'title': f"Task {n}",
+                    'description': f"Load test task number {n} with a realistic description",
+                    'taskType': 'todo' if n % 5 else 'distraction',
+                    'status': 'pending',
+                    'userId': user_id,
+                    'isActive': True,
+                    'createdAt': now,
+                    'updatedAt': now,
+                    'version': 1
+                }
+                for n in range(offset, min(size, offset + 10000))
+            ])
+
+        count = LIST_REQUESTS.get(size, 10)
+        ops = [lambda: timed(lambda: client.get('/api/tasks/', headers=headers))] * count
+        results[f"list_tasks_{size}"] = run_pool(ops, min(args.concurrency, count))
+    return results
+
+
+def scenario_session_loop(app, client, db, args):
+    timer_type_id = db.timerTypes.insert_one({
+        'typeName': 'Pomodoro', 'isActive': True, 'version': 1
+    }).inserted_id
+    _, headers = make_user(app, db)
+
+    def op():
+        start = time.perf_counter()
+        response = client.post('/api/sessions/', headers=headers, json={
+            'timer_type_id': str(timer_type_id),
+            'status': 'active',
+            'work_duration': 25,
+            'break_duration': 5
+        })
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+        session_id = response.json['_id']
+        timed(lambda: client.post(f'/api/sessions/{session_id}/stop', headers=headers))
+        return (time.perf_counter() - start) * 1000
+
+    return {'session_start_stop': run_pool([op] * args.requests, args.concurrency)}
+
+
+def scenario_tag_cascade(app, client, db, args):
+    user_id, headers = make_user(app, db)
+    now = datetime.now(timezone.utc)
+    task_ids = db.tasks.insert_many([
+        {
+            'title': f"Tagged {n}", 'description': '', 'taskType': 'todo', 'status': 'pending',
+            'userId': user_id, 'isActive': True, 'createdAt': now, 'updatedAt': now, 'version': 1
+        }
+        for n in range(args.cascade_tasks)
+    ]).inserted_ids
+
+    def op(i):
+        def run():
+            start = time.perf_counter()
+            response = client.post('/api/tags/', headers=headers, json={
+                'name': f"cascade-{i}", 'color': '#123456'
+            })
+            if response.status_code >= 400:
+                raise RuntimeError(f"{response.status_code}: {response.get_data(as_text=True)[:200]}")
+            tag_id = ObjectId(response.json['_id'])
+            db.taskTags.insert_many([
+                {'taskId': task_id, 'tagId': tag_id, 'createdAt': now, 'version': 1}
+                for task_id in task_ids
+            ])
+            timed(lambda: client.delete(f'/api/tags/{tag_id}', headers=headers))
+            return (time.perf_counter() - start) * 1000
+        return run
+
+    return {'tag_create_delete_cascade': run_pool([op(i) for i in range(args.requests)], args.concurrency)}
+
+
+SCENARIOS = {
+    'register_login': scenario_register_login,
+    'list_tasks': scenario_list_tasks,
+    'session_loop': scenario_session_loop,
+    'tag_cascade': scenario_tag_cascade
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run HTTP load-test scenarios against the API')
+    parser.add_argument('--scenario', choices=list(SCENARIOS) + ['all'], default='all')
+    parser.add_argument('--mongo-uri', default=os.getenv('LOAD_TEST_MONGO_URI', 'mongodb://localhost:27017/load_test_db'))
+    parser.add_argument('--requests', type=int, default=100, help='Operations per scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000],
+                        help='Task counts for the list_tasks scenario')
+    parser.add_argument('--cascade-tasks', type=int, default=100,
+                        help='Tasks attached to each tag in the tag_cascade scenario')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed fractional regression before failing')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    os.environ['MONGO_URI'] = args.mongo_uri
+    os.environ.setdefault('JWT_SECRET_KEY', 'load-test-secret-key-0123456789abcdef')
+
+    from app import create_app
+
+    # TESTING stays off so server errors come back as 500s and are counted
+    app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        db = app.mongo.db
+        database = describe_database(db)
+        db.client.drop_database(db.name)
+
+        names = list(SCENARIOS) if args.scenario == 'all' else [args.scenario]
+        results = {}
+        for name in names:
+            print(f"Running {name}...")
+            results.update(SCENARIOS[name](app, client, db, args))
+
+        db.client.drop_database(db.name)
+
+    print()
+    print_table(results)
+    print(f"\nResults written to {save_results('load_test', results, database=database)}")
+
+    if args.update_baseline:
+        save_results('load_test', results, args.baseline, database=database)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print("No baseline found; run with --update-baseline to record one.")
+        return 0
+
+    recorded_on = baseline_environment(args.baseline).get('database')
+    if recorded_on != database:
+        print(f"\nThe baseline was recorded against {recorded_on or 'an unknown server'}, "
+              f"this run against {database}; re-record it with --update-baseline.")
+        return 1
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+# benchmarks/microbench.py
+"""
+Microbenchmarks for the per-document serialization hot paths.
+
+Runs without Mongo: documents are built in memory with the same shape the
+seed scripts and routes produce. Results are written as JSON so changes can
+be compared objectively against an earlier run.
+
+    python benchmarks/microbench.py
+    python benchmarks/microbench.py --filter to_json --compare results/microbench_X.json
+"""
+import argparse
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from common import compare, load_baseline, save_results
+
+from bson.objectid import ObjectId
+
+
+def make_task(n, now):
+    return {
+        '_id': ObjectId(),
+        'title': f"Task {n}",
+        'description': f"Review Backend documentation for sprint {n}",
+        'taskType': 'todo' if n % 5 else 'distraction',
+        'status': ('pending', 'active', 'completed')[n % 3],
+        'userId': ObjectId(),
+        'isActive': True,
+        'isCompleted': n % 4 == 0,
+        'createdAt': now - timedelta(minutes=n),
+        'updatedAt': now,
+        'version': 1 + n % 3
+    }
+
+
+def make_session(n, now):
+    start = now - timedelta(hours=n % 48, minutes=n % 60)
+    session = {
+        '_id': ObjectId(),
+        'userId': ObjectId(),
+        'timerTypeId': ObjectId(),
+        'taskId': ObjectId() if n % 2 else None,
+        'startTime': start,
+        'workDuration': 25,
+        'breakDuration': 5,
+        'status': 'completed' if n % 5 else 'active',
+        'isActive': True,
+        'createdAt': start,
+        'updatedAt': now,
+        'version': 1
+    }
+    if session['status'] == 'completed':
+        session['endTime'] = start + timedelta(minutes=25)
+    return session
+
+
+def make_tag(n, now):
+    return {
+        '_id': ObjectId(),
+        'name': f"Tag {n}",
+        'color': '#FF4444',
+        'userId': ObjectId(),
+        'isActive': True,
+        'createdAt': now,
+        'updatedAt': now,
+        'version': 1
+    }
+
+
+def build_cases(size):
+    from models import Session, Tag, Task
+    from routes.users import to_camel_case
+
+    now = datetime.now(timezone.utc)
+    tasks = [make_task(n, now) for n in range(size)]
+    sessions = [make_session(n, now) for n in range(size)]
+    tags = [make_tag(n, now) for n in range(size)]
+    object_ids = [task['_id'] for task in tasks]
+    hex_ids = [str(oid) for oid in object_ids]
+    datetimes = [task['createdAt'] for task in tasks]
+
+    task_models = [Task.from_bson(task) for task in tasks]
+    session_models = [Session.from_bson(session) for session in sessions]
+    tag_models = [Tag.from_bson(tag) for tag in tags]
+
+    # Each case processes `size` documents per call
+    return {
+        'task_from_bson': lambda: [Task.from_bson(task) for task in tasks],
+        'session_from_bson': lambda: [Session.from_bson(session) for session in sessions],
+        'tag_from_bson': lambda: [Tag.from_bson(tag) for tag in tags],
+        'task_to_json': lambda: [task.to_json() for task in task_models],
+        'session_to_json': lambda: [session.to_json() for session in session_models],
+        'tag_to_json': lambda: [tag.to_json() for tag in tag_models],
+        'to_camel_case': lambda: [to_camel_case(key) for key in ('last_login_at', 'user_type', 'name') * (size // 3 + 1)],
+        'objectid_to_str': lambda: [str(oid) for oid in object_ids],
+        'str_to_objectid': lambda: [ObjectId(hex_id) for hex_id in hex_ids],
+        'datetime_isoformat': lambda: [dt.isoformat() for dt in datetimes]
+    }
+
+
+def run_case(fn, size, repeat, min_time):
+    # Pick a loop count so each repeat runs for at least min_time seconds
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / elapsed))
+
+    per_doc_us = [t / number / size * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    median = statistics.median(per_doc_us)
+    return {
+        'docs_per_call': size,
+        'loops': number,
+        'per_doc_us_min': min(per_doc_us),
+        'per_doc_us_median': median,
+        'throughput': 1e6 / median
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run serialization microbenchmarks')
+    parser.add_argument('--size', type=int, default=1000, help='Documents processed per call')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2, help='Minimum seconds per repeat')
+    parser.add_argument('--filter', default='', help='Only run cases whose name contains this')
+    parser.add_argument('--output', help='Result file (default: results/microbench_<timestamp>.json)')
+    parser.add_argument('--compare', help='Earlier result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<24}{'us/doc (min)':>14}{'us/doc (med)':>14}{'docs/s':>14}")
+    for name, fn in build_cases(args.size).items():
+        if args.filter not in name:
+            continue
+        result = run_case(fn, args.size, args.repeat, args.min_time)
+        results[name] = result
+        print(f"{name:<24}{result['per_doc_us_min']:>14.3f}{result['per_doc_us_median']:>14.3f}{result['throughput']:>14,.0f}")
+
+    print(f"\nResults written to {save_results('microbench', results, args.output)}")
+
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        if baseline is None:
+            print(f"No results found at {args.compare}")
+            return 1
+        for name, result in results.items():
+            if name in baseline:
+                change = result['per_doc_us_median'] / baseline[name]['per_doc_us_median'] - 1
+                print(f"{name:<24}{change:>+10.1%}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+# benchmarks/parquet_export.py
+"""
+Parquet analytics export against pulling sessions as JSON.
+
+Loads N sessions (100k and 1M by default) spread over 1,000 users and a
+year, then measures:
+
+    json       what an analyst's pull through the API amounts to:
+               find() -> Model.from_bson -> to_json -> json.dumps
+    parquet    analytics_export.export_collection into a temporary
+               directory, at two EXPORT_MAX_BUFFERED_ROWS settings
+    report     analytics_report.report over the exported files, against
+               json.loads of the JSON body (before any analysis)
+
+For each it reports wall time, output size and the peak of Python
+allocations traced by tracemalloc (for the export, the row buffers; Arrow
+only holds one row group at a time on top). The export's peak should
+follow the buffer setting, not the collection size.
+
+    python benchmarks/parquet_export.py
+    python benchmarks/parquet_export.py --sizes 100000 --buffers 10000 100000
+
+Needs MongoDB and requirements-analytics.txt. The target database is
+dropped before and after the run.
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from common import save_results
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, MongoClient
+
+import analytics_export
+import analytics_report
+import models
+from microbench import make_session
+
+
+def load(db, size, chunk=5000):
+    now = datetime.now(timezone.utc)
+    users = [ObjectId() for _ in range(1000)]
+    db.sessions.create_index([('updatedAt', ASCENDING)])
+    for start in range(0, size, chunk):
+        docs = []
+        for n in range(start, min(start + chunk, size)):
+            session = make_session(n, now)
+            started = now - timedelta(days=n % 365, minutes=n % 1440)
+            session.update({
+                'userId': users[n % len(users)],
+                'startTime': started,
+                'createdAt': started,
+                'activeSeconds': float(60 * (n % 50)),
+                'updatedAt': now - timedelta(minutes=5)
+            })
+            docs.append(session)
+        db.sessions.insert_many(docs, ordered=False)
+
+
+def traced(fn):
+    """(result, seconds, peak Python MB) of one call"""
+    tracemalloc.start()
+    began = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - began
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def directory_mb(path):
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file()) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the Parquet export with pulling sessions as JSON')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/parquet_export_bench')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--buffers', type=int, nargs='+', default=[20000, 100000],
+                        help='EXPORT_MAX_BUFFERED_ROWS settings to compare')
+    parser.add_argument('--output', help='Result file (default: results/parquet_export_<timestamp>.json)')
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri)
+    db = client.get_default_database()
+
+    results = {}
+    print(f"{'case':<28}{'seconds':>10}{'rows/s':>12}{'size MB':>10}{'peak MB':>10}")
+
+    def show(key, r):
+        print(f"{key:<28}{r['seconds']:>10.2f}{r['rows_per_second']:>12,.0f}{r['size_mb']:>10.1f}{r['peak_mb']:>10.1f}")
+
+    for size in args.sizes:
+        client.drop_database(db.name)
+        load(db, size)
+
+        body, seconds, peak = traced(
+            lambda: json.dumps([models.Session.from_bson(doc).to_json() for doc in db.sessions.find({'isActive': True})])
+        )
+        r = results[f"json_{size}"] = {
+            'seconds': seconds, 'rows_per_second': size / seconds,
+            'size_mb': len(body) / 2**20, 'peak_mb': peak
+        }
+        show(f"json_{size}", r)
+
+        export_dir = None
+        for buffered in args.buffers:
+            if export_dir:
+                shutil.rmtree(export_dir)
+            export_dir = tempfile.mkdtemp(prefix='parquet_export_bench_')
+            summary, seconds, peak = traced(lambda: analytics_export.export_collection(
+                db, 'sessions', export_dir, max_buffered_rows=buffered, lag_seconds=0
+            ))
+            assert summary['rows'] == size
+            key = f"parquet_{size}_buffer_{buffered}"
+            r = results[key] = {
+                'seconds': seconds, 'rows_per_second': size / seconds,
+                'size_mb': directory_mb(export_dir), 'peak_mb': peak, 'files': summary['files']
+            }
+            show(key, r)
+
+        _, seconds, peak = traced(lambda: json.loads(body))
+        r = results[f"json_parse_{size}"] = {
+            'seconds': seconds, 'rows_per_second': size / seconds, 'size_mb': len(body) / 2**20, 'peak_mb': peak
+        }
+        show(f"json_parse_{size}", r)
+        del body
+
+        _, seconds, peak = traced(lambda: analytics_report.report(export_dir))
+        r = results[f"report_{size}"] = {
+            'seconds': seconds, 'rows_per_second': size / seconds, 'size_mb': directory_mb(export_dir), 'peak_mb': peak
+        }
+        show(f"report_{size}", r)
+        shutil.rmtree(export_dir)
+
+    print(f"\nResults written to {save_results('parquet_export', results, args.output)}")
+    client.drop_database(db.name)
+
+
+if __name__ == "__main__":
+    main()
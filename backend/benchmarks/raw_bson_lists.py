@@ -0,0 +1,117 @@
+# benchmarks/raw_bson_lists.py
+"""
+Raw BSON list path against the model path.
+
+Loads one user's tasks, tags and sessions (1k, 10k and 100k of each by
+default) and builds the list response body both ways, as the routes do:
+
+    models   find() -> Model.from_bson -> to_json -> json.dumps
+    raw      $project to the response shape on the server ->
+             aggregate_raw_batches -> bson.decode_all -> json.dumps
+             (src/raw_lists.py)
+
+Reports latency per response, documents per second and the peak Python
+memory traced while one body is built. Both bodies are checked to be equal
+before timing.
+
+    python benchmarks/raw_bson_lists.py
+    python benchmarks/raw_bson_lists.py --sizes 1000 10000 --repeat 10
+
+Needs MongoDB. The target database is dropped before and after the run.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from common import save_results, summarize
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, MongoClient
+
+import models
+import raw_lists
+from microbench import make_session, make_tag, make_task
+
+COLLECTIONS = {
+    'tasks': (make_task, models.Task),
+    'tags': (make_tag, models.Tag),
+    'sessions': (make_session, models.Session)
+}
+
+
+def load(db, user_id, size, chunk=5000):
+    now = datetime.now(timezone.utc)
+    for name, (make, _) in COLLECTIONS.items():
+        db[name].create_index([('userId', ASCENDING), ('isActive', ASCENDING)])
+        for start in range(0, size, chunk):
+            db[name].insert_many(
+                [{**make(n, now), 'userId': user_id} for n in range(start, min(start + chunk, size))],
+                ordered=False
+            )
+
+
+def models_body(collection, query, model):
+    return json.dumps([model.from_bson(doc).to_json() for doc in collection.find(query)])
+
+
+def raw_body(collection, query, model):
+    return raw_lists.body(collection, query)
+
+
+PATHS = {'models': models_body, 'raw': raw_body}
+
+
+def measure(build, collection, query, model, size, repeat):
+    latencies = []
+    began = time.perf_counter()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        build(collection, query, model)
+        latencies.append((time.perf_counter() - t) * 1000)
+    result = summarize(latencies, time.perf_counter() - began)
+
+    tracemalloc.start()
+    build(collection, query, model)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result['docs_per_second'] = size * result['throughput']
+    result['peak_mb'] = peak / 2**20
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the raw BSON and model list paths')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/raw_lists_bench')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Result file (default: results/raw_bson_lists_<timestamp>.json)')
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri)
+    db = client.get_default_database()
+
+    results = {}
+    print(f"{'case':<28}{'p50 ms':>10}{'p95 ms':>10}{'docs/s':>12}{'peak MB':>10}")
+    for size in args.sizes:
+        client.drop_database(db.name)
+        user_id = ObjectId()
+        load(db, user_id, size)
+        query = {'userId': user_id, 'isActive': True}
+
+        for name, (_, model) in COLLECTIONS.items():
+            collection = db[name]
+            if json.loads(raw_body(collection, query, model)) != json.loads(models_body(collection, query, model)):
+                raise SystemExit(f"raw and model bodies differ for {name}")
+            for path, build in PATHS.items():
+                key = f"{name}_{path}_{size}"
+                r = results[key] = measure(build, collection, query, model, size, args.repeat)
+                print(f"{key:<28}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['docs_per_second']:>12,.0f}{r['peak_mb']:>10.1f}")
+
+    print(f"\nResults written to {save_results('raw_bson_lists', results, args.output)}")
+    client.drop_database(db.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/session_storage.py
+"""
+Storage size and range-scan latency of the two session layouts.
+
+Loads the same synthetic completed sessions into a plain collection (the
+documents layout, indexed on userId + startTime) and into a time-series
+collection (the timeseries layout, see src/session_store.py), then reports
+storage and index size from collStats and the latency of one-user date
+range scans against each.
+
+    python benchmarks/session_storage.py --users 2000 --days 180
+    python benchmarks/session_storage.py --window-days 7 --queries 500
+
+Needs MongoDB 5.0+. The target database is dropped before each run.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import print_table, save_results, summarize
+
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, MongoClient
+
+import session_store
+
+LAYOUTS = {'documents': 'sessions', 'timeseries': session_store.HISTORY}
+
+
+def generate_sessions(users, days, per_day, seed):
+    """Completed sessions shaped like the ones the API writes"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    timer_types = [ObjectId() for _ in range(3)]
+    for user_id in users:
+        for day in range(days):
+            for _ in range(rng.randint(max(0, per_day - 2), per_day + 2)):
+                started = start + timedelta(days=day, minutes=rng.randint(6 * 60, 23 * 60))
+                active = rng.randint(10, 90) * 60
+                yield {
+                    '_id': ObjectId(),
+                    'userId': user_id,
+                    'timerTypeId': rng.choice(timer_types),
+                    'taskId': ObjectId() if rng.random() < 0.5 else None,
+                    'startTime': started,
+                    'endTime': started + timedelta(seconds=active),
+                    'workDuration': 25,
+                    'breakDuration': 5,
+                    'status': 'completed',
+                    'activeSeconds': active,
+                    'duration': active / 60,
+                    'isActive': True,
+                    'createdAt': started,
+                    'updatedAt': started + timedelta(seconds=active),
+                    'version': 2
+                }
+
+
+def load(db, users, days, per_day, seed, chunk=5000):
+    db.sessions.create_index([('userId', ASCENDING), ('startTime', ASCENDING)])
+    session_store.ensure_history(db)
+    documents, measurements = [], []
+    count = 0
+    for session in generate_sessions(users, days, per_day, seed):
+        documents.append(session)
+        measurements.append(session_store.to_measurement(session))
+        if len(documents) == chunk:
+            db.sessions.insert_many(documents, ordered=False)
+            db[session_store.HISTORY].insert_many(measurements, ordered=False)
+            count += len(documents)
+            documents, measurements = [], []
+    if documents:
+        db.sessions.insert_many(documents, ordered=False)
+        db[session_store.HISTORY].insert_many(measurements, ordered=False)
+        count += len(documents)
+    return count
+
+
+def storage(db, collection):
+    stats = db.command('collStats', collection)
+    return {
+        'storage_bytes': stats.get('storageSize', 0),
+        'index_bytes': stats.get('totalIndexSize', 0)
+    }
+
+
+def range_scans(db, layout, users, days, window_days, queries, seed):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    user_field = 'userId' if layout == 'documents' else 'meta.userId'
+    collection = db[LAYOUTS[layout]]
+    latencies = []
+    began = time.perf_counter()
+    for _ in range(queries):
+        low = start + timedelta(days=rng.randint(0, max(0, days - window_days)))
+        query = {user_field: rng.choice(users), 'startTime': {'$gte': low, '$lt': low + timedelta(days=window_days)}}
+        t = time.perf_counter()
+        list(collection.find(query))
+        latencies.append((time.perf_counter() - t) * 1000)
+    return summarize(latencies, time.perf_counter() - began)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare session storage layouts')
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017/session_storage_bench')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=180)
+    parser.add_argument('--per-day', type=int, default=4, help='Mean sessions per user per day')
+    parser.add_argument('--window-days', type=int, default=30, help='Date range of each scan')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Result file (default: results/session_storage_<timestamp>.json)')
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_uri)
+    db = client.get_default_database()
+    client.drop_database(db.name)
+
+    users = [ObjectId() for _ in range(args.users)]
+    started = time.time()
+    count = load(db, users, args.days, args.per_day, args.seed)
+    print(f"Loaded {count} sessions into both layouts in {time.time() - started:.1f}s\n")
+
+    results = {}
+    for layout, collection in LAYOUTS.items():
+        results[f"range_scan_{layout}"] = {
+            **range_scans(db, layout, users, args.days, args.window_days, args.queries, args.seed),
+            **storage(db, collection)
+        }
+    print_table(results)
+
+    print(f"\n{'layout':<32}{'storage MB':>12}{'index MB':>12}")
+    for layout in LAYOUTS:
+        r = results[f"range_scan_{layout}"]
+        print(f"{layout:<32}{r['storage_bytes'] / 2**20:>12.1f}{r['index_bytes'] / 2**20:>12.1f}")
+    documents, timeseries = results['range_scan_documents'], results['range_scan_timeseries']
+    if timeseries['storage_bytes']:
+        print(f"\ntimeseries uses {documents['storage_bytes'] / timeseries['storage_bytes']:.1f}x less storage")
+
+    print(f"\nResults written to {save_results('session_storage', results, args.output)}")
+    client.drop_database(db.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/startup.py
+"""
+Cold-start benchmark.
+
+Starts a fresh interpreter per run, so nothing is cached between runs, and
+times each boot phase under each startup profile:
+
+    import       import app (framework, extensions, no routes yet)
+    create_app   config, extensions, route modules and URL registration
+    first        first request through the app (GET /)
+    spec         first /swagger.json (builds the spec in "on" mode)
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 20 --profile production
+
+No database is needed; the client connects lazily.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import SRC_DIR, save_results
+
+PROFILES = {
+    'development': {'APP_ENV': 'development', 'API_DOCS': 'on'},
+    'production': {'APP_ENV': 'production'},
+    'production_prebuilt': {'APP_ENV': 'production', 'API_DOCS': 'prebuilt'}
+}
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+flask_app = app.create_app()
+t2 = time.perf_counter()
+client = flask_app.test_client()
+client.get('/')
+t3 = time.perf_counter()
+status = client.get('/swagger.json').status_code
+t4 = time.perf_counter()
+print(json.dumps({
+    'import': (t1 - t0) * 1000,
+    'create_app': (t2 - t1) * 1000,
+    'first': (t3 - t2) * 1000,
+    'spec': (t4 - t3) * 1000 if status == 200 else None,
+    'routes': len(list(flask_app.url_map.iter_rules()))
+}))
+"""
+
+
+def run_once(env):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure API import and boot time')
+    parser.add_argument('--runs', type=int, default=10, help='Fresh interpreters per profile')
+    parser.add_argument('--profile', choices=list(PROFILES), action='append',
+                        help='Profiles to measure (default: all)')
+    parser.add_argument('--output', help='Result file (default: results/startup_<timestamp>.json)')
+    args = parser.parse_args()
+
+    base_env = {
+        **os.environ,
+        'MONGO_URI': os.getenv('MONGO_URI', 'mongodb://localhost:27017/startup_bench'),
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY', 'startup-benchmark-key'),
+        'JOBS_IN_PROCESS': 'false'
+    }
+
+    spec_file = os.path.join(tempfile.mkdtemp(), 'swagger.json')
+    subprocess.run(
+        [sys.executable, 'app.py', '--export-spec', spec_file],
+        cwd=SRC_DIR, env={**base_env, 'APP_ENV': 'development'}, check=True, capture_output=True
+    )
+
+    results = {}
+    for name in args.profile or PROFILES:
+        env = {**base_env, **PROFILES[name], 'API_SPEC_FILE': spec_file}
+        runs = [run_once(env) for _ in range(args.runs)]
+        results[name] = {
+            phase: statistics.median(run[phase] for run in runs) if runs[0][phase] is not None else None
+            for phase in ('import', 'create_app', 'first', 'spec')
+        }
+        results[name]['routes'] = runs[0]['routes']
+
+    print(f"{'profile':<24}{'import ms':>11}{'create ms':>11}{'first ms':>10}{'boot ms':>10}{'spec ms':>10}{'routes':>8}")
+    for name, r in results.items():
+        boot = r['import'] + r['create_app'] + r['first']
+        spec = f"{r['spec']:.1f}" if r['spec'] is not None else '-'
+        print(f"{name:<24}{r['import']:>11.1f}{r['create_app']:>11.1f}{r['first']:>10.1f}{boot:>10.1f}{spec:>10}{r['routes']:>8}")
+
+    print(f"\nResults written to {save_results('startup', results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
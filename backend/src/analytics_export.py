@@ -0,0 +1,346 @@
+# src/analytics_export.py
+"""
+Columnar analytics export.
+
+Sessions and tasks are streamed from batched cursors into typed Parquet
+files on local disk, so reports read columns straight into pandas instead
+of paging through the JSON API. Files use Hive-style partitions that
+pyarrow and pandas discover on their own:
+
+    <EXPORT_DIR>/<collection>/month=YYYY-MM/shard=NN/part-<run>[-N].parquet
+
+month comes from startTime (sessions) or createdAt (tasks); shard is
+crc32(userId) % EXPORT_SHARDS, so each user's rows stay in one shard.
+
+Runs are incremental on updatedAt. A run exports documents with
+watermark <= updatedAt < run start - EXPORT_LAG_SECONDS (writes still in
+flight near the upper edge are left for the next run). It advances the
+watermark in <collection>/_export.json only once every file is in place.
+A document updated after it was exported shows up again in a later part
+file; readers keep the newest row per _id (analytics_report.load does).
+Files are written under hidden .tmp names and renamed at the end, so a
+failed run leaves nothing readers pick up and is simply done again.
+
+Memory is bounded by EXPORT_MAX_BUFFERED_ROWS: rows are buffered per
+partition as columns, and whenever the total reaches it the largest
+buffers are written out as row groups until half of it is left. Open
+files are bounded by EXPORT_MAX_OPEN_FILES: a partition written to again
+after its file was closed to make room gets another part file (-1, -2...)
+in the same directory.
+
+Needs pyarrow (requirements-analytics.txt); the API itself does not.
+
+    python -m analytics_export run [--collection sessions]
+    python -m analytics_export status
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import json
+import os
+import zlib
+
+import session_store
+
+COLLECTIONS = ('sessions', 'tasks')
+COMPRESSION = 'zstd'
+STATE_FILE = '_export.json'
+
+# Collection -> [(column, document field, type)]; column names match the
+# API's JSON
+COLUMNS = {
+    'sessions': [
+        ('_id', '_id', 'id'),
+        ('user_id', 'userId', 'id'),
+        ('timer_type_id', 'timerTypeId', 'id'),
+        ('task_id', 'taskId', 'id'),
+        ('status', 'status', 'string'),
+        ('start_time', 'startTime', 'timestamp'),
+        ('end_time', 'endTime', 'timestamp'),
+        ('work_duration', 'workDuration', 'int32'),
+        ('break_duration', 'breakDuration', 'int32'),
+        ('active_seconds', 'activeSeconds', 'float64'),
+        ('duration', 'duration', 'float64'),
+        ('is_active', 'isActive', 'bool'),
+        ('created_at', 'createdAt', 'timestamp'),
+        ('updated_at', 'updatedAt', 'timestamp'),
+        ('version', 'version', 'int32')
+    ],
+    'tasks': [
+        ('_id', '_id', 'id'),
+        ('user_id', 'userId', 'id'),
+        ('title', 'title', 'string'),
+        ('task_type', 'taskType', 'string'),
+        ('status', 'status', 'string'),
+        ('tag_ids', 'tagIds', 'ids'),
+        ('is_active', 'isActive', 'bool'),
+        ('created_at', 'createdAt', 'timestamp'),
+        ('updated_at', 'updatedAt', 'timestamp'),
+        ('version', 'version', 'int32')
+    ]
+}
+
+# Field each collection is partitioned by month on
+MONTH_FIELD = {'sessions': 'startTime', 'tasks': 'createdAt'}
+
+
+def _arrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("The analytics export needs pyarrow: pip install -r requirements-analytics.txt")
+    return pyarrow, pyarrow.parquet
+
+
+def _schema(pa, name):
+    types = {
+        'id': pa.string(),
+        'string': pa.string(),
+        'ids': pa.list_(pa.string()),
+        'timestamp': pa.timestamp('ms', tz='UTC'),
+        'int32': pa.int32(),
+        'float64': pa.float64(),
+        'bool': pa.bool_()
+    }
+    return pa.schema([(column, types[kind]) for column, _, kind in COLUMNS[name]])
+
+
+def schema(name):
+    """Arrow schema of a collection's export"""
+    pa, _ = _arrow()
+    return _schema(pa, name)
+
+
+def _value(value, kind):
+    if value is None:
+        return [] if kind == 'ids' else None
+    if kind == 'id':
+        return str(value)
+    if kind == 'ids':
+        return [str(item) for item in value]
+    return value
+
+
+def partition(doc, name, shards):
+    """(month, shard) directory names a document's row goes in"""
+    when = doc.get(MONTH_FIELD[name]) or doc.get('createdAt') or doc['_id'].generation_time
+    shard = zlib.crc32(str(doc.get('userId', '')).encode('utf-8')) % shards
+    return f"month={when.strftime('%Y-%m')}", f"shard={shard:02d}"
+
+
+def read_state(export_dir, name):
+    path = Path(export_dir) / name / STATE_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_state(export_dir, name, state):
+    path = Path(export_dir) / name / STATE_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{STATE_FILE}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def sources(name, storage):
+    """(collection, projection, convert) for every place a collection's documents live"""
+    projection = {field: 1 for _, field, _ in COLUMNS[name]}
+    found = [(name, projection, None)]
+    if name == 'sessions' and storage == 'timeseries':
+        found.append((
+            session_store.HISTORY,
+            {**{field: 1 for field in projection if field not in session_store.META_FIELDS}, 'meta': 1},
+            session_store.from_measurement
+        ))
+    return found
+
+
+class PartitionWriter:
+    """
+    Buffers rows per partition and writes them out as Parquet row groups.
+
+    At most max_open_files ParquetWriters are open at once; the one used
+    least recently is closed to make room. Every file stays under its .tmp
+    name until commit().
+    """
+
+    def __init__(self, pa, pq, base, name, run_id, max_open_files=64):
+        self.pa = pa
+        self.pq = pq
+        self.base = base
+        self.name = name
+        self.run_id = run_id
+        self.max_open_files = max_open_files
+        self.schema = _schema(pa, name)
+        self.columns = COLUMNS[name]
+        self.buffers = {}
+        # Open writers, least recently used first
+        self.writers = OrderedDict()
+        # Every file of the run, open or closed, and how many each partition has
+        self.files = []
+        self.parts = {}
+        self.buffered = 0
+
+    def add(self, key, doc):
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = self.buffers[key] = [[] for _ in self.columns]
+        for values, (_, field, kind) in zip(buffer, self.columns):
+            values.append(_value(doc.get(field), kind))
+        self.buffered += 1
+
+    def _open(self, key):
+        while len(self.writers) >= self.max_open_files:
+            _, writer = self.writers.popitem(last=False)
+            writer.close()
+        part = self.parts.get(key, 0)
+        self.parts[key] = part + 1
+        directory = self.base.joinpath(*key)
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = f"part-{self.run_id}" if part == 0 else f"part-{self.run_id}-{part}"
+        tmp = directory / f".{stem}.parquet.tmp"
+        self.files.append(tmp)
+        writer = self.writers[key] = self.pq.ParquetWriter(tmp, self.schema, compression=COMPRESSION)
+        return writer
+
+    def _write(self, key, buffer):
+        writer = self.writers.get(key)
+        if writer is None:
+            writer = self._open(key)
+        else:
+            self.writers.move_to_end(key)
+        arrays = [
+            self.pa.array(values, type=self.schema.field(i).type)
+            for i, values in enumerate(buffer)
+        ]
+        writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        self.buffered -= len(buffer[0])
+
+    def flush(self, keep=0):
+        """
+        Write out the largest buffers until at most `keep` rows remain.
+
+        Keeping the smaller ones makes for fewer, larger row groups when
+        rows are spread over many partitions.
+        """
+        for key in sorted(self.buffers, key=lambda key: len(self.buffers[key][0]), reverse=True):
+            if self.buffered <= keep:
+                break
+            self._write(key, self.buffers.pop(key))
+
+    def close(self):
+        while self.writers:
+            self.writers.popitem()[1].close()
+
+    def commit(self):
+        """Close every file and give it its final name; returns the file count"""
+        self.flush()
+        self.close()
+        for tmp in self.files:
+            # .part-<run>[-N].parquet.tmp -> part-<run>[-N].parquet
+            os.replace(tmp, tmp.with_name(tmp.name[1:-len('.tmp')]))
+        return len(self.files)
+
+    def abort(self):
+        self.close()
+        for tmp in self.files:
+            tmp.unlink(missing_ok=True)
+
+
+def export_collection(db, name, export_dir, shards=16, storage='documents', batch_size=5000,
+                      max_buffered_rows=100000, max_open_files=64, lag_seconds=60, now=None, progress=None):
+    """Export one collection's documents updated since the last run; returns a summary"""
+    pa, pq = _arrow()
+    now = now or datetime.now(timezone.utc)
+    base = Path(export_dir) / name
+    state = read_state(export_dir, name)
+
+    upper = now - timedelta(seconds=lag_seconds)
+    query = {'updatedAt': {'$lt': upper}}
+    if state.get('watermark'):
+        query['updatedAt']['$gte'] = datetime.fromisoformat(state['watermark'])
+
+    # Leftovers of a run that died before it could clean up
+    for stale in base.glob('**/.part-*.parquet.tmp'):
+        stale.unlink()
+
+    writer = PartitionWriter(pa, pq, base, name, now.strftime('%Y%m%dT%H%M%SZ'), max_open_files)
+    rows = 0
+    try:
+        for collection, projection, convert in sources(name, storage):
+            for doc in db[collection].find(query, projection, batch_size=batch_size):
+                if convert:
+                    doc = convert(doc)
+                writer.add(partition(doc, name, shards), doc)
+                rows += 1
+                if writer.buffered >= max_buffered_rows:
+                    writer.flush(keep=max_buffered_rows // 2)
+                if progress and rows % batch_size == 0:
+                    progress(name, rows)
+        files = writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+    write_state(export_dir, name, {
+        'watermark': upper.isoformat(),
+        'last_run': now.isoformat(),
+        'rows': rows,
+        'files': files
+    })
+    return {'rows': rows, 'files': files, 'watermark': upper.isoformat()}
+
+
+def export(db, export_dir, collections=COLLECTIONS, progress=None, **options):
+    return {
+        name: export_collection(db, name, export_dir, progress=progress, **options)
+        for name in collections
+    }
+
+
+def options(config):
+    """export_collection keyword arguments from the app config"""
+    return {
+        'shards': config['EXPORT_SHARDS'],
+        'storage': config['SESSIONS_STORAGE'],
+        'batch_size': config['EXPORT_BATCH_SIZE'],
+        'max_buffered_rows': config['EXPORT_MAX_BUFFERED_ROWS'],
+        'max_open_files': config['EXPORT_MAX_OPEN_FILES'],
+        'lag_seconds': config['EXPORT_LAG_SECONDS']
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export sessions and tasks to Parquet for analysis')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='Export everything updated since the last run')
+    run_parser.add_argument('--collection', choices=COLLECTIONS, help='Only export this collection')
+    subparsers.add_parser('status', help='Show each collection\'s watermark')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    app = create_app()
+    config = app.config
+    if args.command == 'run':
+        summary = export(
+            app.mongo.db,
+            config['EXPORT_DIR'],
+            [args.collection] if args.collection else COLLECTIONS,
+            progress=lambda name, rows: print(f"{name:<10} {rows} rows", end='\r'),
+            **options(config)
+        )
+        for name, result in summary.items():
+            print(f"{name:<10} {result['rows']} rows in {result['files']} files, up to {result['watermark']}")
+    else:
+        for name in COLLECTIONS:
+            state = read_state(config['EXPORT_DIR'], name)
+            print(f"{name:<10} {state.get('watermark') or 'never exported'}")
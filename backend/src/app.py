@@ -1,19 +1,39 @@
 # src/app.py
-from flask import Flask
+from flask import Flask, request, send_file
 from flask_pymongo import PyMongo
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from flask_restx import Api
-from dotenv import load_dotenv
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from flask_restx import Api, mask, representations
+import json
 import os
 
-load_dotenv()
+import indexes
+from audit import AuditWriter
+from changefeed import ChangeFeed
+from jobs import JobRunner
+from profiling import RequestProfiler
+from read_routing import ReadRouter
+from reference_data import TimerTypeCache
+from validation import ObjectIdConverter
 
 # Initialize extensions
 mongo = PyMongo()
 jwt = JWTManager()
+profiler = RequestProfiler()
+read_router = ReadRouter()
+job_runner = JobRunner()
+audit_writer = AuditWriter()
+change_feed = ChangeFeed()
+timer_types = TimerTypeCache()
 
-# Create API with prefix to avoid conflicts
+@jwt.token_verification_loader
+def stream_tokens_only_open_streams(jwt_header, jwt_data):
+    # Stream tokens (see routes/stream.py) are good for nothing else
+    return jwt_data.get('scope') != 'stream' or request.path == '/api/stream'
+
+# Swagger security scheme shared by every namespace
 authorizations = {
     'jwt': {
         'type': 'apiKey',
@@ -23,61 +43,236 @@ authorizations = {
     }
 }
 
-api = Api(
-    title='Productivity API',
-    version='1.0',
-    description='A productivity tracking API with tasks, tags, and time sessions',
-    doc='/swagger',  # Swagger UI will be available at /swagger
-    authorizations=authorizations,
-    security='jwt'
-)
+def create_api(app):
+    """
+    Mount every namespace under /api.
+
+    Each request is dispatched once: restx routes it to the Resource, the
+    namespace's jwt_required runs once and the body is serialized once.
+    API_DOCS only decides whether the Swagger UI and the generated spec are
+    served; the routes are the same either way.
+    """
+    docs = app.config["API_DOCS"] == "on"
+    api = Api(
+        title='Productivity API',
+        version='1.0',
+        description='A productivity tracking API with tasks, tags, and time sessions',
+        doc='/swagger' if docs else False,  # Swagger UI will be available at /swagger
+        authorizations=authorizations,
+        security='jwt'
+    )
+    
+    # Import namespaces
+    from routes.auth import auth_ns
+    from routes.users import users_ns
+    from routes.tasks import tasks_ns
+    from routes.tags import tags_ns
+    from routes.sessions import sessions_ns
+    from routes.jobs import jobs_ns
+    from routes.stream import stream_ns
+    from routes.dashboard import dashboard_ns
+    from routes.sync import sync_ns
+    from routes.timer_types import timer_types_ns
+    from routes.exports import exports_ns
+    
+    for ns in (auth_ns, users_ns, tasks_ns, tags_ns, sessions_ns, jobs_ns, stream_ns, dashboard_ns, sync_ns,
+               timer_types_ns, exports_ns):
+        api.add_namespace(ns, path=f"/api/{ns.name}")
+    
+    # Most responses are built by the models rather than marshal_with, so
+    # the X-Fields mask marshal_with used to apply is applied here (raw
+    # lists apply it themselves); a malformed mask is a 400
+    @api.representation('application/json')
+    def output_json(data, code, headers=None):
+        fields_mask = request.headers.get(app.config.get('RESTX_MASK_HEADER', 'X-Fields'))
+        if fields_mask and code < 300 and isinstance(data, (dict, list)):
+            data = mask.apply(data, fields_mask)
+        return representations.output_json(data, code, headers)
+    
+    # restx would turn token errors into 500s; hand them back to
+    # flask-jwt-extended's app-level handlers (401/422)
+    @api.errorhandler(JWTExtendedException)
+    @api.errorhandler(PyJWTError)
+    def handle_auth_error(error):
+        raise error
+    
+    api.init_app(app, add_specs=docs)
+    return api
 
 def create_app():
+    # Production gets its environment from the container, so .env parsing
+    # (and the python-dotenv import) is skipped there
+    production = os.getenv("APP_ENV", "development") == "production"
+    if not production:
+        from dotenv import load_dotenv
+        load_dotenv()
+    
     app = Flask(__name__)
     
     # Configuration
+    app.config["APP_ENV"] = "production" if production else "development"
+    # Swagger docs: "on" serves the UI and builds the spec on first request,
+    # "prebuilt" only serves API_SPEC_FILE at /swagger.json, "off" serves neither
+    app.config["API_DOCS"] = os.getenv("API_DOCS", "off" if production else "on")
+    app.config["API_SPEC_FILE"] = os.path.abspath(os.getenv("API_SPEC_FILE", "swagger.json"))
     app.config["MONGO_URI"] = os.getenv("MONGO_URI")
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY")
     
+    # On-demand request profiling (admin-only, triggered per request by header)
+    app.config["PROFILING_ENABLED"] = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    app.config["PROFILING_DIR"] = os.getenv("PROFILING_DIR", "profiles")
+    app.config["PROFILING_SAMPLE_INTERVAL"] = float(os.getenv("PROFILING_SAMPLE_INTERVAL", "0.001"))
+    
+    # Create the indexes routes depend on at startup (see indexes.py);
+    # database/init.py creates the rest
+    app.config["ENSURE_INDEXES"] = os.getenv("ENSURE_INDEXES", "true").lower() == "true"
+    
+    # Read routing: list/analytics reads may go to secondaries (needs a
+    # replica set), auth reads stay on the primary
+    app.config["READ_ROUTING_ENABLED"] = os.getenv("READ_ROUTING_ENABLED", "false").lower() == "true"
+    app.config["READ_MAX_STALENESS"] = int(os.getenv("READ_MAX_STALENESS", "90"))
+    app.config["READ_TOKEN_CACHE_SIZE"] = int(os.getenv("READ_TOKEN_CACHE_SIZE", "10000"))
+    
+    # Tag-name suggestion tries kept in memory (least recently used users
+    # are dropped first)
+    app.config["TAG_INDEX_CACHE_SIZE"] = int(os.getenv("TAG_INDEX_CACHE_SIZE", "1000"))
+    
+    # List endpoints build their JSON from raw BSON batches the server has
+    # already reshaped (see raw_lists.py); off uses the model path. Opt-in
+    # until test_raw_lists_match_models has passed against a real mongod
+    app.config["LISTS_RAW_BSON"] = os.getenv("LISTS_RAW_BSON", "false").lower() == "true"
+    
+    # Background jobs (run in this process unless a separate worker is used)
+    app.config["JOBS_IN_PROCESS"] = os.getenv("JOBS_IN_PROCESS", "true").lower() == "true"
+    app.config["JOBS_WORKERS"] = int(os.getenv("JOBS_WORKERS", "2"))
+    app.config["JOBS_POLL_INTERVAL"] = float(os.getenv("JOBS_POLL_INTERVAL", "1"))
+    app.config["JOBS_LEASE_SECONDS"] = int(os.getenv("JOBS_LEASE_SECONDS", "60"))
+    app.config["JOBS_BACKOFF_SECONDS"] = int(os.getenv("JOBS_BACKOFF_SECONDS", "5"))
+    
+    # Audit log, written in batches off the request path
+    app.config["AUDIT_ENABLED"] = os.getenv("AUDIT_ENABLED", "true").lower() == "true"
+    app.config["AUDIT_QUEUE_SIZE"] = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    app.config["AUDIT_BATCH_SIZE"] = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+    app.config["AUDIT_FLUSH_INTERVAL"] = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1"))
+    # w=0 skips acknowledgements: cheaper, but failed writes go unnoticed
+    app.config["AUDIT_WRITE_CONCERN"] = int(os.getenv("AUDIT_WRITE_CONCERN", "1"))
+    # The flusher logs the queue counters this often (0: only when entries
+    # are dropped)
+    app.config["AUDIT_STATS_INTERVAL"] = float(os.getenv("AUDIT_STATS_INTERVAL", "300"))
+    
+    # Session storage: "documents" or "timeseries" (completed sessions are
+    # moved to a time-series collection SESSIONS_ARCHIVE_AFTER seconds after
+    # they stop)
+    app.config["SESSIONS_STORAGE"] = os.getenv("SESSIONS_STORAGE", "documents")
+    app.config["SESSIONS_ARCHIVE_AFTER"] = int(os.getenv("SESSIONS_ARCHIVE_AFTER", "3600"))
+    
+    # Delta sync: changes this close to a client's cursor are sent again, so
+    # writes in flight or stamped by a skewed clock are not missed; cursors
+    # older than the tombstone lifetime get a full snapshot
+    app.config["SYNC_OVERLAP_SECONDS"] = int(os.getenv("SYNC_OVERLAP_SECONDS", "60"))
+    app.config["SYNC_TOMBSTONE_DAYS"] = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+    
+    # Reference data (timer types) is cached in each process: changes are
+    # picked up within REFERENCE_CHECK_SECONDS and everything is reloaded
+    # after REFERENCE_TTL_SECONDS; production loads it at startup. An
+    # unknown timer type id triggers an early check at most once every
+    # REFERENCE_FORCED_CHECK_SECONDS
+    app.config["REFERENCE_PRELOAD"] = os.getenv("REFERENCE_PRELOAD", "true" if production else "false").lower() == "true"
+    app.config["REFERENCE_CHECK_SECONDS"] = float(os.getenv("REFERENCE_CHECK_SECONDS", "30"))
+    app.config["REFERENCE_TTL_SECONDS"] = float(os.getenv("REFERENCE_TTL_SECONDS", "3600"))
+    app.config["REFERENCE_FORCED_CHECK_SECONDS"] = float(os.getenv("REFERENCE_FORCED_CHECK_SECONDS", "1"))
+    app.config["REFERENCE_MAX_AGE"] = int(os.getenv("REFERENCE_MAX_AGE", "86400"))
+    
+    # Retention: expired documents are archived to gzipped NDJSON, then deleted
+    app.config["RETENTION_ARCHIVE_DIR"] = os.getenv("RETENTION_ARCHIVE_DIR", "archive")
+    app.config["RETENTION_POLICIES"] = json.loads(os.getenv("RETENTION_POLICIES", "{}"))
+    app.config["RETENTION_BATCH_SIZE"] = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+    app.config["RETENTION_MAX_RATE"] = float(os.getenv("RETENTION_MAX_RATE", "500"))
+    
+    # Analytics export: Parquet files partitioned by month and user shard
+    # (see analytics_export.py); the job buffers at most
+    # EXPORT_MAX_BUFFERED_ROWS rows, keeps at most EXPORT_MAX_OPEN_FILES
+    # files open and leaves the last EXPORT_LAG_SECONDS of writes for the
+    # next run
+    app.config["EXPORT_DIR"] = os.getenv("EXPORT_DIR", "exports")
+    app.config["EXPORT_SHARDS"] = int(os.getenv("EXPORT_SHARDS", "16"))
+    app.config["EXPORT_BATCH_SIZE"] = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+    app.config["EXPORT_MAX_BUFFERED_ROWS"] = int(os.getenv("EXPORT_MAX_BUFFERED_ROWS", "100000"))
+    app.config["EXPORT_MAX_OPEN_FILES"] = int(os.getenv("EXPORT_MAX_OPEN_FILES", "64"))
+    app.config["EXPORT_LAG_SECONDS"] = int(os.getenv("EXPORT_LAG_SECONDS", "60"))
+    
+    # Server-Sent Events change stream (auto uses change streams when the
+    # server supports them and polling otherwise); production serves it from
+    # stream_server.py
+    app.config["STREAM_MODE"] = os.getenv("STREAM_MODE", "auto")
+    app.config["STREAM_POLL_INTERVAL"] = float(os.getenv("STREAM_POLL_INTERVAL", "2"))
+    app.config["STREAM_KEEPALIVE_SECONDS"] = float(os.getenv("STREAM_KEEPALIVE_SECONDS", "15"))
+    app.config["STREAM_MAX_SECONDS"] = float(os.getenv("STREAM_MAX_SECONDS", "300"))
+    app.config["STREAM_MAX_CONNECTIONS"] = int(os.getenv("STREAM_MAX_CONNECTIONS", "200"))
+    app.config["STREAM_QUEUE_SIZE"] = int(os.getenv("STREAM_QUEUE_SIZE", "500"))
+    # Lifetime of the stream-only cookie set by POST /api/stream/token
+    app.config["STREAM_TOKEN_SECONDS"] = int(os.getenv("STREAM_TOKEN_SECONDS", "900"))
+    
     # Initialize CORS and extensions
     CORS(app)
+    # Profiler and read router register Mongo command listeners, so they
+    # must precede mongo
+    profiler.init_app(app)
+    read_router.init_app(app)
     mongo.init_app(app)
     jwt.init_app(app)
+    job_runner.init_app(app)
+    audit_writer.init_app(app)
+    change_feed.init_app(app)
     
     # Add this line to attach mongo to app
     app.mongo = mongo
+    app.audit = audit_writer
+    app.change_feed = change_feed
+    app.reads = read_router
+    app.timer_types = timer_types
+    # Both go through app.mongo, so they come after the assignments above
+    timer_types.init_app(app)
+    if app.config["ENSURE_INDEXES"]:
+        indexes.init_app(app)
     
-    # Import namespaces
-    from routes.auth import auth_bp, auth_ns
-    from routes.users import users_bp, users_ns
-    from routes.tasks import tasks_bp, tasks_ns
-    from routes.tags import tags_bp, tags_ns
-    from routes.sessions import sessions_bp, sessions_ns
-    
-    # Add namespaces to API
-    api.add_namespace(auth_ns)
-    api.add_namespace(users_ns)
-    api.add_namespace(tasks_ns)
-    api.add_namespace(tags_ns)
-    api.add_namespace(sessions_ns)
-    
-    # Initialize API
-    api.init_app(app)
-    
-    # Register blueprints
-    app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(users_bp, url_prefix='/api/users')
-    app.register_blueprint(tasks_bp, url_prefix='/api/tasks')
-    app.register_blueprint(tags_bp, url_prefix='/api/tags')
-    app.register_blueprint(sessions_bp, url_prefix='/api/sessions')
-    
-    # Root endpoint using standard Flask route
+    # Root endpoint using standard Flask route (before the API, which
+    # also claims "/")
     @app.route("/")
     def hello_world():
         return "<p>Hello, World! The API documentation is available at <a href='/swagger'>Swagger UI</a></p>"
     
+    # <objectid:...> path segments; must be registered before the routes
+    app.url_map.converters['objectid'] = ObjectIdConverter
+    app.api = create_api(app)
+    
+    if app.config["API_DOCS"] == "prebuilt":
+        @app.route("/swagger.json")
+        def swagger_spec():
+            return send_file(app.config["API_SPEC_FILE"], mimetype='application/json')
+    
     return app
 
+def export_spec(path):
+    """Write the Swagger spec to a file for API_DOCS=prebuilt"""
+    os.environ["API_DOCS"] = "on"
+    app = create_app()
+    with app.test_request_context():
+        spec = app.api.__schema__
+    with open(path, 'w') as f:
+        json.dump(spec, f, indent=2)
+    return path
+
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Run the API server')
+    parser.add_argument('--export-spec', metavar='PATH', help='Write the Swagger spec to PATH and exit')
+    args = parser.parse_args()
+    if args.export_spec:
+        print(f"Wrote {export_spec(args.export_spec)}")
+        raise SystemExit
+    
     app = create_app()
-    app.run(host="0.0.0.0", port=int(os.getenv("FLASK_PORT", 5000)))
\ No newline at end of file
+    # Threaded so open event streams do not block other requests
+    app.run(host="0.0.0.0", port=int(os.getenv("FLASK_PORT", 5000)), threaded=True)
\ No newline at end of file
@@ -0,0 +1,189 @@
+# src/audit.py
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask import has_request_context, request
+from pymongo.write_concern import WriteConcern
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """
+    Buffered, asynchronous writer for the auditLogs collection.
+
+    Routes call record(), which only puts the entry on a bounded in-memory
+    queue. A flusher thread drains the queue into insert_many batches when
+    AUDIT_BATCH_SIZE entries are waiting or AUDIT_FLUSH_INTERVAL seconds
+    have passed, with AUDIT_WRITE_CONCERN (w=1 by default, so flush() only
+    returns once the server has acknowledged the entries). When the queue is
+    full new entries are dropped rather than slowing down requests. stats()
+    exposes the counters needed to spot that, and the flusher logs them
+    whenever entries were dropped since its last report, and otherwise every
+    AUDIT_STATS_INTERVAL seconds.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flush_requested = threading.Event()
+        self._stats = {'enqueued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0, 'max_depth': 0}
+        self._reported_dropped = 0
+        self._reported_at = time.monotonic()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        # One queue per writer: a second app in the same process (tests)
+        # shares the queue the flusher is already draining rather than
+        # replacing it under the flusher
+        if self._queue is None:
+            self._queue = queue.Queue(maxsize=app.config['AUDIT_QUEUE_SIZE'])
+            atexit.register(self.close)
+
+    def record(self, action, entity_type, entity_id, user_id, old_value=None, new_value=None):
+        if not self.app.config['AUDIT_ENABLED']:
+            return
+        entry = {
+            'userId': user_id,
+            'action': action,
+            'entityType': entity_type,
+            'entityId': entity_id,
+            'oldValue': old_value,
+            'newValue': new_value,
+            'createdAt': datetime.now(timezone.utc)
+        }
+        if has_request_context():
+            entry['ipAddress'] = request.headers.get('X-Forwarded-For', request.remote_addr)
+            entry['userAgent'] = request.headers.get('User-Agent', '')
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            # Reported by the flusher (see _report), not on the request path
+            with self._lock:
+                self._stats['dropped'] += 1
+            return
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats['enqueued'] += 1
+            if depth > self._stats['max_depth']:
+                self._stats['max_depth'] = depth
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        return {**stats, 'depth': self._queue.qsize() if self._queue else 0}
+
+    def flush(self, timeout=5):
+        """
+        Ask the flusher to write everything queued so far and wait until each
+        entry's insert has returned (acknowledged unless AUDIT_WRITE_CONCERN
+        is 0). Returns False if that took longer than `timeout` seconds.
+        """
+        if self._thread is None:
+            self._drain()
+            return True
+        self._flush_requested.set()
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        """Stop the flusher and write any remaining entries"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+        self._drain()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='audit-flusher')
+                self._thread.start()
+
+    def _run(self):
+        batch_size = self.app.config['AUDIT_BATCH_SIZE']
+        interval = self.app.config['AUDIT_FLUSH_INTERVAL']
+        while not self._stop.is_set():
+            batch = []
+            deadline = time.monotonic() + interval
+            while len(batch) < batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._flush_requested.is_set():
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.1)))
+                except queue.Empty:
+                    continue
+            # Pick up whatever else is already waiting, up to the batch size
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._flush_requested.clear()
+            self._write(batch)
+            self._report()
+
+    def _report(self):
+        """Log the counters if entries were dropped since the last report or the interval has passed"""
+        stats = self.stats()
+        interval = self.app.config['AUDIT_STATS_INTERVAL']
+        now = time.monotonic()
+        if stats['dropped'] > self._reported_dropped:
+            logger.warning("Audit queue full, %s entries dropped since the last report: %s",
+                           stats['dropped'] - self._reported_dropped, stats)
+        elif interval and now - self._reported_at >= interval:
+            logger.info("Audit writer: %s", stats)
+        else:
+            return
+        self._reported_dropped = stats['dropped']
+        self._reported_at = now
+
+    def _drain(self):
+        batch_size = self.app.config['AUDIT_BATCH_SIZE'] if self.app else 500
+        while True:
+            batch = []
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except (queue.Empty, AttributeError):
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            collection = self.app.mongo.db.auditLogs.with_options(
+                write_concern=WriteConcern(w=self.app.config['AUDIT_WRITE_CONCERN'])
+            )
+            collection.insert_many(batch, ordered=False)
+            with self._lock:
+                self._stats['written'] += len(batch)
+                self._stats['batches'] += 1
+        except Exception:
+            with self._lock:
+                self._stats['failed'] += len(batch)
+            logger.exception("Failed to write %s audit entries", len(batch))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
@@ -0,0 +1,279 @@
+# src/autotag.py
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+import task_tags
+
+logger = logging.getLogger(__name__)
+
+# Compiled matchers are cached per user; local rule changes invalidate
+# immediately, other worker processes pick changes up after the TTL.
+CACHE_TTL_SECONDS = 60
+
+# Regex rules run synchronously when a task is created, so patterns are kept
+# short and free of the constructs that backtrack exponentially.
+MAX_PATTERN_LENGTH = 200
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT, getattr(sre_parse, 'POSSESSIVE_REPEAT', None)}
+_GLOBAL_FLAGS = re.compile(r'\(\?([aiLmsux]+)\)')
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over casefolded keywords.
+
+    search() walks the text once and reports every keyword that occurs,
+    including keywords that overlap or contain one another ("meet" and
+    "meeting"), however many keywords there are.
+    """
+
+    def __init__(self, keywords):
+        # Trie transitions, failure links and the values reported per state
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [set()]
+        for keyword, values in keywords:
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                state = next_state
+            self._out[state].update(values)
+
+        # Breadth first, so each failure target is finished before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] |= self._out[self._fail[child]]
+
+    def search(self, text):
+        """Return the values of every keyword occurring in `text`"""
+        found = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+
+class RuleMatcher:
+    """
+    A user's tag rules, ready to test against task text.
+
+    Keyword rules are matched case-insensitively by one KeywordAutomaton.
+    Regex rules are combined into two patterns compiled with re.IGNORECASE:
+    an alternation of lookaheads that finds the positions where any rule
+    matches, and a pattern that captures, at one such position, every rule
+    matching there. Every matching rule applies, overlapping ones included.
+    Stored regex rules that no longer pass validate_pattern are skipped.
+    """
+
+    def __init__(self, rules):
+        keywords = []
+        regexes = []
+        for rule in rules:
+            tag_ids = frozenset(rule['tagIds'])
+            if not rule.get('isRegex'):
+                keywords.append((rule['pattern'].casefold(), tag_ids))
+            elif validate_pattern(rule['pattern'], True) is None:
+                regexes.append((_embeddable(rule['pattern']), tag_ids))
+            else:
+                logger.warning("Skipping tag rule with unsafe pattern %r", rule['pattern'])
+
+        self.keywords = KeywordAutomaton(keywords) if keywords else None
+        self.regex_tag_ids = [tag_ids for _, tag_ids in regexes]
+        if regexes:
+            patterns = [pattern for pattern, _ in regexes]
+            self.any_regex = re.compile('|'.join(f'(?={pattern})' for pattern in patterns), re.IGNORECASE)
+            self.each_regex = re.compile(
+                ''.join(f'(?=(?P<r{index}>{pattern}))?' for index, pattern in enumerate(patterns)),
+                re.IGNORECASE
+            )
+
+    def match(self, text):
+        """Return the set of tag ids whose rules match `text`"""
+        tag_ids = set()
+        if not text:
+            return tag_ids
+        if self.keywords:
+            tag_ids |= self.keywords.search(text.casefold())
+        if self.regex_tag_ids:
+            matched = set()
+            for hit in self.any_regex.finditer(text):
+                groups = self.each_regex.match(text, hit.start()).groupdict()
+                matched.update(name for name, value in groups.items() if value is not None)
+                if len(matched) == len(self.regex_tag_ids):
+                    break
+            for name in matched:
+                tag_ids |= self.regex_tag_ids[int(name[1:])]
+        return tag_ids
+
+
+def _embeddable(pattern):
+    """Rewrite leading global flags, (?i)..., as a scoped group that can be combined"""
+    flags = ''
+    match = _GLOBAL_FLAGS.match(pattern)
+    while match:
+        flags += match.group(1)
+        pattern = pattern[match.end():]
+        match = _GLOBAL_FLAGS.match(pattern)
+    flags = flags.replace('u', '')
+    if 'x' in flags:
+        # A trailing comment would otherwise swallow the closing parenthesis
+        pattern += '\n'
+    return f'(?{flags}:{pattern})' if flags else f'(?:{pattern})'
+
+
+def _unsafe_construct(items, repeated=False):
+    """Return why a parsed pattern may backtrack badly, else None"""
+    for op, value in items:
+        if op in _REPEATS:
+            low, high, sub = value
+            if high > 1 and repeated:
+                return 'nested quantifiers are not allowed'
+            error = _unsafe_construct(sub, repeated or high > 1)
+        elif op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            return 'backreferences are not allowed'
+        elif op == sre_parse.SUBPATTERN:
+            error = _unsafe_construct(value[-1], repeated)
+        elif op == sre_parse.BRANCH:
+            error = next(filter(None, (_unsafe_construct(sub, repeated) for sub in value[1])), None)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            error = _unsafe_construct(value[1], repeated)
+        elif op == getattr(sre_parse, 'ATOMIC_GROUP', None):
+            error = _unsafe_construct(value, repeated)
+        else:
+            continue
+        if error:
+            return error
+    return None
+
+
+def validate_pattern(pattern, is_regex):
+    """Return an error message for an unusable rule pattern, else None"""
+    if not pattern or not pattern.strip():
+        return 'Rule pattern is required'
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        return f"Rule pattern is limited to {MAX_PATTERN_LENGTH} characters"
+    if is_regex:
+        # Compiled exactly as RuleMatcher compiles it
+        try:
+            re.compile(pattern, re.IGNORECASE)
+            parsed = sre_parse.parse(pattern, re.IGNORECASE)
+        except re.error as e:
+            return f"Invalid regular expression: {e}"
+        if parsed.state.groupdict:
+            # Rules are combined into one pattern, where names would collide
+            return 'Invalid regular expression: named groups are not allowed'
+        error = _unsafe_construct(parsed)
+        if error:
+            return f"Invalid regular expression: {error}"
+    return None
+
+
+def get_matcher(db, user_id):
+    """Return the cached RuleMatcher for a user, compiling it if needed"""
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(user_id)
+        if cached and now - cached[0] < CACHE_TTL_SECONDS:
+            return cached[1]
+
+    rules = list(db.tagRules.find(
+        {'userId': user_id, 'isActive': True},
+        {'pattern': 1, 'isRegex': 1, 'tagIds': 1}
+    ).sort('createdAt', 1))
+    matcher = RuleMatcher(rules)
+
+    with _cache_lock:
+        _cache[user_id] = (now, matcher)
+    return matcher
+
+
+def invalidate(user_id):
+    with _cache_lock:
+        _cache.pop(user_id, None)
+
+
+def task_text(task):
+    return f"{task.get('title', '')}\n{task.get('description', '')}"
+
+
+def match_task(db, user_id, task):
+    """Return the sorted tag ids whose rules match a task"""
+    return sorted(get_matcher(db, user_id).match(task_text(task)))
+
+
+def retro_tag(db, user_id, batch_size=1000, progress=None):
+    """
+    Apply the user's rules to all of their existing active tasks.
+
+    Tasks are streamed from a cursor and the resulting taskTags upserts are
+    written with bulk_write in batches, so memory stays bounded.
+    progress(scanned, total) is called every batch_size tasks and at the end.
+    Returns the number of tasks scanned and tag links created.
+    """
+    matcher = get_matcher(db, user_id)
+    now = datetime.now(timezone.utc)
+    scanned = created = 0
+    link_ops, task_ops = [], []
+
+    def flush():
+        if not link_ops:
+            return 0
+        upserted = db.taskTags.bulk_write(link_ops, ordered=False).upserted_count
+        # Keep the denormalized tagIds arrays in step with taskTags
+        if task_ops:
+            db.tasks.bulk_write(task_ops, ordered=False)
+        link_ops.clear()
+        task_ops.clear()
+        return upserted
+
+    query = {'userId': user_id, 'isActive': True}
+    total = db.tasks.count_documents(query) if progress else 0
+    cursor = db.tasks.find(query, {'title': 1, 'description': 1, 'tagIds': 1}).batch_size(batch_size)
+
+    for task in cursor:
+        scanned += 1
+        if progress and scanned % batch_size == 0:
+            progress(scanned, total)
+        tag_ids = sorted(matcher.match(task_text(task)))
+        if not tag_ids:
+            continue
+        link_ops.extend(task_tags.link_operations(task['_id'], tag_ids, now))
+        if not set(tag_ids) <= set(task.get('tagIds', [])):
+            task_ops.append(task_tags.task_operation(task['_id'], tag_ids, now))
+        if len(link_ops) >= batch_size:
+            created += flush()
+
+    created += flush()
+    if progress:
+        progress(scanned, total)
+    return {'tasks_scanned': scanned, 'tags_created': created}
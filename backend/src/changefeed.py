@@ -0,0 +1,272 @@
+# src/changefeed.py
+"""
+Per-user change events for tasks, tags and sessions.
+
+One watcher thread per process reads a MongoDB change stream over the
+watched collections and hands each event to the queues of the connected
+clients it belongs to, so an open stream costs a queue rather than its
+own cursor. Standalone mongod has no change streams; there the watcher
+falls back to polling updatedAt for the users that are connected.
+
+Every event carries an id that clients send back as Last-Event-ID when
+they reconnect. replay() returns what happened since that id: change
+stream ids are resume tokens, polling ids are `p:<updatedAt ms>:<_id>`.
+Polling ids are unique, so replay() resends the whole millisecond of the
+last id (writes can land in it after the client's last event) and clients
+drop the events they already have.
+"""
+import logging
+import queue
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+WATCHED = ('tasks', 'tags', 'sessions')
+ENTITIES = {'tasks': 'task', 'tags': 'tag', 'sessions': 'session'}
+
+# Sent to a subscriber whose queue filled up; the stream closes and the
+# client reconnects with its last id
+OVERFLOW = object()
+
+
+def classify(collection, operation, doc, updated_fields=None):
+    """Name the event for a changed document, e.g. task.completed"""
+    entity = ENTITIES[collection]
+    if operation == 'insert':
+        return 'session.started' if entity == 'session' else f'{entity}.created'
+    if doc.get('isActive') is False:
+        return f'{entity}.deleted'
+    status_changed = updated_fields is None or 'status' in updated_fields
+    if status_changed and doc.get('status') == 'completed':
+        return 'session.stopped' if entity == 'session' else f'{entity}.completed'
+    return f'{entity}.updated'
+
+
+def poll_id(updated_at, doc_id):
+    # Zero-padded milliseconds, then the document id, so ids are unique and
+    # compare in time order as strings
+    return f"p:{int(updated_at.replace(tzinfo=timezone.utc).timestamp() * 1000):015d}:{doc_id}"
+
+
+def parse_poll_id(event_id):
+    """updatedAt of a polling id (ids without the document id are accepted)"""
+    return datetime.fromtimestamp(int(event_id[2:].split(':')[0]) / 1000, tz=timezone.utc)
+
+
+class Subscription:
+    def __init__(self, user_id, size):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=size)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Make room for the overflow marker so the reader notices
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(OVERFLOW)
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class ChangeFeed:
+    def __init__(self, app=None):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.mode = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+
+    def connections(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def subscribe(self, user_id, limit=None):
+        """
+        Register a subscriber for a user's events; returns None when `limit`
+        connections are already open (checked under the same lock as the add)
+        """
+        sub = Subscription(user_id, self.app.config['STREAM_QUEUE_SIZE'])
+        with self._lock:
+            if limit is not None and sum(len(subs) for subs in self._subscribers.values()) >= limit:
+                return None
+            self._subscribers[user_id].add(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='change-feed')
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def stop(self):
+        self._stop.set()
+
+    def _publish(self, user_id, event):
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        for sub in subs:
+            sub.put(event)
+
+    def _run(self):
+        mode = self.app.config['STREAM_MODE']
+        if mode in ('auto', 'changestream'):
+            try:
+                self.mode = 'changestream'
+                self._watch()
+                return
+            except (OperationFailure, NotImplementedError) as e:
+                if mode == 'changestream':
+                    raise
+                logger.info("Change streams unavailable (%s), polling instead", e)
+        self.mode = 'poll'
+        self._poll()
+
+    # Change streams
+
+    def _open_stream(self, db, user_id=None, resume_after=None):
+        match = {
+            'ns.coll': {'$in': list(WATCHED)},
+            'operationType': {'$in': ['insert', 'update', 'replace']}
+        }
+        if user_id is not None:
+            match['fullDocument.userId'] = user_id
+        return db.watch(
+            [{'$match': match}],
+            full_document='updateLookup',
+            resume_after=resume_after,
+            max_await_time_ms=1000
+        )
+
+    def _stream_event(self, change):
+        doc = change.get('fullDocument')
+        if not doc or 'userId' not in doc:
+            return None
+        collection = change['ns']['coll']
+        updated = change.get('updateDescription', {}).get('updatedFields')
+        return {
+            'id': f"c:{change['_id']['_data']}",
+            'type': classify(collection, change['operationType'], doc, updated),
+            'collection': collection,
+            'doc': doc
+        }
+
+    def _watch(self):
+        db = self.app.mongo.db
+        resume_token = None
+        while not self._stop.is_set():
+            try:
+                with self._open_stream(db, resume_after=resume_token) as stream:
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = stream.resume_token
+                        event = self._stream_event(change)
+                        if event is not None:
+                            self._publish(event['doc']['userId'], event)
+            except OperationFailure:
+                if resume_token is None:
+                    raise
+                logger.exception("Change stream failed, resuming")
+                self._stop.wait(1)
+            except PyMongoError:
+                logger.exception("Change stream error, resuming")
+                self._stop.wait(1)
+
+    # Polling fallback
+
+    def _poll_events(self, db, user_ids, since):
+        events = []
+        for collection in WATCHED:
+            docs = db[collection].find({'userId': {'$in': user_ids}, 'updatedAt': {'$gte': since}})
+            for doc in docs:
+                operation = 'insert' if doc.get('createdAt') == doc['updatedAt'] else 'update'
+                events.append({
+                    'id': poll_id(doc['updatedAt'], doc['_id']),
+                    'key': (collection, doc['_id'], doc['updatedAt']),
+                    'type': classify(collection, operation, doc),
+                    'collection': collection,
+                    'doc': doc
+                })
+        events.sort(key=lambda event: event['id'])
+        return events
+
+    def _poll(self):
+        interval = self.app.config['STREAM_POLL_INTERVAL']
+        since = datetime.now(timezone.utc)
+        # Documents already sent whose updatedAt equals `since`; the next
+        # poll uses $gte so writes in the same millisecond are not missed
+        seen = set()
+        while not self._stop.wait(interval):
+            with self._lock:
+                user_ids = list(self._subscribers)
+            if not user_ids:
+                since, seen = datetime.now(timezone.utc), set()
+                continue
+            try:
+                events = self._poll_events(self.app.mongo.db, user_ids, since)
+            except PyMongoError:
+                logger.exception("Change feed poll failed")
+                continue
+            events = [event for event in events if event['key'] not in seen]
+            for event in events:
+                self._publish(event['doc']['userId'], event)
+            if events:
+                latest = events[-1]['doc']['updatedAt'].replace(tzinfo=timezone.utc)
+                if latest > since:
+                    since, seen = latest, set()
+                seen.update(event['key'] for event in events if parse_poll_id(event['id']) == since)
+
+    # Reconnects
+
+    def replay(self, user_id, last_event_id, limit=1000):
+        """
+        Events for a user after last_event_id, oldest first. Returns None if
+        the id can no longer be resumed and the client should refetch.
+        """
+        db = self.app.mongo.db
+        if last_event_id.startswith('p:'):
+            # The last id's own millisecond is sent again, apart from the
+            # last event itself
+            since = parse_poll_id(last_event_id)
+            events = self._poll_events(db, [user_id], since)
+            return [event for event in events if event['id'] != last_event_id][:limit]
+
+        if last_event_id.startswith('c:'):
+            events = []
+            try:
+                with self._open_stream(db, user_id, resume_after={'_data': last_event_id[2:]}) as stream:
+                    # try_next returns None once the stream has caught up
+                    while len(events) < limit:
+                        change = stream.try_next()
+                        if change is None:
+                            break
+                        event = self._stream_event(change)
+                        if event is not None:
+                            events.append(event)
+            except (OperationFailure, NotImplementedError):
+                return None
+            return events
+        return None
@@ -0,0 +1,40 @@
+# src/indexes.py
+"""
+Indexes the API cannot work correctly without.
+
+database/init.py creates every index; the ones here are also created when
+the app starts, so a database that was never initialized still keeps
+usernames and emails unique and can serve task search. create_index is a
+no-op when the index already exists.
+"""
+import logging
+
+from pymongo import ASCENDING, TEXT
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+TASK_TEXT_INDEX = 'task_text_search'
+
+
+def ensure_indexes(db):
+    """Create the required indexes; raises PyMongoError if one cannot be built"""
+    # Registration and profile updates rely on these to reject duplicates
+    db.users.create_index([('username', ASCENDING)], unique=True)
+    db.users.create_index([('email', ASCENDING)], unique=True)
+    db.tasks.create_index(
+        [('title', TEXT), ('description', TEXT)],
+        weights={'title': 3, 'description': 1},
+        name=TASK_TEXT_INDEX
+    )
+
+
+def init_app(app):
+    """Create the required indexes at startup, logging rather than failing if the database refuses"""
+    try:
+        ensure_indexes(app.mongo.db)
+    except PyMongoError:
+        # An unreachable server, or duplicates stored before the unique
+        # indexes; the routes still check for duplicates and report a
+        # missing text index
+        logger.exception("Could not create required indexes")
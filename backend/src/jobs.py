@@ -0,0 +1,294 @@
+# src/jobs.py
+"""
+Background jobs.
+
+Jobs are documents in the jobs collection. Any number of worker threads,
+in the API process or in a separate `python -m jobs` process, claim them
+with an atomic find_one_and_update and hold a lease while they run, so a
+crashed worker's job is picked up again once the lease expires, until it
+has used maxAttempts. Failed jobs are retried with exponential backoff;
+handlers must be idempotent because a job can run more than once.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+import analytics_export
+import autotag
+import session_store
+import task_tags
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def job_handler(job_type):
+    """Register a function(db, payload, job) as the handler for a job type"""
+    def register(fn):
+        HANDLERS[job_type] = fn
+        return fn
+    return register
+
+
+def enqueue(db, job_type, payload, user_id=None, max_attempts=5, run_at=None):
+    """Queue a job and return its id"""
+    if job_type not in HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+    now = datetime.now(timezone.utc)
+    return db.jobs.insert_one({
+        'type': job_type,
+        'payload': payload,
+        'userId': user_id,
+        'status': 'queued',
+        'progress': 0,
+        'attempts': 0,
+        'maxAttempts': max_attempts,
+        'runAt': run_at or now,
+        'createdAt': now,
+        'updatedAt': now,
+        'version': 1
+    }).inserted_id
+
+
+def percent(done, total):
+    """Progress for Job.report; totals counted up front can be overtaken"""
+    return min(100 * done // max(total, 1), 100)
+
+
+class Job:
+    """Handle passed to handlers for progress reporting"""
+
+    def __init__(self, db, doc, lease_seconds):
+        self.db = db
+        self.doc = doc
+        self.id = doc['_id']
+        self.lease_seconds = lease_seconds
+
+    def report(self, progress, **details):
+        """Record progress (0-100) and extend the lease"""
+        now = datetime.now(timezone.utc)
+        self.db.jobs.update_one(
+            {'_id': self.id, 'lockedBy': self.doc['lockedBy']},
+            {'$set': {
+                'progress': progress,
+                'details': details,
+                'lockedUntil': now + timedelta(seconds=self.lease_seconds),
+                'updatedAt': now
+            }}
+        )
+
+
+def fail_exhausted(db, now):
+    """Mark jobs whose worker died on their last attempt as failed"""
+    return db.jobs.update_many(
+        {
+            'status': 'running',
+            'lockedUntil': {'$lt': now},
+            '$expr': {'$gte': ['$attempts', '$maxAttempts']}
+        },
+        {
+            '$set': {'status': 'failed', 'error': 'Lease expired on the last attempt', 'finishedAt': now, 'updatedAt': now},
+            '$unset': {'lockedBy': '', 'lockedUntil': ''},
+            '$inc': {'version': 1}
+        }
+    ).modified_count
+
+
+def claim(db, worker_id, lease_seconds):
+    """Atomically claim the next runnable job, or return None"""
+    now = datetime.now(timezone.utc)
+    fail_exhausted(db, now)
+    return db.jobs.find_one_and_update(
+        {
+            '$or': [
+                {'status': 'queued', 'runAt': {'$lte': now}},
+                # Jobs whose worker died mid-run, while they have attempts left
+                {
+                    'status': 'running',
+                    'lockedUntil': {'$lt': now},
+                    '$expr': {'$lt': ['$attempts', '$maxAttempts']}
+                }
+            ]
+        },
+        {
+            '$set': {
+                'status': 'running',
+                'lockedBy': worker_id,
+                'lockedUntil': now + timedelta(seconds=lease_seconds),
+                'startedAt': now,
+                'updatedAt': now
+            },
+            '$inc': {'attempts': 1, 'version': 1}
+        },
+        sort=[('runAt', 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def execute(db, doc, lease_seconds=60, backoff_seconds=5):
+    """Run a claimed job and record the outcome"""
+    job = Job(db, doc, lease_seconds)
+    owned = {'_id': doc['_id'], 'lockedBy': doc['lockedBy']}
+    try:
+        result = HANDLERS[doc['type']](db, doc['payload'], job)
+    except Exception as e:
+        now = datetime.now(timezone.utc)
+        logger.warning("Job %s (%s) failed on attempt %s: %s", doc['_id'], doc['type'], doc['attempts'], e)
+        if doc['attempts'] < doc['maxAttempts']:
+            update = {
+                'status': 'queued',
+                'runAt': now + timedelta(seconds=backoff_seconds * 2 ** (doc['attempts'] - 1)),
+            }
+        else:
+            update = {'status': 'failed', 'finishedAt': now}
+        update.update({'error': str(e), 'trace': traceback.format_exc(limit=5), 'updatedAt': now})
+        db.jobs.update_one(owned, {'$set': update, '$unset': {'lockedBy': '', 'lockedUntil': ''}})
+        return False
+
+    now = datetime.now(timezone.utc)
+    db.jobs.update_one(owned, {
+        '$set': {'status': 'succeeded', 'progress': 100, 'result': result, 'finishedAt': now, 'updatedAt': now},
+        '$unset': {'lockedBy': '', 'lockedUntil': '', 'error': ''}
+    })
+    return True
+
+
+def run_pending(db, worker_id='inline'):
+    """Run every currently runnable job in the calling thread; returns the count"""
+    count = 0
+    while True:
+        doc = claim(db, worker_id, 60)
+        if doc is None:
+            return count
+        execute(db, doc)
+        count += 1
+
+
+class JobRunner:
+    """Pool of worker threads polling the jobs collection"""
+
+    def __init__(self, app=None):
+        self._threads = []
+        self._stop = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get('JOBS_IN_PROCESS'):
+            # Start on the first request rather than here so pre-fork servers
+            # start workers in each child, and tests can keep jobs inline
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._started or self.app.config.get('TESTING'):
+            return
+        self.start()
+
+    def start(self, workers=None):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            count = workers or self.app.config['JOBS_WORKERS']
+            prefix = f"{socket.gethostname()}:{os.getpid()}"
+            for n in range(count):
+                thread = threading.Thread(target=self._work, args=(f"{prefix}:{n}",), daemon=True, name=f"job-worker-{n}")
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self, worker_id):
+        config = self.app.config
+        while not self._stop.is_set():
+            try:
+                db = self.app.mongo.db
+                doc = claim(db, worker_id, config['JOBS_LEASE_SECONDS'])
+                if doc is None:
+                    self._stop.wait(config['JOBS_POLL_INTERVAL'])
+                    continue
+                execute(db, doc, config['JOBS_LEASE_SECONDS'], config['JOBS_BACKOFF_SECONDS'])
+            except Exception:
+                logger.exception("Job worker %s error", worker_id)
+                self._stop.wait(config['JOBS_POLL_INTERVAL'])
+
+
+# Handlers
+
+@job_handler('tag_cascade')
+def tag_cascade(db, payload, job):
+    """Detach a deleted tag from every task"""
+    def progress(done, total):
+        job.report(percent(done, total), links=done)
+    detached = task_tags.detach_everywhere(
+        db, ObjectId(payload['user_id']), ObjectId(payload['tag_id']), progress=progress
+    )
+    return {'tag_id': payload['tag_id'], 'detached': detached}
+
+
+@job_handler('retro_tag')
+def retro_tag(db, payload, job):
+    """Apply a user's tagging rules to all of their existing tasks"""
+    def progress(scanned, total):
+        job.report(percent(scanned, total), tasks_scanned=scanned)
+    return autotag.retro_tag(db, ObjectId(payload['user_id']), progress=progress)
+
+
+@job_handler('archive_sessions')
+def archive_sessions(db, payload, job):
+    """Move a user's completed sessions into the time-series history"""
+    def progress(moved, total):
+        job.report(percent(moved, total), moved=moved)
+    moved = session_store.archive_completed(
+        db, ObjectId(payload['user_id']), timedelta(seconds=payload.get('older_than', 0)), progress=progress
+    )
+    return {'moved': moved}
+
+
+@job_handler('analytics_export')
+def export_analytics(db, payload, job):
+    """Export sessions and tasks updated since the last run to Parquet (admin-only)"""
+    collections = payload.get('collections') or analytics_export.COLLECTIONS
+    summary = {}
+    for index, name in enumerate(collections):
+        def progress(name, rows, index=index):
+            job.report(100 * index // len(collections), collection=name, rows=rows)
+        summary[name] = analytics_export.export_collection(
+            db, name, payload['export_dir'], progress=progress, **payload['options']
+        )
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run background job workers')
+    parser.add_argument('--workers', type=int, help='Worker threads (default JOBS_WORKERS)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(threadName)s %(message)s')
+
+    from app import create_app, job_runner
+
+    app = create_app()
+    job_runner.start(args.workers)
+    print(f"Job workers running ({args.workers or app.config['JOBS_WORKERS']}), Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        job_runner.stop(timeout=10)
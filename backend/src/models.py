@@ -0,0 +1,309 @@
+# src/models.py
+"""
+Domain models for the documents the API serves.
+
+Each model is a slotted dataclass: no per-instance __dict__, so a row
+costs one small object instead of the several dicts (Mongo document,
+transformed dict, marshalled OrderedDict) a list response used to build.
+There is one conversion in each direction:
+
+    Model.from_bson(doc)   Mongo document (camelCase) -> model
+    model.to_bson()        model -> Mongo document, for inserts
+    model.to_json()        model -> JSON-ready response dict (snake_case,
+                           string ids, ISO 8601 timestamps)
+
+to_json produces exactly what the restx response models describe; those
+models are kept for the Swagger docs only.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from bson.objectid import ObjectId
+
+
+def _id(value):
+    return str(value) if value is not None else None
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _without_none(doc):
+    return {key: value for key, value in doc.items() if value is not None}
+
+
+@dataclass(slots=True)
+class Task:
+    user_id: ObjectId
+    title: str
+    task_type: str = ''
+    description: str = ''
+    status: str = 'pending'
+    tag_ids: list = field(default_factory=list)
+    is_active: bool = True
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: int = 1
+    id: Optional[ObjectId] = None
+
+    @classmethod
+    def from_bson(cls, doc):
+        return cls(
+            doc['userId'], doc['title'], doc.get('taskType', ''), doc.get('description', ''),
+            doc.get('status', 'pending'), doc.get('tagIds', []), doc.get('isActive', True),
+            doc.get('createdAt'), doc.get('updatedAt'), doc.get('version', 1), doc.get('_id')
+        )
+
+    def to_bson(self):
+        return _without_none({
+            '_id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'taskType': self.task_type,
+            'status': self.status,
+            'tagIds': self.tag_ids,
+            'userId': self.user_id,
+            'isActive': self.is_active,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
+            'version': self.version
+        })
+
+    def to_json(self):
+        return {
+            '_id': _id(self.id),
+            'title': self.title,
+            'description': self.description,
+            'status': self.status,
+            'task_type': self.task_type,
+            'tag_ids': [str(tag_id) for tag_id in self.tag_ids],
+            'user_id': _id(self.user_id),
+            'is_active': self.is_active,
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+            'version': self.version
+        }
+
+
+@dataclass(slots=True)
+class Tag:
+    user_id: ObjectId
+    name: str
+    color: str
+    is_active: bool = True
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: int = 1
+    id: Optional[ObjectId] = None
+
+    @classmethod
+    def from_bson(cls, doc):
+        return cls(
+            doc['userId'], doc['name'], doc['color'], doc.get('isActive', True),
+            doc.get('createdAt'), doc.get('updatedAt'), doc.get('version', 1), doc.get('_id')
+        )
+
+    def to_bson(self):
+        return _without_none({
+            '_id': self.id,
+            'name': self.name,
+            'color': self.color,
+            'userId': self.user_id,
+            'isActive': self.is_active,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
+            'version': self.version
+        })
+
+    def to_json(self):
+        return {
+            '_id': _id(self.id),
+            'name': self.name,
+            'color': self.color,
+            'user_id': _id(self.user_id),
+            'is_active': self.is_active,
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+            'version': self.version
+        }
+
+
+@dataclass(slots=True)
+class Session:
+    user_id: ObjectId
+    timer_type_id: Optional[ObjectId] = None
+    task_id: Optional[ObjectId] = None
+    status: str = ''
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    work_duration: int = 0
+    break_duration: int = 0
+    active_seconds: float = 0
+    paused_at: Optional[datetime] = None
+    segment_start: Optional[datetime] = None
+    is_active: bool = True
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: int = 1
+    id: Optional[ObjectId] = None
+
+    @classmethod
+    def from_bson(cls, doc):
+        return cls(
+            doc['userId'], doc.get('timerTypeId'), doc.get('taskId'), doc.get('status', ''),
+            doc.get('startTime'), doc.get('endTime'), doc.get('workDuration', 0), doc.get('breakDuration', 0),
+            doc.get('activeSeconds', 0), doc.get('pausedAt'), doc.get('segmentStart'), doc.get('isActive', True),
+            doc.get('createdAt'), doc.get('updatedAt'), doc.get('version', 1), doc.get('_id')
+        )
+
+    def to_bson(self):
+        doc = _without_none({
+            '_id': self.id,
+            'userId': self.user_id,
+            'timerTypeId': self.timer_type_id,
+            'status': self.status,
+            'startTime': self.start_time,
+            'endTime': self.end_time,
+            'workDuration': self.work_duration,
+            'breakDuration': self.break_duration,
+            'activeSeconds': self.active_seconds,
+            'pausedAt': self.paused_at,
+            'segmentStart': self.segment_start,
+            'isActive': self.is_active,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
+            'version': self.version
+        })
+        # Sessions store an explicit null when they have no task
+        doc['taskId'] = self.task_id
+        return doc
+
+    def to_json(self):
+        return {
+            '_id': _id(self.id),
+            'user_id': _id(self.user_id),
+            'task_id': _id(self.task_id),
+            'timer_type_id': _id(self.timer_type_id),
+            'status': self.status,
+            'start_time': _iso(self.start_time),
+            'end_time': _iso(self.end_time),
+            'work_duration': self.work_duration,
+            'break_duration': self.break_duration,
+            'active_seconds': float(self.active_seconds),
+            'paused_at': _iso(self.paused_at),
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+            'version': self.version
+        }
+
+
+@dataclass(slots=True)
+class User:
+    email: str
+    username: str
+    password: Optional[str] = None
+    name: str = ''
+    user_type: str = 'user'
+    is_active: bool = True
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    last_login_at: Optional[datetime] = None
+    version: int = 1
+    id: Optional[ObjectId] = None
+
+    @classmethod
+    def from_bson(cls, doc):
+        return cls(
+            doc['email'], doc['username'], doc.get('password'), doc.get('name', ''),
+            doc.get('userType', 'user'), doc.get('isActive', True), doc.get('createdAt'),
+            doc.get('updatedAt'), doc.get('lastLoginAt'), doc.get('version', 1), doc.get('_id')
+        )
+
+    def to_bson(self):
+        return _without_none({
+            '_id': self.id,
+            'email': self.email,
+            'password': self.password,
+            'name': self.name,
+            'username': self.username,
+            'userType': self.user_type,
+            'isActive': self.is_active,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
+            'lastLoginAt': self.last_login_at,
+            'version': self.version
+        })
+
+    def to_json(self):
+        # Never includes the password hash
+        return {
+            '_id': _id(self.id),
+            'email': self.email,
+            'username': self.username,
+            'name': self.name,
+            'user_type': self.user_type,
+            'is_active': self.is_active,
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+            'last_login_at': _iso(self.last_login_at),
+            'version': self.version
+        }
+
+
+@dataclass(slots=True)
+class TimerType:
+    type_name: str
+    description: str = ''
+    work_duration: Optional[int] = None
+    break_duration: Optional[int] = None
+    is_active: bool = True
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: int = 1
+    id: Optional[ObjectId] = None
+
+    @classmethod
+    def from_bson(cls, doc):
+        return cls(
+            doc['typeName'], doc.get('description', ''), doc.get('workDuration'), doc.get('breakDuration'),
+            doc.get('isActive', True),
+            doc.get('createdAt'), doc.get('updatedAt'), doc.get('version', 1), doc.get('_id')
+        )
+
+    def to_bson(self):
+        return _without_none({
+            '_id': self.id,
+            'typeName': self.type_name,
+            'description': self.description,
+            'workDuration': self.work_duration,
+            'breakDuration': self.break_duration,
+            'isActive': self.is_active,
+            'createdAt': self.created_at,
+            'updatedAt': self.updated_at,
+            'version': self.version
+        })
+
+    def to_json(self):
+        return {
+            '_id': _id(self.id),
+            'type_name': self.type_name,
+            'description': self.description,
+            'work_duration': self.work_duration,
+            'break_duration': self.break_duration,
+            'is_active': self.is_active,
+            'created_at': _iso(self.created_at),
+            'updated_at': _iso(self.updated_at),
+            'version': self.version
+        }
+
+
+# Collection name -> model, for code that handles documents generically
+MODELS = {
+    'tasks': Task,
+    'tags': Tag,
+    'sessions': Session,
+    'users': User,
+    'timerTypes': TimerType
+}
@@ -0,0 +1,173 @@
+# src/profiling.py
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from bson.objectid import ObjectId
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from pymongo import monitoring
+
+PROFILE_HEADER = 'X-Profile-Request'
+
+# Mongo time breakdown for the request currently being profiled on this thread
+_active = threading.local()
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Accumulate Mongo command timings for profiled requests only"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        breakdown = getattr(_active, 'mongo', None)
+        if breakdown is None:
+            return
+        key = event.command_name
+        if event.database_name:
+            key = f"{event.database_name}.{key}"
+        entry = breakdown[key]
+        entry['count'] += 1
+        entry['ms'] += event.duration_micros / 1000
+
+
+# pymongo listeners are global, so one timer serves every app in the process
+_timer = MongoCommandTimer()
+_timer_registered = False
+_register_lock = threading.Lock()
+
+
+def register_timer():
+    """Register the command timer with pymongo, once per process"""
+    global _timer_registered
+    with _register_lock:
+        if not _timer_registered:
+            monitoring.register(_timer)
+            _timer_registered = True
+
+
+class StackSampler:
+    """Sample the call stack of one thread into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.items())
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request profiling.
+
+    Nothing is registered unless PROFILING_ENABLED is set, so normal requests
+    pay no cost. When enabled, an admin can send the X-Profile-Request header
+    to have that single request sampled and its profile written to PROFILING_DIR.
+    """
+
+    def init_app(self, app):
+        if not app.config.get('PROFILING_ENABLED'):
+            return
+
+        os.makedirs(app.config['PROFILING_DIR'], exist_ok=True)
+        register_timer()
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._cleanup)
+
+    def _is_admin(self):
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+        if not user_id:
+            return False
+        user = current_app.mongo.db.users.find_one(
+            {'_id': ObjectId(user_id), 'isActive': True},
+            {'userType': 1}
+        )
+        return bool(user) and user.get('userType') == 'admin'
+
+    def _start(self):
+        if not request.headers.get(PROFILE_HEADER):
+            return
+        try:
+            if not self._is_admin():
+                return
+        except Exception:
+            return
+
+        _active.mongo = defaultdict(lambda: {'count': 0, 'ms': 0.0})
+        sampler = StackSampler(
+            threading.get_ident(),
+            current_app.config['PROFILING_SAMPLE_INTERVAL']
+        )
+        g.profile = {'sampler': sampler, 'started': time.perf_counter()}
+        sampler.start()
+
+    def _finish(self, response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+
+        elapsed_ms = (time.perf_counter() - profile['started']) * 1000
+        profile['sampler'].stop()
+        mongo = dict(getattr(_active, 'mongo', {}))
+        _active.mongo = None
+
+        profile_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        profile_dir = current_app.config['PROFILING_DIR']
+        with open(os.path.join(profile_dir, f"{profile_id}.collapsed"), 'w') as f:
+            f.write(profile['sampler'].collapsed())
+        with open(os.path.join(profile_dir, f"{profile_id}.json"), 'w') as f:
+            json.dump({
+                'method': request.method,
+                'path': request.full_path,
+                'status': response.status_code,
+                'elapsedMs': elapsed_ms,
+                'mongoMs': sum(entry['ms'] for entry in mongo.values()),
+                'mongo': mongo
+            }, f, indent=2)
+
+        response.headers['X-Profile-Id'] = profile_id
+        response.headers['X-Profile-Elapsed-Ms'] = f"{elapsed_ms:.2f}"
+        return response
+
+    def _cleanup(self, exc):
+        # after_request is skipped on unhandled errors, so stop the sampler here
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile['sampler'].stop()
+        _active.mongo = None
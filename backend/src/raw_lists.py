@@ -0,0 +1,111 @@
+# src/raw_lists.py
+"""
+Raw BSON fast path for the list endpoints (tasks, tags, sessions).
+
+The usual path decodes every document into a dict of ObjectIds and
+datetimes, builds a model from it, builds the response dict from the model
+and only then encodes JSON. Here the server does the reshaping instead: a
+$project stage renames the fields to the response keys, turns ids into hex
+strings and dates into ISO 8601 strings and fills in defaults, exactly as
+Model.to_json would. The results are read as raw BSON batches
+(aggregate_raw_batches), and each batch goes through bson.decode_all and
+json.dumps, both in C, so at most one batch of plain dicts exists at a time.
+An X-Fields mask is applied to each batch, as restx would for the model
+path.
+
+Used when LISTS_RAW_BSON is on (off by default). test_raw_lists_match_models
+checks both paths give the same JSON and needs a real mongod; mongomock
+has neither $dateToString formats nor aggregate_raw_batches.
+"""
+import json
+
+import bson
+from flask import current_app, request
+from flask_restx import mask
+
+
+def _id(field):
+    return {'$toString': field}
+
+
+def _iso(field):
+    # The client is not tz_aware, so to_json prints naive UTC datetimes, and
+    # isoformat() leaves out the fraction when it is zero
+    return {'$cond': [
+        {'$eq': [{'$millisecond': field}, 0]},
+        {'$dateToString': {'date': field, 'format': '%Y-%m-%dT%H:%M:%S'}},
+        {'$dateToString': {'date': field, 'format': '%Y-%m-%dT%H:%M:%S.%L000'}}
+    ]}
+
+
+def _default(field, value):
+    return {'$ifNull': [field, value]}
+
+
+# Collection name -> $project producing the model's to_json shape
+PROJECTIONS = {
+    'tasks': {
+        '_id': _id('$_id'),
+        'title': '$title',
+        'description': _default('$description', ''),
+        'status': _default('$status', 'pending'),
+        'task_type': _default('$taskType', ''),
+        'tag_ids': {'$map': {'input': _default('$tagIds', []), 'in': _id('$$this')}},
+        'user_id': _id('$userId'),
+        'is_active': _default('$isActive', True),
+        'created_at': _iso('$createdAt'),
+        'updated_at': _iso('$updatedAt'),
+        'version': _default('$version', 1)
+    },
+    'tags': {
+        '_id': _id('$_id'),
+        'name': '$name',
+        'color': '$color',
+        'user_id': _id('$userId'),
+        'is_active': _default('$isActive', True),
+        'created_at': _iso('$createdAt'),
+        'updated_at': _iso('$updatedAt'),
+        'version': _default('$version', 1)
+    },
+    'sessions': {
+        '_id': _id('$_id'),
+        'user_id': _id('$userId'),
+        'task_id': _id('$taskId'),
+        'timer_type_id': _id('$timerTypeId'),
+        'status': _default('$status', ''),
+        'start_time': _iso('$startTime'),
+        'end_time': _iso('$endTime'),
+        'work_duration': _default('$workDuration', 0),
+        'break_duration': _default('$breakDuration', 0),
+        'active_seconds': {'$toDouble': _default('$activeSeconds', 0)},
+        'paused_at': _iso('$pausedAt'),
+        'created_at': _iso('$createdAt'),
+        'updated_at': _iso('$updatedAt'),
+        'version': _default('$version', 1)
+    }
+}
+
+
+def body(collection, query, session=None, fields_mask=None):
+    """JSON array of the documents matching query, in the to_json shape, optionally masked"""
+    pipeline = [{'$match': query}, {'$project': PROJECTIONS[collection.name]}]
+    if fields_mask:
+        # Parsed up front so a malformed mask fails before any query runs
+        fields_mask = mask.Mask(fields_mask)
+    chunks = []
+    for batch in collection.aggregate_raw_batches(pipeline, session=session):
+        docs = bson.decode_all(batch)
+        if fields_mask:
+            docs = fields_mask.apply(docs)
+        if docs:
+            chunks.append(json.dumps(docs)[1:-1])
+    return '[' + ', '.join(chunks) + ']'
+
+
+def response(collection, query, session=None):
+    """The list response, bypassing restx's own encoding"""
+    fields_mask = request.headers.get(current_app.config.get('RESTX_MASK_HEADER', 'X-Fields'))
+    return current_app.response_class(
+        body(collection, query, session, fields_mask) + '\n',
+        mimetype='application/json'
+    )
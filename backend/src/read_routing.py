@@ -0,0 +1,184 @@
+# src/read_routing.py
+import threading
+from collections import OrderedDict
+
+from bson.timestamp import Timestamp
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt_identity
+from pymongo import monitoring
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+READ_AFTER_HEADER = 'X-Read-After'
+
+WRITE_COMMANDS = {'insert', 'update', 'delete', 'findAndModify'}
+
+# Latest write operationTime seen on this thread during the current request
+_writes = threading.local()
+
+
+class WriteTimeListener(monitoring.CommandListener):
+    """Remember the operationTime of each successful write made by a request"""
+
+    def started(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name not in WRITE_COMMANDS:
+            return
+        op_time = event.reply.get('operationTime')
+        if op_time is not None and (getattr(_writes, 'op_time', None) is None or op_time > _writes.op_time):
+            _writes.op_time = op_time
+
+
+# pymongo listeners are global, so one listener serves every app in the process
+_listener = WriteTimeListener()
+_listener_registered = False
+_register_lock = threading.Lock()
+
+
+def register_listener():
+    """Register the write time listener with pymongo, once per process"""
+    global _listener_registered
+    with _register_lock:
+        if not _listener_registered:
+            monitoring.register(_listener)
+            _listener_registered = True
+
+
+def format_token(op_time):
+    return f"{op_time.time}.{op_time.inc}"
+
+
+def parse_token(token):
+    try:
+        seconds, inc = token.split('.')
+        return Timestamp(int(seconds), int(inc))
+    except (AttributeError, ValueError):
+        return None
+
+
+class ReadRouter:
+    """
+    Per-route read preferences with read-your-writes.
+
+    Routes ask for a database by workload: db('auth') and db('sync') always
+    read the primary (a lagging secondary could hide other devices' writes
+    from behind a new sync cursor), db('lists') and db('analytics') may
+    read a secondary that is at most READ_MAX_STALENESS seconds behind. Writes go through the client
+    as usual; a command listener records the operationTime of the request's
+    writes and returns it as the X-Read-After token (also kept per user in
+    this process). Routed reads run in a causally consistent session
+    advanced to that token, so a secondary waits until it has the user's
+    own writes before answering.
+
+    With READ_ROUTING_ENABLED off (standalone mongod) db() is the primary
+    database and session() is None, which every pymongo call accepts.
+    """
+
+    def __init__(self, app=None):
+        self._databases = {}
+        self._last_write = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if not app.config.get('READ_ROUTING_ENABLED'):
+            return
+        # Listeners must be registered before the Mongo client is created
+        register_listener()
+        app.before_request(self._reset)
+        app.after_request(self._issue_token)
+        app.teardown_request(self._end_session)
+
+    @property
+    def enabled(self):
+        return self.app.config.get('READ_ROUTING_ENABLED', False)
+
+    def preferences(self):
+        staleness = self.app.config['READ_MAX_STALENESS']
+        return {
+            'auth': Primary(),
+            'sync': Primary(),
+            'lists': SecondaryPreferred(max_staleness=staleness),
+            'analytics': SecondaryPreferred(max_staleness=staleness)
+        }
+
+    def db(self, workload='lists'):
+        """Database handle whose reads follow the workload's read preference"""
+        db = self.app.mongo.db
+        if not self.enabled:
+            return db
+        if workload not in self._databases:
+            self._databases[workload] = db.client.get_database(
+                db.name, read_preference=self.preferences()[workload]
+            )
+        return self._databases[workload]
+
+    def session(self):
+        """Causally consistent session for this request's routed reads"""
+        if not self.enabled:
+            return None
+        session = g.get('read_session')
+        if session is None:
+            session = g.read_session = self.start_session()
+        return session
+
+    def start_session(self):
+        """
+        A new session at the same read-after point as session(), for reads
+        the request runs on other threads (a session must not be used by two
+        threads at once). Call it on the request thread; the caller ends it.
+        """
+        if not self.enabled:
+            return None
+        session = self.app.mongo.db.client.start_session(causal_consistency=True)
+        op_time = self._read_after()
+        if op_time is not None:
+            session.advance_operation_time(op_time)
+        return session
+
+    def _user_id(self):
+        try:
+            return get_jwt_identity()
+        except Exception:
+            return None
+
+    def _read_after(self):
+        tokens = [parse_token(request.headers.get(READ_AFTER_HEADER))]
+        user_id = self._user_id()
+        if user_id:
+            with self._lock:
+                tokens.append(self._last_write.get(user_id))
+        tokens = [token for token in tokens if token is not None]
+        return max(tokens) if tokens else None
+
+    def _reset(self):
+        _writes.op_time = None
+
+    def _issue_token(self, response):
+        op_time = getattr(_writes, 'op_time', None)
+        _writes.op_time = None
+        if op_time is None:
+            return response
+
+        user_id = self._user_id()
+        if user_id:
+            with self._lock:
+                self._last_write[user_id] = op_time
+                self._last_write.move_to_end(user_id)
+                while len(self._last_write) > current_app.config['READ_TOKEN_CACHE_SIZE']:
+                    self._last_write.popitem(last=False)
+
+        response.headers[READ_AFTER_HEADER] = format_token(op_time)
+        response.headers.add('Access-Control-Expose-Headers', READ_AFTER_HEADER)
+        return response
+
+    def _end_session(self, exc):
+        session = g.pop('read_session', None)
+        if session is not None:
+            session.end_session()
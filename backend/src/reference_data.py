@@ -0,0 +1,132 @@
+# src/reference_data.py
+"""
+Process-wide cache of the timer types reference data.
+
+timerTypes is a handful of global documents that almost never change, so
+every process keeps them in memory: session starts validate and fill in
+durations from the cache, and GET /api/timer-types serves a response body
+and ETag built once per load.
+
+Freshness without a lookup per request: at most every
+REFERENCE_CHECK_SECONDS one request runs a tiny aggregation for the
+collection's fingerprint (count, sum of versions, latest updatedAt; every
+write bumps version and updatedAt) and reloads if it moved. Everything is
+reloaded after REFERENCE_TTL_SECONDS regardless. Other requests keep using
+the current snapshot while a check runs. An id missing from the snapshot
+may have just been added, so it triggers a check early, but at most once
+every REFERENCE_FORCED_CHECK_SECONDS: a client sending made-up ids cannot
+turn each request into a query. With REFERENCE_PRELOAD on (the
+production default) the first load happens in the background at startup.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from pymongo.errors import PyMongoError
+
+import models
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Snapshot:
+    by_id: dict
+    body: str
+    etag: str
+    fingerprint: tuple
+    loaded_at: float
+
+
+class TimerTypeCache:
+    def __init__(self, app=None):
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._forced_at = None
+        self._lock = threading.Lock()
+        self._forced_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get('REFERENCE_PRELOAD'):
+            threading.Thread(target=self._preload, daemon=True, name='reference-preload').start()
+
+    def _preload(self):
+        try:
+            self.snapshot()
+        except PyMongoError as e:
+            logger.warning("Timer types not preloaded (%s), loading on first use", e)
+
+    def _fingerprint(self, db):
+        totals = next(db.timerTypes.aggregate([{'$group': {
+            '_id': None,
+            'count': {'$sum': 1},
+            'versions': {'$sum': '$version'},
+            'updated': {'$max': '$updatedAt'}
+        }}]), None)
+        return (totals['count'], totals['versions'], totals['updated']) if totals else (0, 0, None)
+
+    def _load(self, db, fingerprint, now):
+        timer_types = [
+            models.TimerType.from_bson(doc)
+            for doc in db.timerTypes.find({'isActive': True}).sort('typeName', 1)
+        ]
+        body = json.dumps([timer_type.to_json() for timer_type in timer_types])
+        return Snapshot(
+            by_id={timer_type.id: timer_type for timer_type in timer_types},
+            body=body,
+            etag=hashlib.sha1(body.encode('utf-8')).hexdigest(),
+            fingerprint=fingerprint,
+            loaded_at=now
+        )
+
+    def snapshot(self, force=False):
+        """The current snapshot, refreshed first if a check is due"""
+        config = self.app.config
+        current = self._snapshot
+        now = time.monotonic()
+        if current is not None and not force and now - self._checked_at < config['REFERENCE_CHECK_SECONDS']:
+            return current
+
+        # One thread checks; the others carry on with what is loaded
+        if not self._lock.acquire(blocking=current is None):
+            return current
+        try:
+            current = self._snapshot
+            if current is not None and not force and now - self._checked_at < config['REFERENCE_CHECK_SECONDS']:
+                return current
+            db = self.app.mongo.db
+            fingerprint = self._fingerprint(db)
+            if current is None or fingerprint != current.fingerprint or now - current.loaded_at >= config['REFERENCE_TTL_SECONDS']:
+                current = self._snapshot = self._load(db, fingerprint, now)
+            self._checked_at = now
+            return current
+        finally:
+            self._lock.release()
+
+    def _claim_forced_check(self):
+        """True at most once every REFERENCE_FORCED_CHECK_SECONDS"""
+        now = time.monotonic()
+        with self._forced_lock:
+            if self._forced_at is not None and now - self._forced_at < self.app.config['REFERENCE_FORCED_CHECK_SECONDS']:
+                return False
+            self._forced_at = now
+            return True
+
+    def get(self, timer_type_id):
+        """The active timer type with this id, or None"""
+        timer_type = self.snapshot().by_id.get(timer_type_id)
+        if timer_type is None and self._claim_forced_check():
+            # Possibly added since the last check
+            timer_type = self.snapshot(force=True).by_id.get(timer_type_id)
+        return timer_type
+
+    def reload(self):
+        """Drop the snapshot so the next use loads the collection again"""
+        with self._lock:
+            self._snapshot = None
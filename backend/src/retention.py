@@ -0,0 +1,310 @@
+# src/retention.py
+"""
+Retention policies and archival.
+
+Each policy says when documents in a collection leave the database:
+soft-deleted documents (isActive: False) after `deleted_days`, and live
+documents matching `aged_filter` after `aged_days`, measured on
+`age_field`. The sweeper reads matching documents in _id batches and
+journals each batch to disk. It then deletes the documents that still
+match the policy and appends only those to gzip-compressed NDJSON files
+partitioned by user and month, throttled to RETENTION_MAX_RATE documents
+per second. A document restored or reactivated in the meantime is neither
+deleted nor archived. The next sweep finishes a batch a crash left in the
+journal. A crash after archiving can leave a document in the archive
+twice; restore upserts by _id, so that is harmless.
+
+The sessions policy also covers the completed sessions moved to the
+sessionHistory time-series collection (see HISTORY). Deleting those by
+_id needs MongoDB 7.0 or later.
+
+Archive layout: <RETENTION_ARCHIVE_DIR>/<collection>/<userId>/<YYYY-MM>.ndjson.gz
+Batch journal:  <RETENTION_ARCHIVE_DIR>/<collection>/.pending.ndjson.gz
+
+    python -m retention sweep --dry-run
+    python -m retention sweep --collection sessions --max-rate 200
+    python -m retention restore <user_id> [--collection tasks] [--month 2024-03]
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import gzip
+import json
+import os
+import time
+
+from bson import json_util
+from bson.objectid import ObjectId
+from pymongo import ReplaceOne
+
+import session_store
+import task_tags
+import tombstones
+
+# aged_days of None keeps live documents forever; RETENTION_POLICIES (JSON)
+# overrides these per collection. Restored documents are left alone for
+# RESTORE_HOLD_DAYS so the next sweep does not archive them straight back
+RESTORE_HOLD_DAYS = 30
+
+DEFAULT_POLICIES = {
+    'tasks': {'deleted_days': 30, 'aged_days': None, 'aged_filter': {'status': 'completed'}, 'age_field': 'updatedAt'},
+    'tags': {'deleted_days': 30},
+    'tagRules': {'deleted_days': 30},
+    'sessions': {'deleted_days': 30, 'aged_days': None, 'aged_filter': {'status': 'completed'}, 'age_field': 'endTime'}
+}
+
+# Collections clients keep offline copies of (see routes/sync.py)
+SYNCED = ('tasks', 'tags', 'sessions')
+
+# Time-series collections holding more of a policy's documents, with the
+# function giving them the policy collection's shape: completed sessions
+# are moved to sessionHistory (SESSIONS_STORAGE=timeseries), where the user
+# is meta.userId. They are archived as sessions, so restore puts them back
+# in sessions.
+HISTORY = {'sessions': (session_store.HISTORY, session_store.from_measurement)}
+
+
+def load_policies(overrides=None):
+    policies = {name: dict(policy) for name, policy in DEFAULT_POLICIES.items()}
+    for name, policy in (overrides or {}).items():
+        policies.setdefault(name, {}).update(policy)
+    return policies
+
+
+def policy_query(policy, now, history=False):
+    """
+    Filter selecting the documents a policy retires, or None if it retires
+    nothing. History collections only hold finished documents, and
+    aged_filter (a status) is not stored there, so it is left out.
+    """
+    clauses = []
+    if policy.get('deleted_days') is not None:
+        clauses.append({
+            'isActive': False,
+            'updatedAt': {'$lt': now - timedelta(days=policy['deleted_days'])}
+        })
+    if policy.get('aged_days') is not None:
+        clauses.append({
+            **({} if history else policy.get('aged_filter', {})),
+            policy.get('age_field', 'updatedAt'): {'$lt': now - timedelta(days=policy['aged_days'])}
+        })
+    if not clauses:
+        return None
+    return {
+        '$and': [
+            clauses[0] if len(clauses) == 1 else {'$or': clauses},
+            {'restoredAt': {'$not': {'$gte': now - timedelta(days=policy.get('restore_hold_days', RESTORE_HOLD_DAYS))}}}
+        ]
+    }
+
+
+def partition(doc, policy):
+    """Archive file (relative path parts) a document belongs in"""
+    when = doc.get(policy.get('age_field', 'updatedAt')) or doc.get('createdAt') or doc['_id'].generation_time
+    return str(doc.get('userId', 'none')), when.strftime('%Y-%m')
+
+
+def write_archive(archive_dir, collection, user, month, docs):
+    path = Path(archive_dir) / collection / user / f"{month}.ndjson.gz"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ''.join(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + '\n' for doc in docs)
+    # Appending adds a gzip member; readers see the members as one stream
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as f:
+            f.write(lines.encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def pending_path(archive_dir, collection, source=None):
+    name = f".pending.{source}.ndjson.gz" if source and source != collection else '.pending.ndjson.gz'
+    return Path(archive_dir) / collection / name
+
+
+def write_pending(path, docs):
+    """Journal a batch before any of it is deleted"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ''.join(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + '\n' for doc in docs)
+    with open(path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as f:
+            f.write(lines.encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def retire(db, name, policy, archive_dir, docs):
+    """Archive deleted documents and remove what refers to them"""
+    partitions = defaultdict(list)
+    for doc in docs:
+        partitions[partition(doc, policy)].append(doc)
+    for (user, month), user_docs in partitions.items():
+        write_archive(archive_dir, name, user, month, user_docs)
+
+    ids = [doc['_id'] for doc in docs]
+    if name == 'tasks' and ids:
+        # Links are rebuilt from each task's tagIds on restore
+        db.taskTags.delete_many({'taskId': {'$in': ids}})
+    if name in SYNCED:
+        # Soft-deleted documents already synced as deletions; live ones
+        # retired by age need a tombstone
+        retired = defaultdict(list)
+        for doc in docs:
+            if doc.get('isActive', True) and 'userId' in doc:
+                retired[doc['userId']].append({'_id': doc['_id']})
+        for user_id, keys in retired.items():
+            tombstones.record(db, user_id, name, keys)
+
+
+def recover(db, name, policy, archive_dir, source=None, convert=None):
+    """Archive what a crashed sweep deleted from its journalled batch; returns the count"""
+    source = source or name
+    path = pending_path(archive_dir, name, source)
+    if not path.exists():
+        return 0
+    batch = list(read_archive(path))
+    kept = set(db[source].distinct('_id', {'_id': {'$in': [doc['_id'] for doc in batch]}}))
+    deleted = [doc for doc in batch if doc['_id'] not in kept]
+    retire(db, name, policy, archive_dir, [convert(doc) for doc in deleted] if convert else deleted)
+    path.unlink()
+    return len(deleted)
+
+
+def sources(db, name, policy, now):
+    """(collection, query, convert) for each collection holding a policy's documents"""
+    found = [(name, policy_query(policy, now), None)]
+    if name in HISTORY:
+        history, convert = HISTORY[name]
+        if history in db.list_collection_names():
+            found.append((history, policy_query(policy, now, history=True), convert))
+    return found
+
+
+def sweep_collection(db, name, policy, archive_dir, batch_size=500, max_rate=None, dry_run=False):
+    """Archive and delete one collection's expired documents; returns the count"""
+    now = datetime.now(timezone.utc)
+    if policy_query(policy, now) is None:
+        return 0
+    if dry_run:
+        return sum(db[source].count_documents(query) for source, query, _ in sources(db, name, policy, now))
+
+    swept = 0
+    started = time.time()
+    for source, query, convert in sources(db, name, policy, now):
+        swept += recover(db, name, policy, archive_dir, source, convert)
+        path = pending_path(archive_dir, name, source)
+        while True:
+            batch = list(db[source].find(query).sort('_id', 1).limit(batch_size))
+            if not batch:
+                break
+
+            # Only documents that still match the policy are deleted, and
+            # only those are archived; a restore or an edit since the read wins
+            write_pending(path, batch)
+            ids = [doc['_id'] for doc in batch]
+            result = db[source].delete_many({'_id': {'$in': ids}, **query})
+            if result.deleted_count < len(batch):
+                kept = set(db[source].distinct('_id', {'_id': {'$in': ids}}))
+                batch = [doc for doc in batch if doc['_id'] not in kept]
+            retire(db, name, policy, archive_dir, [convert(doc) for doc in batch] if convert else batch)
+            path.unlink()
+            swept += len(batch)
+
+            if max_rate:
+                ahead = swept / max_rate - (time.time() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+    return swept
+
+
+def sweep(db, policies, archive_dir, only=None, batch_size=500, max_rate=None, dry_run=False):
+    return {
+        name: sweep_collection(db, name, policy, archive_dir, batch_size, max_rate, dry_run)
+        for name, policy in policies.items()
+        if not only or name == only
+    }
+
+
+def read_archive(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json_util.loads(line)
+
+
+def restore_user(db, user_id, archive_dir, only=None, month=None, batch_size=500):
+    """Put a user's archived documents back; returns counts per collection"""
+    restored = {}
+    now = datetime.now(timezone.utc)
+    for collection_dir in sorted(Path(archive_dir).glob('*')):
+        name = collection_dir.name
+        if only and name != only:
+            continue
+        user_dir = collection_dir / str(user_id)
+        files = sorted(user_dir.glob(f"{month or '*'}.ndjson.gz"))
+        if not files:
+            continue
+
+        count = 0
+        batch = []
+
+        def flush(batch):
+            db[name].bulk_write(
+                [ReplaceOne({'_id': doc['_id']}, {**doc, 'restoredAt': now}, upsert=True) for doc in batch],
+                ordered=False
+            )
+            if name == 'tasks':
+                links = [op for doc in batch for op in task_tags.link_operations(doc['_id'], doc.get('tagIds', []), doc.get('updatedAt'))]
+                if links:
+                    db.taskTags.bulk_write(links, ordered=False)
+
+        for path in files:
+            for doc in read_archive(path):
+                batch.append(doc)
+                if len(batch) == batch_size:
+                    flush(batch)
+                    count += len(batch)
+                    batch = []
+        if batch:
+            flush(batch)
+            count += len(batch)
+        restored[name] = count
+    return restored
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Enforce retention policies and restore archives')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    sweep_parser = subparsers.add_parser('sweep', help='Archive and delete expired documents')
+    sweep_parser.add_argument('--collection', help='Only sweep this collection')
+    sweep_parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+    sweep_parser.add_argument('--batch-size', type=int, help='Default RETENTION_BATCH_SIZE')
+    sweep_parser.add_argument('--max-rate', type=float, help='Documents per second (default RETENTION_MAX_RATE)')
+    restore_parser = subparsers.add_parser('restore', help="Rehydrate one user's archive")
+    restore_parser.add_argument('user_id')
+    restore_parser.add_argument('--collection', help='Only restore this collection')
+    restore_parser.add_argument('--month', help='Only restore this month (YYYY-MM)')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    app = create_app()
+    config = app.config
+    db = app.mongo.db
+    if args.command == 'sweep':
+        counts = sweep(
+            db,
+            load_policies(config['RETENTION_POLICIES']),
+            config['RETENTION_ARCHIVE_DIR'],
+            only=args.collection,
+            batch_size=args.batch_size or config['RETENTION_BATCH_SIZE'],
+            max_rate=args.max_rate or config['RETENTION_MAX_RATE'],
+            dry_run=args.dry_run
+        )
+        verb = 'would be archived' if args.dry_run else 'archived'
+        for name, count in counts.items():
+            print(f"{name:<12} {count} {verb}")
+    else:
+        counts = restore_user(db, ObjectId(args.user_id), config['RETENTION_ARCHIVE_DIR'], args.collection, args.month)
+        print(json.dumps(counts) if counts else "Nothing archived for this user")
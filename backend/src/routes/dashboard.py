@@ -0,0 +1,178 @@
+# src/routes/dashboard.py
+from flask import request, current_app
+from flask_restx import Namespace, Resource, fields
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson.objectid import ObjectId
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pymongo import DESCENDING
+
+import models
+import session_store
+from routes.sessions import SEGMENT_SECONDS, session_response_model
+from routes.tags import tag_response_model
+from routes.tasks import task_response_model
+from routes.users import user_response_model
+
+# Create API namespace; every route requires a token
+dashboard_ns = Namespace('dashboard', description='Everything the start screen needs in one request',
+                         decorators=[jwt_required()])
+
+# Shared by all requests; each dashboard runs five reads on it
+pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='dashboard')
+
+# Query parameter -> (default, maximum) items per section
+LIMITS = {
+    'todos': (20, 100),
+    'distractions': (10, 100),
+    'tags': (50, 200)
+}
+
+focus_totals_model = dashboard_ns.model('FocusTotals', {
+    'since': fields.DateTime(description='Start of the day the totals cover'),
+    'sessions': fields.Integer(description='Sessions started since then'),
+    'completed_sessions': fields.Integer(description='Of those, how many are completed'),
+    'focus_seconds': fields.Float(description='Active time, including the running segment')
+})
+
+dashboard_response_model = dashboard_ns.model('DashboardResponse', {
+    'profile': fields.Nested(user_response_model),
+    'active_session': fields.Nested(session_response_model, allow_null=True,
+                                    description='The running or paused session, if any'),
+    'todos': fields.List(fields.Nested(task_response_model), description='Open todos, newest first'),
+    'distractions': fields.List(fields.Nested(task_response_model), description='Distractions, newest first'),
+    'tags': fields.List(fields.Nested(tag_response_model), description='Tags by name'),
+    'focus_today': fields.Nested(focus_totals_model)
+})
+
+
+def profile(db, user_id, limits, since, session):
+    user = db.users.find_one({'_id': user_id}, session=session)
+    return models.User.from_bson(user).to_json() if user else None
+
+
+def task_sections(db, user_id, limits, since, session):
+    """Open todos and recent distractions in one $facet pass over the user's tasks"""
+    newest = {'$sort': {'createdAt': DESCENDING, '_id': DESCENDING}}
+    result = next(db.tasks.aggregate([
+        {'$match': {'userId': user_id, 'isActive': True}},
+        {'$facet': {
+            'todos': [
+                {'$match': {'taskType': 'todo', 'status': {'$ne': 'completed'}}},
+                newest,
+                {'$limit': limits['todos']}
+            ],
+            'distractions': [
+                {'$match': {'taskType': 'distraction'}},
+                newest,
+                {'$limit': limits['distractions']}
+            ]
+        }}
+    ], session=session))
+    return {
+        name: [models.Task.from_bson(task).to_json() for task in tasks]
+        for name, tasks in result.items()
+    }
+
+
+def tags(db, user_id, limits, since, session):
+    cursor = db.tags.find({'userId': user_id, 'isActive': True}, session=session) \
+        .sort('name', 1) \
+        .limit(limits['tags'])
+    return [models.Tag.from_bson(tag).to_json() for tag in cursor]
+
+
+def active_session(db, user_id, limits, since, session):
+    current = db.sessions.find_one(
+        {'userId': user_id, 'isActive': True, 'status': {'$in': ['active', 'paused']}},
+        sort=[('startTime', DESCENDING)],
+        session=session
+    )
+    return models.Session.from_bson(current).to_json() if current else None
+
+
+def focus_totals(db, user_id, limits, since, session, storage='documents'):
+    """Sessions started since `since`, with active time measured by the server"""
+    pipeline = [{'$match': {'userId': user_id, 'isActive': True, 'startTime': {'$gte': since}}}]
+    if storage == 'timeseries':
+        pipeline += [
+            {'$unionWith': {'coll': session_store.HISTORY, 'pipeline': [
+                {'$match': {'meta.userId': user_id, 'isActive': True, 'startTime': {'$gte': since}}},
+                {'$set': {'status': 'completed'}}
+            ]}},
+            # A session caught mid-move is in both collections
+            {'$group': {'_id': '$_id', 'status': {'$first': '$status'}, 'activeSeconds': {'$first': '$activeSeconds'},
+                        'segmentStart': {'$first': '$segmentStart'}, 'startTime': {'$first': '$startTime'}}}
+        ]
+    pipeline.append({'$group': {
+        '_id': None,
+        'sessions': {'$sum': 1},
+        'completed_sessions': {'$sum': {'$cond': [{'$eq': ['$status', 'completed']}, 1, 0]}},
+        'focus_seconds': {'$sum': {'$add': [
+            {'$ifNull': ['$activeSeconds', 0]},
+            {'$cond': [{'$eq': ['$status', 'active']}, SEGMENT_SECONDS, 0]}
+        ]}}
+    }})
+    totals = next(db.sessions.aggregate(pipeline, session=session), {})
+    return {
+        'since': since.isoformat(),
+        'sessions': totals.get('sessions', 0),
+        'completed_sessions': totals.get('completed_sessions', 0),
+        'focus_seconds': float(totals.get('focus_seconds', 0))
+    }
+
+
+def run(section, db, user_id, limits, since, session, **kwargs):
+    try:
+        return section(db, user_id, limits, since, session, **kwargs)
+    finally:
+        if session is not None:
+            session.end_session()
+
+
+@dashboard_ns.route('')
+class Dashboard(Resource):
+    @dashboard_ns.doc('get_dashboard', security='jwt', params={
+        'todos': f'Maximum open todos (default {LIMITS["todos"][0]})',
+        'distractions': f'Maximum distractions (default {LIMITS["distractions"][0]})',
+        'tags': f'Maximum tags (default {LIMITS["tags"][0]})',
+        'utc_offset': "Minutes east of UTC of the user's day, for focus_today (default 0)"
+    })
+    @dashboard_ns.response(200, 'Success', dashboard_response_model)
+    @dashboard_ns.response(404, 'User not found')
+    def get(self):
+        """Profile, current session, open todos, distractions, tags and today's focus in one request"""
+        user_id = ObjectId(get_jwt_identity())
+        limits = {
+            name: min(max(request.args.get(name, default, type=int), 1), maximum)
+            for name, (default, maximum) in LIMITS.items()
+        }
+        offset = timedelta(minutes=min(max(request.args.get('utc_offset', 0, type=int), -840), 840))
+        local_now = datetime.now(timezone.utc) + offset
+        since = local_now.replace(hour=0, minute=0, second=0, microsecond=0) - offset
+
+        # The reads are independent, so they run concurrently; each gets its
+        # own read session, started here on the request thread
+        reads = current_app.reads
+        lists = reads.db('lists')
+        futures = {
+            'profile': pool.submit(run, profile, reads.db('auth'), user_id, limits, since, reads.start_session()),
+            'tasks': pool.submit(run, task_sections, lists, user_id, limits, since, reads.start_session()),
+            'tags': pool.submit(run, tags, lists, user_id, limits, since, reads.start_session()),
+            'active_session': pool.submit(run, active_session, lists, user_id, limits, since, reads.start_session()),
+            'focus_today': pool.submit(run, focus_totals, reads.db('analytics'), user_id, limits, since,
+                                       reads.start_session(), storage=current_app.config['SESSIONS_STORAGE'])
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+        if results['profile'] is None:
+            dashboard_ns.abort(404, 'User not found')
+        tasks = results.pop('tasks')
+        return {
+            'profile': results['profile'],
+            'active_session': results['active_session'],
+            'todos': tasks['todos'],
+            'distractions': tasks['distractions'],
+            'tags': results['tags'],
+            'focus_today': results['focus_today']
+        }
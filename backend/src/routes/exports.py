@@ -0,0 +1,82 @@
+# src/routes/exports.py
+from flask import current_app
+from flask_restx import Namespace, Resource, fields
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson.objectid import ObjectId
+import os
+
+import analytics_export
+import jobs
+from validation import Schema
+
+# Create API namespace; every route requires a token, and an admin
+exports_ns = Namespace('exports', description='Analytics exports (admin only)', decorators=[jwt_required()])
+
+export_request_model = exports_ns.model('ExportRequest', {
+    'collections': fields.List(fields.String(enum=list(analytics_export.COLLECTIONS)), required=False,
+                               description='Collections to export (default: all)')
+})
+
+export_request_schema = Schema(export_request_model)
+
+export_state_model = exports_ns.model('ExportState', {
+    'collection': fields.String(description='Exported collection'),
+    'watermark': fields.DateTime(description='Documents updated before this are exported'),
+    'last_run': fields.DateTime(description='When the last run started'),
+    'rows': fields.Integer(description='Rows written by the last run'),
+    'files': fields.Integer(description='Files written by the last run')
+})
+
+
+def require_admin():
+    user = current_app.mongo.db.users.find_one(
+        {'_id': ObjectId(get_jwt_identity()), 'isActive': True},
+        {'userType': 1}
+    )
+    if not user or user.get('userType') != 'admin':
+        exports_ns.abort(403, 'Admin only')
+    return user['_id']
+
+
+@exports_ns.route('')
+class Exports(Resource):
+    @exports_ns.doc('export_status', security='jwt')
+    @exports_ns.marshal_list_with(export_state_model)
+    @exports_ns.response(403, 'Admin only')
+    def get(self):
+        """Where each collection's Parquet export is up to"""
+        require_admin()
+        export_dir = current_app.config['EXPORT_DIR']
+        return [
+            {'collection': name, **analytics_export.read_state(export_dir, name)}
+            for name in analytics_export.COLLECTIONS
+        ]
+
+    @exports_ns.doc('start_export', security='jwt')
+    @exports_ns.expect(export_request_model)
+    @exports_ns.response(202, 'Export scheduled')
+    @exports_ns.response(403, 'Admin only')
+    @exports_ns.response(409, 'An export is already queued or running')
+    def post(self):
+        """Export sessions and tasks updated since the last run to Parquet on the server's disk"""
+        body = export_request_schema.load()
+        user_id = require_admin()
+        db = current_app.mongo.db
+        # Two runs at once would both move the watermarks
+        if db.jobs.count_documents({'type': 'analytics_export', 'status': {'$in': ['queued', 'running']}}, limit=1):
+            exports_ns.abort(409, 'An export is already queued or running')
+
+        config = current_app.config
+        job_id = jobs.enqueue(
+            db,
+            'analytics_export',
+            {
+                'collections': body.collections or list(analytics_export.COLLECTIONS),
+                'export_dir': os.path.abspath(config['EXPORT_DIR']),
+                'options': analytics_export.options(config)
+            },
+            user_id=user_id,
+            max_attempts=3
+        )
+        current_app.audit.record('start_export', 'jobs', job_id, user_id)
+        return {'message': 'Export scheduled', 'job_id': str(job_id)}, 202
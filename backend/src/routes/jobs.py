@@ -0,0 +1,56 @@
+# src/routes/jobs.py
+from flask import current_app
+from flask_restx import Namespace, Resource, fields
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson.objectid import ObjectId
+
+# Create API namespace; every route requires a token
+jobs_ns = Namespace('jobs', description='Background job status', decorators=[jwt_required()])
+
+job_response_model = jobs_ns.model('JobResponse', {
+    '_id': fields.String(description='Job ID'),
+    'type': fields.String(description='Job type'),
+    'status': fields.String(description='Job status', enum=['queued', 'running', 'succeeded', 'failed']),
+    'progress': fields.Integer(description='Progress percentage'),
+    'attempts': fields.Integer(description='Attempts made so far'),
+    'result': fields.Raw(description='Handler result once succeeded'),
+    'error': fields.String(description='Last error message'),
+    'created_at': fields.DateTime(description='Creation timestamp'),
+    'updated_at': fields.DateTime(description='Last update timestamp'),
+    'finished_at': fields.DateTime(description='Completion timestamp')
+})
+
+# Helper function to transform jobs
+def transform_job(job):
+    return {
+        '_id': str(job['_id']),
+        'type': job['type'],
+        'status': job['status'],
+        'progress': job.get('progress', 0),
+        'attempts': job.get('attempts', 0),
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'created_at': job.get('createdAt'),
+        'updated_at': job.get('updatedAt'),
+        'finished_at': job.get('finishedAt')
+    }
+
+@jobs_ns.route('/<objectid:job_id>')
+@jobs_ns.param('job_id', 'The job identifier')
+class JobStatus(Resource):
+    @jobs_ns.doc('get_job', security='jwt')
+    @jobs_ns.marshal_with(job_response_model)
+    @jobs_ns.response(404, 'Job not found')
+    def get(self, job_id):
+        """Get the status of a background job"""
+        user_id = get_jwt_identity()
+        reads = current_app.reads
+        job = reads.db('lists').jobs.find_one({
+            '_id': job_id,
+            'userId': ObjectId(user_id)
+        }, session=reads.session())
+        
+        if not job:
+            jobs_ns.abort(404, 'Job not found')
+        
+        return transform_job(job)
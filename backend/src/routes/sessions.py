@@ -1,28 +1,18 @@
-from flask import Blueprint, request, current_app
+from flask import current_app
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson.objectid import ObjectId
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument
 
-# Create both blueprint and API namespace
-sessions_bp = Blueprint('sessions', __name__)
-sessions_ns = Namespace('sessions', description='Session operations')
+import jobs
+import models
+import raw_lists
+import session_store
+from validation import ObjectIdField, Schema
 
-# Create route mappings
-@sessions_bp.route('/', methods=['GET'])
-@jwt_required()
-def list_sessions():
-    return SessionList().get()
-
-@sessions_bp.route('/', methods=['POST'])
-@jwt_required()
-def create_session():
-    return SessionList().post()
-
-@sessions_bp.route('/<session_id>/stop', methods=['POST'])
-@jwt_required()
-def stop_session(session_id):
-    return SessionStop().post(session_id)
+# Create API namespace; every route requires a token
+sessions_ns = Namespace('sessions', description='Session operations', decorators=[jwt_required()])
 
 session_model = sessions_ns.model('Session', {
     'task_id': fields.String(required=False, description='Associated task ID'),
@@ -34,123 +24,222 @@ session_model = sessions_ns.model('Session', {
     'break_duration': fields.Integer(required=True, description='Break duration in minutes')
 })
 
+session_start_model = sessions_ns.model('SessionStart', {
+    'task_id': ObjectIdField(required=False, description='Associated task ID'),
+    'timer_type_id': ObjectIdField(required=True, description='Associated timer type ID'),
+    'work_duration': fields.Integer(required=False, min=1,
+                                    description="Work duration in minutes (default: the timer type's)"),
+    'break_duration': fields.Integer(required=False, min=0,
+                                     description="Break duration in minutes (default: the timer type's)")
+})
+
+# Compiled once; handlers decode their body before touching the database
+session_start_schema = Schema(session_start_model)
+
 session_response_model = sessions_ns.inherit('SessionResponse', session_model, {
     '_id': fields.String(description='Session ID'),
     'user_id': fields.String(description='User ID'),
     'created_at': fields.DateTime(description='Creation timestamp'),
     'updated_at': fields.DateTime(description='Last update timestamp'),
+    'active_seconds': fields.Float(description='Time spent active, excluding pauses'),
+    'paused_at': fields.DateTime(description='When the session was paused'),
     'version': fields.Integer(description='Document version')
 })
 
+# Session state transitions are aggregation-pipeline updates evaluated by the
+# server against $$NOW, so timing never depends on a prior read or on the
+# API server's clock
+
+# Seconds since the current active segment started
+SEGMENT_SECONDS = {
+    '$divide': [
+        {'$dateDiff': {
+            'startDate': {'$ifNull': ['$segmentStart', '$startTime']},
+            'endDate': '$$NOW',
+            'unit': 'millisecond'
+        }},
+        1000
+    ]
+}
+
+def transition_session(session_id, user_id, from_statuses, to_status, changes, then=None):
+    """Atomically move a session between statuses; returns the updated session or None"""
+    pipeline = [{
+        '$set': {
+            **changes,
+            'status': to_status,
+            'updatedAt': '$$NOW',
+            'version': {'$add': ['$version', 1]}
+        }
+    }]
+    if then:
+        pipeline.append({'$set': then})
+    return current_app.mongo.db.sessions.find_one_and_update(
+        {
+            '_id': session_id,
+            'userId': ObjectId(user_id),
+            'status': {'$in': from_statuses}
+        },
+        pipeline,
+        return_document=ReturnDocument.AFTER
+    )
+
 @sessions_ns.route('/')
 class SessionList(Resource):
     @sessions_ns.doc('list_sessions', security='jwt')
-    @sessions_ns.marshal_list_with(session_response_model)
+    @sessions_ns.response(200, 'Success', [session_response_model])
     def get(self):
         """List all sessions for the current user"""
         user_id = get_jwt_identity()
-        sessions = list(current_app.mongo.db.sessions.find({
-            'userId': ObjectId(user_id),
-            'isActive': True
-        }))
-        
-        # Transform each session to match the response model
-        transformed_sessions = []
-        for session in sessions:
-            transformed_sessions.append({
-                '_id': str(session['_id']),
-                'user_id': str(session['userId']),
-                'task_id': str(session['taskId']) if session.get('taskId') else None,
-                'timer_type_id': str(session['timerTypeId']) if session.get('timerTypeId') else None,
-                'status': session.get('status', ''),
-                'start_time': session.get('startTime'),
-                'end_time': session.get('endTime') if 'endTime' in session else None,
-                'work_duration': session.get('workDuration', 0),
-                'break_duration': session.get('breakDuration', 0),
-                'created_at': session.get('createdAt'),
-                'updated_at': session.get('updatedAt'),
-                'version': session.get('version', 1)
-            })
+        reads = current_app.reads
+        storage = current_app.config['SESSIONS_STORAGE']
+        # The time-series layout merges two collections in Python, so it
+        # keeps the model path
+        if current_app.config['LISTS_RAW_BSON'] and storage == 'documents':
+            return raw_lists.response(
+                reads.db('lists').sessions,
+                {'userId': ObjectId(user_id), 'isActive': True},
+                session=reads.session()
+            )
+        sessions = session_store.list_sessions(
+            reads.db('lists'),
+            ObjectId(user_id),
+            storage,
+            session=reads.session()
+        )
         
-        return transformed_sessions
+        return [models.Session.from_bson(session).to_json() for session in sessions]
 
     @sessions_ns.doc('start_session', security='jwt')
-    @sessions_ns.expect(session_model)
-    @sessions_ns.marshal_with(session_response_model, code=201)
+    @sessions_ns.expect(session_start_model)
+    @sessions_ns.response(201, 'Session started', session_response_model)
+    @sessions_ns.response(400, 'Unknown timer type, or no durations given or defaulted')
     def post(self):
-        """Start a new session"""
+        """Start a new session; durations left out come from the timer type"""
+        body = session_start_schema.load()
         user_id = get_jwt_identity()
-        data = request.get_json() or {}
+        
+        # Checked against the in-process reference data, no query
+        timer_type = current_app.timer_types.get(body.timer_type_id)
+        if timer_type is None:
+            sessions_ns.abort(400, 'Unknown or inactive timer type')
+        work_duration = body.work_duration if body.work_duration is not None else timer_type.work_duration
+        break_duration = body.break_duration if body.break_duration is not None else timer_type.break_duration
+        if work_duration is None or break_duration is None:
+            sessions_ns.abort(400, 'work_duration and break_duration are required for this timer type')
         
         # Use timezone-aware datetime objects
         now = datetime.now(timezone.utc)
         
-        session = {
-            'userId': ObjectId(user_id),
-            'startTime': now,
-            'timerTypeId': ObjectId(data['timer_type_id']),
-            'taskId': ObjectId(data['task_id']) if data.get('task_id') else None,
-            'workDuration': data['work_duration'],
-            'breakDuration': data['break_duration'],
-            'status': 'active',
-            'isActive': True,
-            'createdAt': now,
-            'updatedAt': now,
-            'version': 1
-        }
-        
-        result = current_app.mongo.db.sessions.insert_one(session)
+        session = models.Session(
+            ObjectId(user_id), body.timer_type_id, body.task_id, 'active',
+            start_time=now, work_duration=work_duration, break_duration=break_duration,
+            segment_start=now, created_at=now, updated_at=now
+        )
         
-        # Create a properly formatted response object with mapped fields
-        response = {
-            '_id': str(result.inserted_id),
-            'user_id': str(session['userId']),
-            'task_id': str(session['taskId']) if session.get('taskId') else None,
-            'timer_type_id': str(session['timerTypeId']) if session.get('timerTypeId') else None,
-            'status': session.get('status', ''),
-            'start_time': session.get('startTime'),
-            'end_time': session.get('endTime') if 'endTime' in session else None,
-            'work_duration': session.get('workDuration', 0),
-            'break_duration': session.get('breakDuration', 0),
-            'created_at': session.get('createdAt'),
-            'updated_at': session.get('updatedAt'),
-            'version': session.get('version', 1)
-        }
+        session.id = current_app.mongo.db.sessions.insert_one(session.to_bson()).inserted_id
+        current_app.audit.record('start_session', 'sessions', session.id, ObjectId(user_id))
         
-        return response, 201
+        return session.to_json(), 201
+
+def schedule_archive(user_id):
+    """Queue a move of the user's completed sessions to the history, unless one is pending"""
+    db = current_app.mongo.db
+    if db.jobs.count_documents({'type': 'archive_sessions', 'userId': user_id, 'status': 'queued'}, limit=1):
+        return
+    delay = current_app.config['SESSIONS_ARCHIVE_AFTER']
+    jobs.enqueue(
+        db,
+        'archive_sessions',
+        {'user_id': str(user_id), 'older_than': delay},
+        user_id=user_id,
+        run_at=datetime.now(timezone.utc) + timedelta(seconds=delay)
+    )
 
-@sessions_ns.route('/<session_id>/stop')
+@sessions_ns.route('/<objectid:session_id>/stop')
 @sessions_ns.param('session_id', 'The session identifier')
 class SessionStop(Resource):
     @sessions_ns.doc('stop_session', security='jwt')
+    @sessions_ns.response(200, 'Session stopped successfully')
+    @sessions_ns.response(404, 'Session not found or already stopped')
     def post(self, session_id):
-        """Stop an active session"""
+        """Stop an active or paused session"""
         user_id = get_jwt_identity()
-        end_time = datetime.now(timezone.utc)
-        
-        session = current_app.mongo.db.sessions.find_one({'_id': ObjectId(session_id)})
-        if not session:
-            sessions_ns.abort(404, 'Session not found')
-            
-        duration = (end_time - session['startTime']).total_seconds() / 60  # Convert to minutes
         
-        result = current_app.mongo.db.sessions.update_one(
+        # A paused session has nothing running to add
+        session = transition_session(
+            session_id, user_id, ['active', 'paused'], 'completed',
             {
-                '_id': ObjectId(session_id),
-                'userId': ObjectId(user_id),
-                'status': 'active'
+                'activeSeconds': {'$add': [
+                    {'$ifNull': ['$activeSeconds', 0]},
+                    {'$cond': [{'$eq': ['$status', 'active']}, SEGMENT_SECONDS, 0]}
+                ]},
+                'endTime': '$$NOW',
+                'segmentStart': None,
+                'pausedAt': None
             },
+            then={'duration': {'$divide': ['$activeSeconds', 60]}}  # Minutes
+        )
+        
+        if session:
+            current_app.audit.record(
+                'stop_session', 'sessions', session_id, ObjectId(user_id),
+                new_value={'status': 'completed', 'duration': session['duration']}
+            )
+            if current_app.config['SESSIONS_STORAGE'] == 'timeseries':
+                schedule_archive(ObjectId(user_id))
+            return {'message': 'Session stopped successfully'}, 200
+        sessions_ns.abort(404, 'Session not found or already stopped')
+
+@sessions_ns.route('/<objectid:session_id>/pause')
+@sessions_ns.param('session_id', 'The session identifier')
+class SessionPause(Resource):
+    @sessions_ns.doc('pause_session', security='jwt')
+    @sessions_ns.response(200, 'Success', session_response_model)
+    @sessions_ns.response(404, 'Session not found or not active')
+    def post(self, session_id):
+        """Pause an active session"""
+        user_id = get_jwt_identity()
+        
+        session = transition_session(
+            session_id, user_id, ['active'], 'paused',
             {
-                '$set': {
-                    'endTime': end_time,
-                    'status': 'completed',
-                    'duration': duration,
-                    'updatedAt': datetime.now(timezone.utc),
-                    'version': session['version'] + 1
-                }
+                'activeSeconds': {'$add': [{'$ifNull': ['$activeSeconds', 0]}, SEGMENT_SECONDS]},
+                'segmentStart': None,
+                'pausedAt': '$$NOW'
             }
         )
         
-        if result.modified_count:
-            return {'message': 'Session stopped successfully'}, 200
-        sessions_ns.abort(404, 'Session not found or already stopped')
\ No newline at end of file
+        if not session:
+            sessions_ns.abort(404, 'Session not found or not active')
+        current_app.audit.record(
+            'pause_session', 'sessions', session_id, ObjectId(user_id),
+            new_value={'status': 'paused', 'activeSeconds': session['activeSeconds']}
+        )
+        return models.Session.from_bson(session).to_json()
+
+@sessions_ns.route('/<objectid:session_id>/resume')
+@sessions_ns.param('session_id', 'The session identifier')
+class SessionResume(Resource):
+    @sessions_ns.doc('resume_session', security='jwt')
+    @sessions_ns.response(200, 'Success', session_response_model)
+    @sessions_ns.response(404, 'Session not found or not paused')
+    def post(self, session_id):
+        """Resume a paused session"""
+        user_id = get_jwt_identity()
+        
+        session = transition_session(
+            session_id, user_id, ['paused'], 'active',
+            {
+                'segmentStart': '$$NOW',
+                'pausedAt': None
+            }
+        )
+        
+        if not session:
+            sessions_ns.abort(404, 'Session not found or not paused')
+        current_app.audit.record(
+            'resume_session', 'sessions', session_id, ObjectId(user_id),
+            new_value={'status': 'active'}
+        )
+        return models.Session.from_bson(session).to_json()
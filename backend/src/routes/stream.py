@@ -0,0 +1,119 @@
+# src/routes/stream.py
+from flask import Response, request, current_app, stream_with_context
+from flask_restx import Namespace, Resource, fields
+from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
+from bson.objectid import ObjectId
+from datetime import timedelta
+import time
+
+from changefeed import OVERFLOW
+from models import MODELS
+
+# Create API namespace (authenticated per route, see ChangeStream.get)
+stream_ns = Namespace('stream', description='Live change events')
+
+# Claim marking tokens that can only open a stream (enforced in app.py)
+STREAM_SCOPE = 'stream'
+
+stream_token_model = stream_ns.model('StreamToken', {
+    'expires_in': fields.Integer(description='Seconds the stream cookie stays valid')
+})
+
+def format_event(event):
+    data = current_app.json.dumps(MODELS[event['collection']].from_bson(event['doc']).to_json())
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+@stream_ns.route('/token')
+class StreamToken(Resource):
+    @stream_ns.doc('stream_token', security='jwt')
+    @stream_ns.response(200, 'Stream cookie set', stream_token_model)
+    @jwt_required()
+    def post(self):
+        """
+        Set the cookie EventSource authenticates the stream with.
+
+        EventSource cannot send an Authorization header, and a token in the
+        URL ends up in proxy logs. This sets a short-lived token that only
+        opens streams, in an HttpOnly cookie sent to /api/stream only; call
+        it again before reconnecting once it has expired.
+        """
+        config = current_app.config
+        seconds = config['STREAM_TOKEN_SECONDS']
+        token = create_access_token(
+            identity=get_jwt_identity(),
+            additional_claims={'scope': STREAM_SCOPE},
+            expires_delta=timedelta(seconds=seconds)
+        )
+        response = current_app.make_response(({'expires_in': seconds}, 200))
+        response.set_cookie(
+            config['JWT_ACCESS_COOKIE_NAME'], token,
+            max_age=seconds, path='/api/stream', httponly=True,
+            secure=config['JWT_COOKIE_SECURE'], samesite='Strict'
+        )
+        return response
+
+@stream_ns.route('')
+class ChangeStream(Resource):
+    @stream_ns.doc('stream_changes', security='jwt')
+    @stream_ns.response(200, 'text/event-stream of task.*, tag.* and session.* events')
+    @stream_ns.response(503, 'Too many open streams')
+    # EventSource sends the cookie set by POST /api/stream/token
+    @jwt_required(locations=['headers', 'cookies'])
+    def get(self):
+        """Stream the current user's task, tag and session changes as Server-Sent Events"""
+        user_id = ObjectId(get_jwt_identity())
+        feed = current_app.change_feed
+        config = current_app.config
+
+        # Cap open streams (each holds a queue, and a thread outside the
+        # gevent stream server); clients retry
+        sub = feed.subscribe(user_id, limit=config['STREAM_MAX_CONNECTIONS'])
+        if sub is None:
+            return Response('Too many open streams', 503, {'Retry-After': '5'})
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+
+        def generate():
+            try:
+                yield "retry: 3000\n\n"
+                replayed, replayed_to = set(), None
+                if last_event_id:
+                    events = feed.replay(user_id, last_event_id)
+                    if events is None:
+                        # Too old to resume; the client should refetch its lists
+                        yield "event: reset\ndata: {}\n\n"
+                    else:
+                        for event in events:
+                            yield format_event(event)
+                        replayed = {event['id'] for event in events}
+                        replayed_to = events[-1]['id'] if events else last_event_id
+
+                # Streams are closed periodically so connections are not
+                # held forever; the client reconnects with its last id
+                deadline = time.monotonic() + config['STREAM_MAX_SECONDS']
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    event = sub.get(timeout=min(config['STREAM_KEEPALIVE_SECONDS'], remaining))
+                    if event is None:
+                        yield ": keepalive\n\n"
+                        continue
+                    if event is OVERFLOW:
+                        break
+                    # Skip live events the replay already covered. Polling ids
+                    # are per document, so only the replayed ones are skipped:
+                    # a write in the last replayed millisecond can still follow
+                    if event['id'] in replayed:
+                        continue
+                    if replayed_to and replayed_to.startswith('c:') and event['id'][:2] == 'c:' and event['id'] <= replayed_to:
+                        continue
+                    yield format_event(event)
+            finally:
+                feed.unsubscribe(sub)
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
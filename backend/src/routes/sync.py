@@ -0,0 +1,160 @@
+# src/routes/sync.py
+from flask import request, current_app
+from flask_restx import Namespace, Resource, fields
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from bson.objectid import ObjectId
+from datetime import datetime, timedelta, timezone
+
+import models
+import session_store
+import tombstones
+from routes.sessions import session_response_model
+from routes.tags import tag_response_model
+from routes.tasks import task_response_model
+
+# Create API namespace; every route requires a token
+sync_ns = Namespace('sync', description='Delta sync for offline clients', decorators=[jwt_required()])
+
+# Collection -> key in the response
+SECTIONS = {'tasks': 'tasks', 'tags': 'tags', 'sessions': 'sessions', 'taskTags': 'task_tags'}
+
+task_tag_model = sync_ns.model('TaskTagLink', {
+    'task_id': fields.String(description='Task ID'),
+    'tag_id': fields.String(description='Tag ID'),
+    'created_at': fields.DateTime(description='When the tag was attached')
+})
+
+tombstone_model = sync_ns.model('Tombstone', {
+    '_id': fields.String(description='ID of the deleted task, tag or session'),
+    'task_id': fields.String(description='Task ID of a removed link'),
+    'tag_id': fields.String(description='Tag ID of a removed link'),
+    'deleted_at': fields.DateTime(description='Deletion timestamp')
+})
+
+sync_changes_model = sync_ns.model('SyncChanges', {
+    'tasks': fields.List(fields.Nested(task_response_model)),
+    'tags': fields.List(fields.Nested(tag_response_model)),
+    'sessions': fields.List(fields.Nested(session_response_model)),
+    'task_tags': fields.List(fields.Nested(task_tag_model), description='Current links of every task in tasks')
+})
+
+sync_deleted_model = sync_ns.model('SyncDeleted', {
+    name: fields.List(fields.Nested(tombstone_model)) for name in SECTIONS.values()
+})
+
+sync_response_model = sync_ns.model('SyncResponse', {
+    'cursor': fields.String(description='Pass as since on the next sync'),
+    'reset': fields.Boolean(description='changes is a full snapshot: replace local data instead of merging'),
+    'changes': fields.Nested(sync_changes_model, description='Created or updated documents; apply after deleted'),
+    'deleted': fields.Nested(sync_deleted_model, description='Documents to drop; apply first')
+})
+
+
+def format_cursor(when):
+    return str(int(when.timestamp() * 1000))
+
+
+def parse_cursor(cursor):
+    try:
+        return datetime.fromtimestamp(int(cursor) / 1000, tz=timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
+
+def changed_since(user_id, since):
+    # Restores put documents back with their old updatedAt and a new restoredAt
+    return {'userId': user_id, '$or': [{'updatedAt': {'$gte': since}}, {'restoredAt': {'$gte': since}}]}
+
+
+def link_json(link):
+    return {
+        'task_id': str(link['taskId']),
+        'tag_id': str(link['tagId']),
+        'created_at': link['createdAt'].isoformat() if link.get('createdAt') else None
+    }
+
+
+def tombstone_json(doc, deleted_at):
+    key = {'_id': str(doc['_id'])} if '_id' in doc else {'task_id': str(doc['taskId']), 'tag_id': str(doc['tagId'])}
+    return {**key, 'deleted_at': deleted_at.isoformat() if deleted_at else None}
+
+
+def collect(db, user_id, since, storage, session):
+    """Changed and deleted documents since the cursor time, or a snapshot when since is None"""
+    changes = {name: [] for name in SECTIONS.values()}
+    deleted = {name: [] for name in SECTIONS.values()}
+
+    if since is None:
+        live = {'userId': user_id, 'isActive': True}
+        docs = {
+            'tasks': db.tasks.find(live, session=session),
+            'tags': db.tags.find(live, session=session),
+            'sessions': session_store.list_sessions(db, user_id, storage, session=session)
+        }
+    else:
+        docs = {
+            'tasks': db.tasks.find(changed_since(user_id, since), session=session),
+            'tags': db.tags.find(changed_since(user_id, since), session=session),
+            'sessions': session_store.changed_sessions(db, user_id, since, storage, session=session)
+        }
+
+    for collection, cursor in docs.items():
+        model = models.MODELS[collection]
+        for doc in cursor:
+            if doc.get('isActive', True):
+                changes[collection].append(model.from_bson(doc).to_json())
+            else:
+                # Soft deletes are their own tombstones
+                deleted[collection].append(tombstone_json({'_id': doc['_id']}, doc.get('updatedAt')))
+
+    task_ids = [ObjectId(task['_id']) for task in changes['tasks']]
+    if task_ids:
+        links = db.taskTags.find({'taskId': {'$in': task_ids}}, session=session)
+        changes['task_tags'] = [link_json(link) for link in links]
+
+    if since is not None:
+        for tombstone in tombstones.since(db, user_id, since, session=session):
+            deleted[SECTIONS[tombstone['collection']]].append(tombstone_json(tombstone['key'], tombstone['deletedAt']))
+
+    return changes, deleted
+
+
+@sync_ns.route('')
+class Sync(Resource):
+    @sync_ns.doc('sync', security='jwt', params={
+        'since': 'Cursor from the previous sync; leave out for a full snapshot'
+    })
+    @sync_ns.response(200, 'Success', sync_response_model)
+    @sync_ns.response(400, 'Invalid cursor')
+    def get(self):
+        """
+        Everything that changed since the cursor, with tombstones for deletions.
+
+        Apply deleted first, then changes. The new cursor sits
+        SYNC_OVERLAP_SECONDS before the time of this read, so writes still in
+        flight (or stamped by a server with a slightly different clock) are
+        picked up next time; changes near the cursor may come back twice and
+        can be applied again or skipped by version. A cursor older than
+        SYNC_TOMBSTONE_DAYS, or none, returns a full snapshot with reset set.
+        """
+        user_id = ObjectId(get_jwt_identity())
+        config = current_app.config
+        started = datetime.now(timezone.utc)
+
+        since = None
+        if request.args.get('since'):
+            since = parse_cursor(request.args['since'])
+            if since is None:
+                sync_ns.abort(400, 'Invalid cursor')
+            # Tombstones from before then may have expired
+            if since < started - timedelta(days=config['SYNC_TOMBSTONE_DAYS']):
+                since = None
+
+        reads = current_app.reads
+        changes, deleted = collect(reads.db('sync'), user_id, since, config['SESSIONS_STORAGE'], reads.session())
+        return {
+            'cursor': format_cursor(started - timedelta(seconds=config['SYNC_OVERLAP_SECONDS'])),
+            'reset': since is None,
+            'changes': changes,
+            'deleted': deleted
+        }
@@ -1,35 +1,62 @@
-from flask import Blueprint, request, current_app
+from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson.objectid import ObjectId
 from datetime import datetime, timezone
 
-# Create both blueprint and API namespace
-tags_bp = Blueprint('tags', __name__)
-tags_ns = Namespace('tags', description='Tag operations')
+import autotag
+import jobs
+import models
+import raw_lists
+import tag_index
+from validation import ObjectIdField, Schema
 
-# Create route mappings
-@tags_bp.route('/', methods=['GET'])
-@jwt_required()
-def list_tags():
-    return TagList().get()
+# Create API namespace; every route requires a token
+tags_ns = Namespace('tags', description='Tag operations', decorators=[jwt_required()])
 
-@tags_bp.route('/', methods=['POST'])
-@jwt_required()
-def create_tag():
-    return TagList().post()
-
-@tags_bp.route('/<tag_id>', methods=['DELETE'])
-@jwt_required()
-def delete_tag(tag_id):
-    return Tag().delete(tag_id)
+# Helper function to transform tag rules
+def transform_tag_rule(rule):
+    return {
+        '_id': str(rule['_id']),
+        'pattern': rule['pattern'],
+        'is_regex': rule.get('isRegex', False),
+        'tag_ids': [str(tag_id) for tag_id in rule['tagIds']],
+        'user_id': str(rule['userId']),
+        'created_at': rule['createdAt'],
+        'updated_at': rule['updatedAt'],
+        'version': rule['version']
+    }
 
 tag_model = tags_ns.model('Tag', {
-    'name': fields.String(required=True, description='Tag name'),
+    'name': fields.String(required=True, min_length=1, description='Tag name'),
     'color': fields.String(required=True, description='Tag color hex code', 
                          pattern='^#([A-Fa-f0-9]{6}|[A-Fa-f0-9]{3})$')
 })
 
+tag_suggestion_model = tags_ns.model('TagSuggestion', {
+    '_id': fields.String(description='Tag ID'),
+    'name': fields.String(description='Tag name'),
+    'color': fields.String(description='Tag color hex code')
+})
+
+tag_rule_model = tags_ns.model('TagRule', {
+    'pattern': fields.String(required=True, description='Keyword, or regular expression when is_regex is set'),
+    'is_regex': fields.Boolean(required=False, default=False, description='Treat pattern as a regular expression'),
+    'tag_ids': fields.List(ObjectIdField, required=True, min_items=1, description='Tags applied when the pattern matches')
+})
+
+# Compiled once; handlers decode their body before touching the database
+tag_schema = Schema(tag_model)
+tag_rule_schema = Schema(tag_rule_model)
+
+tag_rule_response_model = tags_ns.inherit('TagRuleResponse', tag_rule_model, {
+    '_id': fields.String(description='Rule ID'),
+    'user_id': fields.String(description='User ID'),
+    'created_at': fields.DateTime(description='Creation timestamp'),
+    'updated_at': fields.DateTime(description='Last update timestamp'),
+    'version': fields.Integer(description='Document version')
+})
+
 tag_response_model = tags_ns.inherit('TagResponse', tag_model, {
     '_id': fields.String(description='Tag ID'),
     'user_id': fields.String(description='User ID'),
@@ -43,20 +70,17 @@ tag_response_model = tags_ns.inherit('TagResponse', tag_model, {
 class TagList(Resource):
     @tags_ns.doc('create_tag', security='jwt')
     @tags_ns.expect(tag_model)
-    @tags_ns.marshal_with(tag_response_model, code=201)
+    @tags_ns.response(201, 'Tag created', tag_response_model)
     @tags_ns.response(400, 'Validation Error')
     @tags_ns.response(409, 'Tag already exists')
     def post(self):
         """Create a new tag"""
         user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        if not data or not data.get('name'):
-            tags_ns.abort(400, 'Tag name is required')
+        body = tag_schema.load()
         
         # Check if tag already exists for this user
         existing_tag = current_app.mongo.db.tags.find_one({
-            'name': data['name'],
+            'name': body.name,
             'userId': ObjectId(user_id),
             'isActive': True
         })
@@ -67,72 +91,46 @@ class TagList(Resource):
         # Use timezone-aware datetime objects
         now = datetime.now(timezone.utc)
         
-        tag = {
-            'name': data['name'],
-            'color': data.get('color', '#000000'),
-            'userId': ObjectId(user_id),
-            'isActive': True,
-            'createdAt': now,
-            'updatedAt': now,
-            'version': 1
-        }
+        tag = models.Tag(ObjectId(user_id), body.name, body.color, created_at=now, updated_at=now)
         
-        result = current_app.mongo.db.tags.insert_one(tag)
-        
-        # Create a properly formatted response object
-        response = {
-            '_id': str(result.inserted_id),
-            'name': tag['name'],
-            'color': tag['color'],
-            'user_id': str(tag['userId']),
-            'is_active': tag['isActive'],
-            'created_at': tag['createdAt'],
-            'updated_at': tag['updatedAt'],
-            'version': tag['version']
-        }
+        tag.id = current_app.mongo.db.tags.insert_one(tag.to_bson()).inserted_id
+        tag_index.tag_created(ObjectId(user_id), tag.to_bson())
+        current_app.audit.record(
+            'create_tag', 'tags', tag.id, ObjectId(user_id),
+            new_value={'name': tag.name, 'color': tag.color}
+        )
         
-        return response, 201
+        return tag.to_json(), 201
 
     @tags_ns.doc('list_tags', security='jwt')
-    @tags_ns.marshal_list_with(tag_response_model)
+    @tags_ns.response(200, 'Success', [tag_response_model])
     def get(self):
         """List all tags for the current user"""
         user_id = get_jwt_identity()
-        tags = list(current_app.mongo.db.tags.find({
+        reads = current_app.reads
+        query = {
             'userId': ObjectId(user_id),
             'isActive': True
-        }))
-        
-        # Transform each tag to match the response model
-        transformed_tags = []
-        for tag in tags:
-            transformed_tags.append({
-                '_id': str(tag['_id']),
-                'name': tag['name'],
-                'color': tag['color'],
-                'user_id': str(tag['userId']),
-                'is_active': tag['isActive'],
-                'created_at': tag['createdAt'],
-                'updated_at': tag['updatedAt'],
-                'version': tag['version']
-            })
-        
-        return transformed_tags
-
-@tags_ns.route('/<tag_id>')
+        }
+        if current_app.config['LISTS_RAW_BSON']:
+            return raw_lists.response(reads.db('lists').tags, query, session=reads.session())
+        tags = reads.db('lists').tags.find(query, session=reads.session())
+        return [models.Tag.from_bson(tag).to_json() for tag in tags]
+
+@tags_ns.route('/<objectid:tag_id>')
 @tags_ns.param('tag_id', 'The tag identifier')
 class Tag(Resource):
     @tags_ns.doc('delete_tag', security='jwt')
-    @tags_ns.response(200, 'Success')
+    @tags_ns.response(202, 'Tag deleted, task cleanup scheduled')
     @tags_ns.response(404, 'Tag not found')
     def delete(self, tag_id):
         """Delete a tag"""
         user_id = get_jwt_identity()
         
         # Soft delete by setting isActive to False
-        result = current_app.mongo.db.tags.update_one(
+        deleted_tag = current_app.mongo.db.tags.find_one_and_update(
             {
-                '_id': ObjectId(tag_id),
+                '_id': tag_id,
                 'userId': ObjectId(user_id),
                 'isActive': True
             },
@@ -142,11 +140,152 @@ class Tag(Resource):
                     'updatedAt': datetime.now(timezone.utc),  # Use timezone-aware datetime
                     'updatedBy': ObjectId(user_id)  # Add updatedBy field
                 }
+            },
+            projection={'name': 1}
+        )
+        
+        if deleted_tag:
+            # Stop auto-tagging rules from re-attaching it
+            current_app.mongo.db.tagRules.update_many(
+                {'userId': ObjectId(user_id), 'tagIds': tag_id},
+                {
+                    '$pull': {'tagIds': tag_id},
+                    '$set': {'updatedAt': datetime.now(timezone.utc)},
+                    '$inc': {'version': 1}
+                }
+            )
+            autotag.invalidate(ObjectId(user_id))
+            tag_index.tag_deleted(ObjectId(user_id), deleted_tag['_id'], deleted_tag['name'])
+            current_app.audit.record('delete_tag', 'tags', tag_id, ObjectId(user_id), old_value={'name': deleted_tag['name']})
+            
+            # Removing the tag from every task can be slow, so it runs in the background
+            job_id = jobs.enqueue(
+                current_app.mongo.db,
+                'tag_cascade',
+                {'user_id': user_id, 'tag_id': str(tag_id)},
+                user_id=ObjectId(user_id)
+            )
+            return {'message': 'Tag deleted successfully', 'job_id': str(job_id)}, 202
+        tags_ns.abort(404, 'Tag not found')
+
+@tags_ns.route('/suggest')
+class TagSuggest(Resource):
+    @tags_ns.doc('suggest_tags', security='jwt', params={
+        'prefix': 'Start of the tag name',
+        'limit': 'Maximum number of suggestions (default 10)'
+    })
+    @tags_ns.marshal_list_with(tag_suggestion_model)
+    def get(self):
+        """Autocomplete tag names for the current user"""
+        user_id = get_jwt_identity()
+        prefix = request.args.get('prefix', '')
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        
+        # Served from an in-memory prefix index, not from Mongo
+        return tag_index.suggest(current_app.reads.db('lists'), ObjectId(user_id), prefix, limit)
+
+@tags_ns.route('/rules')
+class TagRuleList(Resource):
+    @tags_ns.doc('list_tag_rules', security='jwt')
+    @tags_ns.marshal_list_with(tag_rule_response_model)
+    def get(self):
+        """List the automatic tagging rules for the current user"""
+        user_id = get_jwt_identity()
+        reads = current_app.reads
+        rules = reads.db('lists').tagRules.find({
+            'userId': ObjectId(user_id),
+            'isActive': True
+        }, session=reads.session()).sort('createdAt', 1)
+        
+        return [transform_tag_rule(rule) for rule in rules]
+
+    @tags_ns.doc('create_tag_rule', security='jwt')
+    @tags_ns.expect(tag_rule_model)
+    @tags_ns.marshal_with(tag_rule_response_model, code=201)
+    @tags_ns.response(400, 'Validation Error')
+    def post(self):
+        """Create an automatic tagging rule"""
+        user_id = get_jwt_identity()
+        body = tag_rule_schema.load()
+        
+        error = autotag.validate_pattern(body.pattern, body.is_regex)
+        if error:
+            tags_ns.abort(400, error)
+        tag_ids = body.tag_ids
+        
+        # Rules may only apply the user's own active tags
+        owned = current_app.mongo.db.tags.count_documents({
+            '_id': {'$in': tag_ids},
+            'userId': ObjectId(user_id),
+            'isActive': True
+        })
+        if owned != len(set(tag_ids)):
+            tags_ns.abort(400, 'Unknown tag id')
+        
+        now = datetime.now(timezone.utc)
+        rule = {
+            'pattern': body.pattern,
+            'isRegex': body.is_regex,
+            'tagIds': tag_ids,
+            'userId': ObjectId(user_id),
+            'isActive': True,
+            'createdAt': now,
+            'updatedAt': now,
+            'version': 1
+        }
+        
+        result = current_app.mongo.db.tagRules.insert_one(rule)
+        autotag.invalidate(ObjectId(user_id))
+        current_app.audit.record(
+            'create_tag_rule', 'tagRules', result.inserted_id, ObjectId(user_id),
+            new_value={'pattern': rule['pattern'], 'isRegex': body.is_regex, 'tagIds': tag_ids}
+        )
+        
+        return transform_tag_rule({'_id': result.inserted_id, **rule}), 201
+
+@tags_ns.route('/rules/<objectid:rule_id>')
+@tags_ns.param('rule_id', 'The tag rule identifier')
+class TagRule(Resource):
+    @tags_ns.doc('delete_tag_rule', security='jwt')
+    @tags_ns.response(200, 'Success')
+    @tags_ns.response(404, 'Tag rule not found')
+    def delete(self, rule_id):
+        """Delete an automatic tagging rule"""
+        user_id = get_jwt_identity()
+        
+        result = current_app.mongo.db.tagRules.update_one(
+            {
+                '_id': rule_id,
+                'userId': ObjectId(user_id),
+                'isActive': True
+            },
+            {
+                '$set': {
+                    'isActive': False,
+                    'updatedAt': datetime.now(timezone.utc)
+                },
+                '$inc': {'version': 1}
             }
         )
         
         if result.modified_count:
-            # Also remove this tag from all tasks
-            current_app.mongo.db.taskTags.delete_many({'tagId': ObjectId(tag_id)})
-            return {'message': 'Tag deleted successfully'}, 200
-        tags_ns.abort(404, 'Tag not found')
\ No newline at end of file
+            autotag.invalidate(ObjectId(user_id))
+            current_app.audit.record('delete_tag_rule', 'tagRules', rule_id, ObjectId(user_id))
+            return {'message': 'Tag rule deleted successfully'}, 200
+        tags_ns.abort(404, 'Tag rule not found')
+
+@tags_ns.route('/rules/apply')
+class ApplyTagRules(Resource):
+    @tags_ns.doc('apply_tag_rules', security='jwt')
+    @tags_ns.response(202, 'Retro-tagging job scheduled')
+    def post(self):
+        """Apply the current user's tagging rules to all existing tasks"""
+        user_id = get_jwt_identity()
+        job_id = jobs.enqueue(
+            current_app.mongo.db,
+            'retro_tag',
+            {'user_id': user_id},
+            user_id=ObjectId(user_id)
+        )
+        current_app.audit.record('apply_tag_rules', 'jobs', job_id, ObjectId(user_id))
+        return {'message': 'Retro-tagging scheduled', 'job_id': str(job_id)}, 202
\ No newline at end of file
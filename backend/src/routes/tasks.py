@@ -1,83 +1,36 @@
-from flask import Blueprint, request, current_app, jsonify
+from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
 from datetime import datetime, timezone
 
-# Create both blueprint and API namespace
-tasks_bp = Blueprint('tasks', __name__)
-tasks_ns = Namespace('tasks', description='Task operations')
+import autotag
+import models
+import raw_lists
+import task_tags
+from validation import Schema
 
-# Helper function to transform tasks
-def transform_task(task):
-    return {
-        '_id': str(task['_id']),
-        'title': task['title'],
-        'description': task.get('description', ''),
-        'status': task.get('status', 'pending'),
-        'task_type': task.get('taskType', ''),
-        'user_id': str(task['userId']),
-        'is_active': task.get('isActive', True),
-        'created_at': task.get('createdAt'),
-        'updated_at': task.get('updatedAt'),
-        'version': task.get('version', 1)
-    }
-
-# Create route mappings with EXPLICIT blueprint routes
-@tasks_bp.route('/', methods=['GET'])
-@jwt_required()
-def list_tasks():
-    return TaskList().get()
-
-@tasks_bp.route('/', methods=['POST'])
-@jwt_required()
-def create_task():
-    return TaskList().post()
-
-# Add explicit blueprint routes for todos and distractions
-@tasks_bp.route('/todos', methods=['GET'])
-@jwt_required()
-def list_todos():
-    user_id = get_jwt_identity()
-    tasks = list(current_app.mongo.db.tasks.find({
-        'userId': ObjectId(user_id),
-        'isActive': True,
-        'taskType': 'todo'
-    }))
-    
-    transformed_tasks = [transform_task(task) for task in tasks]
-    return transformed_tasks
-
-@tasks_bp.route('/distractions', methods=['GET'])
-@jwt_required()
-def list_distractions():
-    user_id = get_jwt_identity()
-    tasks = list(current_app.mongo.db.tasks.find({
-        'userId': ObjectId(user_id),
-        'isActive': True,
-        'taskType': 'distraction'
-    }))
-    
-    transformed_tasks = [transform_task(task) for task in tasks]
-    return transformed_tasks
+# Create API namespace; every route requires a token
+tasks_ns = Namespace('tasks', description='Task operations', decorators=[jwt_required()])
 
-# Add new route for completing a task
-@tasks_bp.route('/complete/<task_id>', methods=['POST'])
-@jwt_required()
-def complete_task(task_id):
-    return CompleteTask().post(task_id)
-
-# Define models for swagger documentation
+# Define models for swagger documentation (responses are built by
+# models.Task.to_json, which produces the TaskResponse shape)
 task_model = tasks_ns.model('Task', {
-    'title': fields.String(required=True, description='Task title'),
-    'description': fields.String(required=False, description='Task description'),
-    'status': fields.String(required=False, description='Task status', enum=['pending', 'active', 'completed']),
+    'title': fields.String(required=True, min_length=1, description='Task title'),
+    'description': fields.String(required=False, default='', description='Task description'),
+    'status': fields.String(required=False, default='pending', description='Task status', enum=['pending', 'active', 'completed']),
     'task_type': fields.String(required=True, description='Task type', enum=['todo', 'distraction']),
     }
 )
 
+# Compiled once; handlers decode their body before touching the database
+task_schema = Schema(task_model)
+
 task_response_model = tasks_ns.inherit('TaskResponse', task_model, {
     '_id': fields.String(description='Task ID'),
+    'tag_ids': fields.List(fields.String, description='IDs of the tags attached to the task'),
     'user_id': fields.String(description='User ID'),
     'is_active': fields.Boolean(description='Active status'),
     'created_at': fields.DateTime(description='Creation timestamp'),
@@ -85,93 +38,202 @@ task_response_model = tasks_ns.inherit('TaskResponse', task_model, {
     'version': fields.Integer(description='Document version')
 })
 
+task_search_result_model = tasks_ns.inherit('TaskSearchResult', task_response_model, {
+    'score': fields.Float(description='Text search relevance')
+})
+
+task_search_response_model = tasks_ns.model('TaskSearchResponse', {
+    'items': fields.List(fields.Nested(task_search_result_model)),
+    'total': fields.Integer(description='Total number of matching tasks'),
+    'page': fields.Integer(description='Current page'),
+    'per_page': fields.Integer(description='Results per page')
+})
+
 @tasks_ns.route('/')
 class TaskList(Resource):
-    @tasks_ns.doc('list_tasks', security='jwt')
-    @tasks_ns.marshal_list_with(task_response_model)
+    @tasks_ns.doc('list_tasks', security='jwt', params={
+        'tags': 'Comma separated tag IDs to filter by',
+        'match': 'all (default) to require every tag, any to require at least one'
+    })
+    @tasks_ns.response(200, 'Success', [task_response_model])
+    @tasks_ns.response(400, 'Validation Error')
     def get(self):
         """List all tasks for the current user"""
         user_id = get_jwt_identity()
-        tasks = list(current_app.mongo.db.tasks.find({
+        query = {
             'userId': ObjectId(user_id),
             'isActive': True
-        }))
+        }
         
-        transformed_tasks = [transform_task(task) for task in tasks]
-        return transformed_tasks
+        if request.args.get('tags'):
+            match = request.args.get('match', 'all')
+            if match not in ('all', 'any'):
+                tasks_ns.abort(400, "match must be 'all' or 'any'")
+            try:
+                tag_ids = [ObjectId(tag_id) for tag_id in request.args['tags'].split(',') if tag_id]
+            except Exception:
+                tasks_ns.abort(400, 'Invalid tag id')
+            query.update(task_tags.tag_filter(tag_ids, match))
+        
+        reads = current_app.reads
+        if current_app.config['LISTS_RAW_BSON']:
+            return raw_lists.response(reads.db('lists').tasks, query, session=reads.session())
+        tasks = reads.db('lists').tasks.find(query, session=reads.session())
+        return [models.Task.from_bson(task).to_json() for task in tasks]
 
     @tasks_ns.doc('create_task', security='jwt')
     @tasks_ns.expect(task_model)
-    @tasks_ns.marshal_with(task_response_model, code=201)
+    @tasks_ns.response(201, 'Task created', task_response_model)
     @tasks_ns.response(400, 'Validation Error')
     def post(self):
         """Create a new task"""
         user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        if not data or not data.get('title'):
-            tasks_ns.abort(400, 'Task title is required')
+        body = task_schema.load()
         
         # Use timezone-aware datetime objects
         now = datetime.now(timezone.utc)
         
-        task = {
-            'title': data['title'],
-            'description': data.get('description', ''),
-            'taskType': data['task_type'],
-            'status': data.get('status', 'pending'),
-            'userId': ObjectId(user_id),
-            'isActive': True,
-            'createdAt': now,
-            'updatedAt': now,
-            'version': 1
-        }
+        task = models.Task(
+            ObjectId(user_id), body.title, body.task_type, body.description, body.status,
+            created_at=now, updated_at=now
+        )
         
-        result = current_app.mongo.db.tasks.insert_one(task)
+        # Tags from the user's automatic tagging rules are stored with the task
+        task.tag_ids = autotag.match_task(current_app.mongo.db, ObjectId(user_id), task.to_bson())
         
-        # Create a properly formatted response object with mapped fields
-        response = transform_task({
-            '_id': result.inserted_id,
-            **task
-        })
+        result = current_app.mongo.db.tasks.insert_one(task.to_bson())
+        task.id = result.inserted_id
+        task_tags.insert_links(current_app.mongo.db, task.id, task.tag_ids, now)
+        current_app.audit.record(
+            'create_task', 'tasks', task.id, ObjectId(user_id),
+            new_value={'title': task.title, 'taskType': task.task_type, 'status': task.status}
+        )
         
-        return response, 201
+        return task.to_json(), 201
     
-# Keep the namespace routes for Swagger documentation
+@tasks_ns.route('/search')
+class TaskSearch(Resource):
+    @tasks_ns.doc('search_tasks', security='jwt', params={
+        'q': 'Words to search for in task titles and descriptions',
+        'taskType': 'Filter by task type (todo or distraction)',
+        'status': 'Filter by status (pending, active or completed)',
+        'page': 'Page number, starting at 1',
+        'per_page': 'Results per page (default 20, max 100)'
+    })
+    @tasks_ns.response(200, 'Success', task_search_response_model)
+    @tasks_ns.response(400, 'Validation Error')
+    @tasks_ns.response(503, 'Search index missing')
+    def get(self):
+        """Full-text search over the current user's tasks, ranked by relevance"""
+        user_id = get_jwt_identity()
+        q = request.args.get('q', '').strip()
+        if not q:
+            tasks_ns.abort(400, 'Search query is required')
+        
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+        
+        query = {
+            '$text': {'$search': q},
+            'userId': ObjectId(user_id),
+            'isActive': True
+        }
+        if request.args.get('taskType'):
+            query['taskType'] = request.args['taskType']
+        if request.args.get('status'):
+            query['status'] = request.args['status']
+        
+        score = {'score': {'$meta': 'textScore'}}
+        reads = current_app.reads
+        db = reads.db('lists')
+        try:
+            tasks = db.tasks.find(query, score, session=reads.session()) \
+                .sort([('score', {'$meta': 'textScore'})]) \
+                .skip((page - 1) * per_page) \
+                .limit(per_page)
+            items = [{**models.Task.from_bson(task).to_json(), 'score': task.get('score')} for task in tasks]
+            total = db.tasks.count_documents(query, session=reads.session())
+        except OperationFailure as e:
+            # IndexNotFound: the text index is created at startup, so it
+            # could not be built there (see indexes.py)
+            if e.code == 27:
+                tasks_ns.abort(503, 'Task search is unavailable: the text index is missing')
+            raise
+        return {
+            'items': items,
+            'total': total,
+            'page': page,
+            'per_page': per_page
+        }
+
 @tasks_ns.route('/todos')
 class TodoList(Resource):
     @tasks_ns.doc('list_todos', security='jwt')
-    @tasks_ns.marshal_list_with(task_response_model)
+    @tasks_ns.response(200, 'Success', [task_response_model])
     def get(self):
         """List all todo tasks for the current user"""
         user_id = get_jwt_identity()
-        tasks = list(current_app.mongo.db.tasks.find({
+        reads = current_app.reads
+        tasks = reads.db('lists').tasks.find({
             'userId': ObjectId(user_id),
             'isActive': True,
             'taskType': 'todo'
-        }))
-        
-        transformed_tasks = [transform_task(task) for task in tasks]
-        return transformed_tasks
+        }, session=reads.session())
+        return [models.Task.from_bson(task).to_json() for task in tasks]
 
 @tasks_ns.route('/distractions')
 class DistractionList(Resource):
     @tasks_ns.doc('list_distractions', security='jwt')
-    @tasks_ns.marshal_list_with(task_response_model)
+    @tasks_ns.response(200, 'Success', [task_response_model])
     def get(self):
         """List all distraction tasks for the current user"""
         user_id = get_jwt_identity()
-        tasks = list(current_app.mongo.db.tasks.find({
+        reads = current_app.reads
+        tasks = reads.db('lists').tasks.find({
             'userId': ObjectId(user_id),
             'isActive': True,
             'taskType': 'distraction'
-        }))
+        }, session=reads.session())
+        return [models.Task.from_bson(task).to_json() for task in tasks]
+
+@tasks_ns.route('/<objectid:task_id>/tags/<objectid:tag_id>')
+@tasks_ns.param('task_id', 'The task identifier')
+@tasks_ns.param('tag_id', 'The tag identifier')
+class TaskTag(Resource):
+    def _check_ownership(self, user_id, task_id, tag_id):
+        db = current_app.mongo.db
+        if not db.tasks.count_documents({'_id': task_id, 'userId': user_id, 'isActive': True}, limit=1):
+            tasks_ns.abort(404, 'Task not found')
+        if not db.tags.count_documents({'_id': tag_id, 'userId': user_id, 'isActive': True}, limit=1):
+            tasks_ns.abort(404, 'Tag not found')
+
+    @tasks_ns.doc('attach_task_tag', security='jwt')
+    @tasks_ns.response(200, 'Tag attached')
+    @tasks_ns.response(404, 'Task or tag not found')
+    def post(self, task_id, tag_id):
+        """Attach a tag to a task"""
+        user_id = ObjectId(get_jwt_identity())
+        self._check_ownership(user_id, task_id, tag_id)
+        
+        task_tags.attach(current_app.mongo.db, task_id, [tag_id])
+        current_app.audit.record('attach_tag', 'tasks', task_id, user_id, new_value={'tagId': tag_id})
+        return {'message': 'Tag attached successfully'}, 200
+
+    @tasks_ns.doc('detach_task_tag', security='jwt')
+    @tasks_ns.response(200, 'Tag detached')
+    @tasks_ns.response(404, 'Task or tag not found')
+    def delete(self, task_id, tag_id):
+        """Detach a tag from a task"""
+        user_id = ObjectId(get_jwt_identity())
+        self._check_ownership(user_id, task_id, tag_id)
         
-        transformed_tasks = [transform_task(task) for task in tasks]
-        return transformed_tasks
+        if task_tags.detach(current_app.mongo.db, user_id, task_id, tag_id):
+            current_app.audit.record('detach_tag', 'tasks', task_id, user_id, old_value={'tagId': tag_id})
+            return {'message': 'Tag detached successfully'}, 200
+        return {'message': 'Tag is not attached to this task'}, 404
 
 # Add new namespace route for completing a task
-@tasks_ns.route('/complete/<task_id>')
+@tasks_ns.route('/complete/<objectid:task_id>')
 @tasks_ns.param('task_id', 'The task identifier')
 class CompleteTask(Resource):
     @tasks_ns.doc('complete_task', security='jwt')
@@ -181,35 +243,28 @@ class CompleteTask(Resource):
         """Mark a task as completed"""
         user_id = get_jwt_identity()
         
-        # Find the task first to check if it exists and get its current version
-        task = current_app.mongo.db.tasks.find_one({
-            '_id': ObjectId(task_id),
-            'userId': ObjectId(user_id),
-            'isActive': True
-        })
-        
-        if not task:
-            return {'message': 'Task not found'}, 404
-        
-        # Update the task to mark it as completed
-        now = datetime.now(timezone.utc)
-        
-        result = current_app.mongo.db.tasks.update_one(
+        # Mark it completed in one atomic write, keeping the old status for the audit log
+        task = current_app.mongo.db.tasks.find_one_and_update(
             {
-                '_id': ObjectId(task_id),
+                '_id': task_id,
                 'userId': ObjectId(user_id),
                 'isActive': True
             },
             {
-                '$set': {
-                    'status': 'completed',
-                    'updatedAt': now,
-                    'version': task['version'] + 1
-                }
-            }
+                '$set': {'status': 'completed'},
+                '$currentDate': {'updatedAt': True},
+                '$inc': {'version': 1}
+            },
+            projection={'status': 1},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.modified_count:
-            return {'message': 'Task completed successfully'}, 200
+        if not task:
+            return {'message': 'Task not found'}, 404
         
-        return {'message': 'Task not updated. No changes made.'}, 400
\ No newline at end of file
+        current_app.audit.record(
+            'complete_task', 'tasks', task_id, ObjectId(user_id),
+            old_value={'status': task['status']},
+            new_value={'status': 'completed'}
+        )
+        return {'message': 'Task completed successfully'}, 200
\ No newline at end of file
@@ -0,0 +1,42 @@
+# src/routes/timer_types.py
+from flask import request, current_app
+from flask_restx import Namespace, Resource, fields
+from flask_jwt_extended import jwt_required
+
+# Create API namespace; every route requires a token
+timer_types_ns = Namespace('timer-types', description='Timer type reference data', decorators=[jwt_required()])
+
+timer_type_response_model = timer_types_ns.model('TimerTypeResponse', {
+    '_id': fields.String(description='Timer type ID'),
+    'type_name': fields.String(description='Timer type name'),
+    'description': fields.String(description='Timer type description'),
+    'work_duration': fields.Integer(description='Default work duration in minutes'),
+    'break_duration': fields.Integer(description='Default break duration in minutes'),
+    'is_active': fields.Boolean(description='Whether sessions can use this timer type'),
+    'created_at': fields.DateTime(description='Creation timestamp'),
+    'updated_at': fields.DateTime(description='Last update timestamp'),
+    'version': fields.Integer(description='Document version')
+})
+
+
+@timer_types_ns.route('')
+class TimerTypeList(Resource):
+    @timer_types_ns.doc('list_timer_types', security='jwt')
+    @timer_types_ns.response(200, 'Success', [timer_type_response_model])
+    @timer_types_ns.response(304, 'Not modified since the ETag in If-None-Match')
+    def get(self):
+        """
+        List the active timer types.
+
+        Served from the process-wide cache (see reference_data.py) with the
+        body and ETag built at load time. Clients may keep it for
+        REFERENCE_MAX_AGE seconds and revalidate with If-None-Match after.
+        The endpoint needs a token, so the response is private: a shared
+        cache must not hand it to requests it has not seen authenticated.
+        """
+        snapshot = current_app.timer_types.snapshot()
+        response = current_app.response_class(snapshot.body + '\n', mimetype='application/json')
+        response.set_etag(snapshot.etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = current_app.config['REFERENCE_MAX_AGE']
+        return response.make_conditional(request)
@@ -1,24 +1,16 @@
 # src/routes/users.py
-from flask import Blueprint, request, current_app
+from flask import current_app
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson.objectid import ObjectId
-from datetime import datetime, timezone
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
-# Create both blueprint and API namespace
-users_bp = Blueprint('users', __name__)
-users_ns = Namespace('users', description='User operations')
+import models
+from validation import Schema, provided
 
-# Create route mappings
-@users_bp.route('/me')
-@jwt_required()
-def get_current_user():
-    return CurrentUser().get()
-
-@users_bp.route('/profile', methods=['PUT'])
-@jwt_required()
-def update_profile():
-    return UserProfile().put()
+# Create API namespace; every route requires a token
+users_ns = Namespace('users', description='User operations', decorators=[jwt_required()])
 
 # Define models for swagger documentation
 user_response_model = users_ns.model('UserResponse', {
@@ -35,38 +27,28 @@ user_response_model = users_ns.model('UserResponse', {
 })
 
 profile_update_model = users_ns.model('ProfileUpdate', {
-    'name': fields.String(required=True, description='User name'),
-    'username': fields.String(required=True, description='Username')
+    'name': fields.String(required=False, description='User name; null clears it'),
+    'username': fields.String(required=True, min_length=1, description='Username')
 })
 
+# Compiled once; updates are partial, so required fields may be left out
+# (but not set to null)
+profile_update_schema = Schema(profile_update_model)
+
 @users_ns.route('/me')
 class CurrentUser(Resource):
     @users_ns.doc('get_current_user', security='jwt')
-    @users_ns.marshal_with(user_response_model)
+    @users_ns.response(200, 'Success', user_response_model)
     def get(self):
         """Get current user profile"""
         try:
             user_id = get_jwt_identity()
-            user = current_app.mongo.db.users.find_one({'_id': ObjectId(user_id)})
+            user = current_app.reads.db('auth').users.find_one({'_id': ObjectId(user_id)})
             
             if not user:
                 users_ns.abort(404, 'User not found')
             
-            # Transform the document to match the response model
-            transformed_user = {
-                '_id': str(user['_id']),
-                'email': user['email'],
-                'username': user['username'],
-                'name': user['name'],
-                'user_type': user['userType'],
-                'is_active': user['isActive'],
-                'created_at': user['createdAt'],
-                'updated_at': user['updatedAt'],
-                'last_login_at': user['lastLoginAt'],
-                'version': user['version']
-            }
-            
-            return transformed_user
+            return models.User.from_bson(user).to_json()
             
         except Exception as e:
             users_ns.abort(500, str(e))
@@ -80,42 +62,45 @@ class UserProfile(Resource):
     @users_ns.response(409, 'Username already exists')
     def put(self):
         """Update user profile"""
+        # The schema only has name and username, so email, password and
+        # userType cannot be changed through this endpoint
+        body = profile_update_schema.load(partial=True)
         try:
             user_id = get_jwt_identity()
-            data = request.get_json()
-            
-            # Check if username exists (if username is being updated)
-            if 'username' in data:
-                existing_user = current_app.mongo.db.users.find_one({
-                    'username': data['username'],
-                    '_id': {'$ne': ObjectId(user_id)}
-                })
-                if existing_user:
-                    return {'message': 'Username already taken'}, 409
-            
-            # Don't allow email/password/userType updates through this endpoint
-            allowed_updates = ['name', 'username']
             update_data = {
-                to_camel_case(k): v 
-                for k, v in data.items() 
-                if k in allowed_updates
+                to_camel_case(k): v
+                for k, v in provided(body).items()
             }
+            if not update_data:
+                return {'message': 'No changes made'}, 200
             
-            # Add metadata updates
-            current_user = current_app.mongo.db.users.find_one({'_id': ObjectId(user_id)})
-            update_data.update({
-                'updatedAt': datetime.now(timezone.utc),
-                'version': current_user['version'] + 1
-            })
+            # Fields sent as null are removed, so they read back as their defaults
+            update = {'$currentDate': {'updatedAt': True}, '$inc': {'version': 1}}
+            values = {k: v for k, v in update_data.items() if v is not None}
+            if values:
+                update['$set'] = values
+            if len(values) < len(update_data):
+                update['$unset'] = {k: '' for k, v in update_data.items() if v is None}
             
-            result = current_app.mongo.db.users.update_one(
-                {'_id': ObjectId(user_id)},
-                {'$set': update_data}
-            )
+            # A taken username is rejected by the unique index (see indexes.py)
+            try:
+                previous = current_app.mongo.db.users.find_one_and_update(
+                    {'_id': ObjectId(user_id)},
+                    update,
+                    projection={k: 1 for k in update_data},
+                    return_document=ReturnDocument.BEFORE
+                )
+            except DuplicateKeyError:
+                return {'message': 'Username already taken'}, 409
             
-            if result.modified_count:
-                return {'message': 'Profile updated successfully'}, 200
-            return {'message': 'No changes made'}, 200
+            if not previous:
+                return {'message': 'User not found'}, 404
+            current_app.audit.record(
+                'update_profile', 'users', ObjectId(user_id), ObjectId(user_id),
+                old_value={k: previous.get(k) for k in update_data},
+                new_value=update_data
+            )
+            return {'message': 'Profile updated successfully'}, 200
             
         except Exception as e:
             users_ns.abort(500, str(e))
@@ -0,0 +1,180 @@
+# src/session_store.py
+"""
+Session storage layouts.
+
+With SESSIONS_STORAGE=documents (the default) every session lives in the
+sessions collection. With SESSIONS_STORAGE=timeseries only active and paused
+sessions, plus recently completed ones, stay there. Completed sessions
+are moved into sessionHistory, a time-series collection keyed on startTime
+with the user and timer type as its metaField. MongoDB stores those in
+compressed columnar buckets, so userId/timerTypeId are not repeated per
+session and a date range for one user reads a handful of buckets.
+
+Completed sessions are immutable, which is what time-series collections
+are suited to; the pause/resume/stop updates only ever touch sessions.
+
+    python -m session_store status
+    python -m session_store migrate --batch-size 1000
+    python -m session_store restore
+"""
+from datetime import datetime, timedelta, timezone
+import time
+
+from pymongo import ASCENDING, ReplaceOne
+
+HISTORY = 'sessionHistory'
+
+# Fields kept on the bucket metadata instead of on each measurement
+META_FIELDS = ('userId', 'timerTypeId')
+
+
+def ensure_history(db):
+    """Create the time-series collection and its index if needed"""
+    if HISTORY not in db.list_collection_names():
+        db.create_collection(HISTORY, timeseries={
+            'timeField': 'startTime',
+            'metaField': 'meta',
+            'granularity': 'hours'
+        })
+    db[HISTORY].create_index([('meta.userId', ASCENDING), ('startTime', ASCENDING)])
+    # Incremental analytics exports
+    db[HISTORY].create_index([('updatedAt', ASCENDING)])
+
+
+def to_measurement(session):
+    # Unset fields (taskId, segmentStart, pausedAt...) are not stored at all
+    measurement = {
+        k: v for k, v in session.items()
+        if k not in META_FIELDS and k != 'status' and v is not None
+    }
+    measurement['meta'] = {k: session.get(k) for k in META_FIELDS}
+    return measurement
+
+
+def from_measurement(measurement):
+    session = {k: v for k, v in measurement.items() if k != 'meta'}
+    session.update(measurement['meta'])
+    session['status'] = 'completed'
+    return session
+
+
+def list_sessions(db, user_id, storage='documents', session=None):
+    """All of a user's sessions in the session document shape"""
+    live = list(db.sessions.find({'userId': user_id, 'isActive': True}, session=session))
+    if storage != 'timeseries':
+        return live
+
+    # A move interrupted between insert and delete leaves a session in both
+    seen = {session['_id'] for session in live}
+    history = [
+        from_measurement(doc)
+        for doc in db[HISTORY].find({'meta.userId': user_id, 'isActive': True}, session=session).sort('startTime', ASCENDING)
+        if doc['_id'] not in seen
+    ]
+    return sorted(history + live, key=lambda session: session['startTime'])
+
+
+def changed_sessions(db, user_id, since, storage='documents', session=None):
+    """A user's sessions written or restored at or after since, in the session document shape"""
+    changed = {'$or': [{'updatedAt': {'$gte': since}}, {'restoredAt': {'$gte': since}}]}
+    live = list(db.sessions.find({'userId': user_id, **changed}, session=session))
+    if storage != 'timeseries':
+        return live
+
+    # A session completed and archived since the client last synced is only
+    # in the history by now
+    seen = {session['_id'] for session in live}
+    history = [
+        from_measurement(doc)
+        for doc in db[HISTORY].find({'meta.userId': user_id, **changed}, session=session)
+        if doc['_id'] not in seen
+    ]
+    return live + history
+
+
+def archive_completed(db, user_id=None, older_than=timedelta(0), batch_size=500, pause=0.0, progress=None):
+    """
+    Move completed sessions that ended before now - older_than into
+    sessionHistory; returns how many were moved. Safe to rerun after an
+    interruption: each batch is inserted before it is deleted, and sessions
+    already in the history are not inserted twice. progress(moved, total)
+    is called after each batch.
+    """
+    ensure_history(db)
+    query = {'status': 'completed', 'endTime': {'$lte': datetime.now(timezone.utc) - older_than}}
+    if user_id is not None:
+        query['userId'] = user_id
+
+    total = db.sessions.count_documents(query) if progress else 0
+    moved = 0
+    while True:
+        batch = list(db.sessions.find(query).sort('_id', ASCENDING).limit(batch_size))
+        if not batch:
+            return moved
+        ids = [session['_id'] for session in batch]
+        archived = set(db[HISTORY].distinct('_id', {'_id': {'$in': ids}}))
+        measurements = [to_measurement(session) for session in batch if session['_id'] not in archived]
+        if measurements:
+            db[HISTORY].insert_many(measurements, ordered=False)
+        db.sessions.delete_many({'_id': {'$in': ids}, 'status': 'completed'})
+        moved += len(batch)
+        if progress:
+            progress(moved, total)
+        if pause:
+            time.sleep(pause)
+
+
+def restore(db, batch_size=500):
+    """Move every archived session back into sessions and drop the history"""
+    if HISTORY not in db.list_collection_names():
+        return 0
+    restored = 0
+    batch = []
+    for doc in db[HISTORY].find():
+        batch.append(ReplaceOne({'_id': doc['_id']}, from_measurement(doc), upsert=True))
+        if len(batch) == batch_size:
+            db.sessions.bulk_write(batch, ordered=False)
+            restored += len(batch)
+            batch = []
+    if batch:
+        db.sessions.bulk_write(batch, ordered=False)
+        restored += len(batch)
+    # Time-series collections only support deletes by metaField on older
+    # servers, so drop the whole collection once everything is copied back
+    db[HISTORY].drop()
+    return restored
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Move sessions between storage layouts')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='Show how many sessions each layout holds')
+    migrate_parser = subparsers.add_parser('migrate', help='Move completed sessions into the time-series collection')
+    migrate_parser.add_argument('--batch-size', type=int, default=500)
+    migrate_parser.add_argument('--pause-ms', type=int, default=0, help='Sleep between batches')
+    migrate_parser.add_argument('--older-than', type=int, default=0, help='Only sessions that ended this many seconds ago')
+    restore_parser = subparsers.add_parser('restore', help='Move archived sessions back into sessions')
+    restore_parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    from app import create_app
+
+    app = create_app()
+    db = app.mongo.db
+    if args.command == 'status':
+        print(f"sessions:      {db.sessions.count_documents({})} "
+              f"({db.sessions.count_documents({'status': 'completed'})} completed)")
+        history = db[HISTORY].count_documents({}) if HISTORY in db.list_collection_names() else 0
+        print(f"{HISTORY}: {history}")
+        print(f"SESSIONS_STORAGE={app.config['SESSIONS_STORAGE']}")
+    elif args.command == 'migrate':
+        started = time.time()
+        moved = archive_completed(db, older_than=timedelta(seconds=args.older_than),
+                                  batch_size=args.batch_size, pause=args.pause_ms / 1000)
+        print(f"Moved {moved} sessions in {time.time() - started:.1f}s")
+        if app.config['SESSIONS_STORAGE'] != 'timeseries':
+            print("Set SESSIONS_STORAGE=timeseries so the API reads the history collection")
+    else:
+        print(f"Restored {restore(db, args.batch_size)} sessions")
@@ -0,0 +1,34 @@
+# src/stream_server.py
+"""
+Server for the Server-Sent Events feed (/api/stream).
+
+An open stream spends most of its life waiting for the next event. Under
+the threaded development server each one pins a thread for up to
+STREAM_MAX_SECONDS, so a few hundred idle browsers starve the API. This
+runs the same app on gevent instead: the standard library is monkey
+patched, so every stream (and the change feed watcher) is a greenlet that
+costs a few kilobytes while it waits. nginx sends /api/stream here and
+everything else to app.py.
+
+Background jobs stay with the API process.
+
+    python src/stream_server.py
+"""
+from gevent import monkey
+
+# Must run before anything else imports socket, threading or queue
+monkey.patch_all()
+
+import os
+
+from gevent.pywsgi import WSGIServer
+
+os.environ.setdefault("JOBS_IN_PROCESS", "false")
+
+from app import create_app
+
+if __name__ == "__main__":
+    app = create_app()
+    port = int(os.getenv("STREAM_PORT", 5001))
+    print(f"Stream server on port {port}")
+    WSGIServer(("0.0.0.0", port), app).serve_forever()
@@ -0,0 +1,113 @@
+# src/tag_index.py
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+# Tries are rebuilt from Mongo after this long, so tag changes made through
+# other worker processes are eventually picked up
+REFRESH_SECONDS = 300
+
+# user_id -> (loaded at, trie), least recently used first and capped at
+# TAG_INDEX_CACHE_SIZE users
+_tries = OrderedDict()
+_lock = threading.Lock()
+
+
+class TagTrie:
+    """Case-insensitive prefix index over one user's tag names"""
+
+    def __init__(self, tags=()):
+        self.root = {}
+        for tag in tags:
+            self.insert(tag)
+
+    def insert(self, tag):
+        node = self.root
+        for char in tag['name'].lower():
+            node = node.setdefault(char, {})
+        node.setdefault(None, {})[str(tag['_id'])] = {
+            '_id': str(tag['_id']),
+            'name': tag['name'],
+            'color': tag['color']
+        }
+
+    def remove(self, tag_id, name):
+        path = [self.root]
+        for char in name.lower():
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].get(None, {}).pop(str(tag_id), None)
+        # Prune nodes that no longer lead anywhere
+        for char, parent, node in zip(reversed(name.lower()), reversed(path[:-1]), reversed(path[1:])):
+            if node.get(None) == {}:
+                del node[None]
+            if node:
+                break
+            del parent[char]
+
+    def search(self, prefix, limit=10):
+        node = self.root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return []
+
+        # Depth-first in character order gives alphabetical results, so we
+        # can stop as soon as enough have been collected
+        results = []
+        stack = [node]
+        while stack and len(results) < limit:
+            node = stack.pop()
+            results.extend(sorted(node.get(None, {}).values(), key=lambda t: t['name']))
+            stack.extend(node[char] for char in sorted((k for k in node if k is not None), reverse=True))
+        return results[:limit]
+
+
+def _load(db, user_id):
+    tags = db.tags.find(
+        {'userId': user_id, 'isActive': True},
+        {'name': 1, 'color': 1}
+    )
+    return TagTrie(tags)
+
+
+def _store(user_id, entry, now):
+    """Cache a trie, dropping expired entries and then the least recently used"""
+    with _lock:
+        _tries[user_id] = entry
+        _tries.move_to_end(user_id)
+        for expired in [key for key, (loaded, _) in _tries.items() if now - loaded > REFRESH_SECONDS]:
+            del _tries[expired]
+        while len(_tries) > current_app.config['TAG_INDEX_CACHE_SIZE']:
+            _tries.popitem(last=False)
+
+
+def suggest(db, user_id, prefix, limit=10):
+    now = time.monotonic()
+    with _lock:
+        entry = _tries.get(user_id)
+        if entry is not None:
+            _tries.move_to_end(user_id)
+    if entry is None or now - entry[0] > REFRESH_SECONDS:
+        entry = (now, _load(db, user_id))
+        _store(user_id, entry, now)
+    with _lock:
+        return entry[1].search(prefix, limit)
+
+
+def tag_created(user_id, tag):
+    with _lock:
+        entry = _tries.get(user_id)
+        if entry is not None:
+            entry[1].insert(tag)
+
+
+def tag_deleted(user_id, tag_id, name):
+    with _lock:
+        entry = _tries.get(user_id)
+        if entry is not None:
+            entry[1].remove(tag_id, name)
@@ -0,0 +1,111 @@
+# src/task_tags.py
+"""
+Task/tag links.
+
+Links live in the taskTags collection and are mirrored on each task as a
+denormalized tagIds array, so tag filters are a single indexed query on
+tasks. Every attach and detach goes through here to keep the two in sync.
+Removed links leave tombstones for delta sync.
+"""
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+
+import tombstones
+
+
+def link_operations(task_id, tag_ids, now):
+    """Idempotent taskTags upserts attaching tags to a task"""
+    return [
+        UpdateOne(
+            {'taskId': task_id, 'tagId': tag_id},
+            {'$setOnInsert': {'taskId': task_id, 'tagId': tag_id, 'createdAt': now, 'version': 1}},
+            upsert=True
+        )
+        for tag_id in tag_ids
+    ]
+
+
+def task_operation(task_id, tag_ids, now):
+    """Add tags to a task's denormalized tagIds array"""
+    return UpdateOne(
+        {'_id': task_id},
+        {
+            '$addToSet': {'tagIds': {'$each': list(tag_ids)}},
+            '$set': {'updatedAt': now},
+            '$inc': {'version': 1}
+        }
+    )
+
+
+def insert_links(db, task_id, tag_ids, now=None):
+    """Create taskTags for a new task whose tagIds were set on insert"""
+    if tag_ids:
+        db.taskTags.bulk_write(link_operations(task_id, tag_ids, now or datetime.now(timezone.utc)), ordered=False)
+
+
+def attach(db, task_id, tag_ids, now=None):
+    """Attach tags to an existing task; returns the number of new links"""
+    if not tag_ids:
+        return 0
+    now = now or datetime.now(timezone.utc)
+    result = db.taskTags.bulk_write(link_operations(task_id, tag_ids, now), ordered=False)
+    db.tasks.bulk_write([task_operation(task_id, tag_ids, now)])
+    return result.upserted_count
+
+
+def detach(db, user_id, task_id, tag_id):
+    """Detach one tag from a task; returns True if a link was removed"""
+    result = db.taskTags.delete_one({'taskId': task_id, 'tagId': tag_id})
+    if result.deleted_count:
+        tombstones.record(db, user_id, 'taskTags', [{'taskId': task_id, 'tagId': tag_id}])
+    db.tasks.update_one(
+        {'_id': task_id, 'tagIds': tag_id},
+        {
+            '$pull': {'tagIds': tag_id},
+            '$set': {'updatedAt': datetime.now(timezone.utc)},
+            '$inc': {'version': 1}
+        }
+    )
+    return result.deleted_count > 0
+
+
+def detach_everywhere(db, user_id, tag_id, batch_size=1000, progress=None):
+    """
+    Remove a deleted tag from every task of its owner, batch_size links at
+    a time; progress(done, total) is called after each batch. Safe to rerun.
+    """
+    def pull(query):
+        db.tasks.update_many(
+            {**query, 'userId': user_id, 'tagIds': tag_id},
+            {
+                '$pull': {'tagIds': tag_id},
+                '$set': {'updatedAt': datetime.now(timezone.utc)},
+                '$inc': {'version': 1}
+            }
+        )
+
+    # The tag is already inactive, so no new links can appear meanwhile
+    total = db.taskTags.count_documents({'tagId': tag_id})
+    done = 0
+    while True:
+        task_ids = [
+            link['taskId']
+            for link in db.taskTags.find({'tagId': tag_id}, {'taskId': 1, '_id': 0}).limit(batch_size)
+        ]
+        if not task_ids:
+            break
+        db.taskTags.delete_many({'tagId': tag_id, 'taskId': {'$in': task_ids}})
+        tombstones.record(db, user_id, 'taskTags', [{'taskId': task_id, 'tagId': tag_id} for task_id in task_ids])
+        pull({'_id': {'$in': task_ids}})
+        done += len(task_ids)
+        if progress:
+            progress(done, total)
+    # Tasks whose tagIds mention the tag without a link
+    pull({})
+    return done
+
+
+def tag_filter(tag_ids, match='all'):
+    """Query fragment selecting tasks by tag, served by the tagIds multikey index"""
+    return {'tagIds': {'$all' if match == 'all' else '$in': tag_ids}}
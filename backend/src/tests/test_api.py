@@ -2,12 +2,24 @@
 
 import pytest
 from app import create_app
+from jobs import enqueue, run_pending
+import analytics_export
+import indexes
+import profiling
+import retention
+import session_store
+import tag_index
+from audit import AuditWriter
+from bson.objectid import ObjectId
 from flask import json
 from flask_pymongo import PyMongo
+from pymongo import monitoring
 import logging
 import os
 import sys
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 # Set up logging
@@ -95,6 +107,23 @@ def auth_headers(client, test_user, test_db):
     token = login_response.json['access_token']
     return {'Authorization': f'Bearer {token}'}
 
+@pytest.fixture
+def timer_type(app, test_db):
+    """A Pomodoro timer type, with the reference data cache reloaded to see it"""
+    now = datetime.now()
+    timer_type_id = test_db.timerTypes.insert_one({
+        'typeName': 'Pomodoro',
+        'description': 'Standard 25/5 minute work/break cycle',
+        'workDuration': 25,
+        'breakDuration': 5,
+        'isActive': True,
+        'createdAt': now,
+        'updatedAt': now,
+        'version': 1
+    }).inserted_id
+    app.timer_types.reload()
+    return str(timer_type_id)
+
 def test_register(client, test_user, test_db):
     """Test user registration"""
     try:
@@ -190,4 +219,1002 @@ Response: {response.data.decode() if response.data else 'No response data'}
 Headers: {auth_headers}
 """
         log_test_result("test_protected_endpoint", False, error_details)
-        raise
\ No newline at end of file
+        raise
+
+def test_auto_tagging_rules(client, auth_headers, test_db):
+    """Test that tagging rules apply to new and existing tasks"""
+    try:
+        tag_response = client.post(
+            '/api/tags/',
+            json={'name': 'Meeting', 'color': '#800080'},
+            headers=auth_headers
+        )
+        tag_id = tag_response.json['_id']
+        
+        # Existing task created before the rule
+        client.post(
+            '/api/tasks/',
+            json={'title': 'Weekly meeting notes', 'task_type': 'todo'},
+            headers=auth_headers
+        )
+        
+        rule_response = client.post(
+            '/api/tags/rules',
+            json={'pattern': 'meeting|standup', 'is_regex': True, 'tag_ids': [tag_id]},
+            headers=auth_headers
+        )
+        assert rule_response.status_code == 201
+        
+        # New tasks are tagged at creation time
+        task_response = client.post(
+            '/api/tasks/',
+            json={'title': 'Daily STANDUP', 'task_type': 'todo'},
+            headers=auth_headers
+        )
+        assert task_response.status_code == 201
+        assert test_db.taskTags.count_documents({}) == 1
+        
+        # Retro-tagging runs as a job, picks up the older task and is idempotent
+        apply_response = client.post('/api/tags/rules/apply', headers=auth_headers)
+        assert apply_response.status_code == 202
+        assert run_pending(test_db) == 1
+        job_response = client.get(f"/api/jobs/{apply_response.json['job_id']}", headers=auth_headers)
+        assert job_response.json['status'] == 'succeeded'
+        assert job_response.json['result']['tags_created'] == 1
+        assert test_db.jobs.find_one({'_id': ObjectId(apply_response.json['job_id'])})['details'] == {'tasks_scanned': 2}
+        
+        client.post('/api/tags/rules/apply', headers=auth_headers)
+        run_pending(test_db)
+        assert test_db.taskTags.count_documents({}) == 2
+        
+        # Deleting the tag detaches it in a job that reports each batch
+        assert client.delete(f'/api/tags/{tag_id}', headers=auth_headers).status_code == 202
+        assert run_pending(test_db) == 1
+        cascade = test_db.jobs.find_one({'type': 'tag_cascade'})
+        assert cascade['status'] == 'succeeded'
+        assert cascade['details'] == {'links': 2}
+        assert test_db.taskTags.count_documents({}) == 0
+        assert test_db.tasks.count_documents({'tagIds': ObjectId(tag_id)}) == 0
+        log_test_result("test_auto_tagging_rules", True)
+    except AssertionError as e:
+        log_test_result("test_auto_tagging_rules", False, str(e))
+        raise
+
+
+def test_auto_tagging_overlapping_rules(client, auth_headers, test_db):
+    """Test that every matching rule applies, including overlapping keywords and inline flags"""
+    try:
+        tag_ids = [
+            client.post('/api/tags/', json={'name': name, 'color': '#800080'}, headers=auth_headers).json['_id']
+            for name in ['Meet', 'Meeting', 'Standup']
+        ]
+        for pattern, is_regex, tag_id in [('meet', False, tag_ids[0]),
+                                          ('meeting', False, tag_ids[1]),
+                                          ('(?i)stand-?up', True, tag_ids[2])]:
+            rule_response = client.post(
+                '/api/tags/rules',
+                json={'pattern': pattern, 'is_regex': is_regex, 'tag_ids': [tag_id]},
+                headers=auth_headers
+            )
+            assert rule_response.status_code == 201
+        
+        # Flags only valid at the start are still rejected elsewhere
+        rule_response = client.post(
+            '/api/tags/rules',
+            json={'pattern': 'stand(?i)up', 'is_regex': True, 'tag_ids': [tag_ids[2]]},
+            headers=auth_headers
+        )
+        assert rule_response.status_code == 400
+        
+        task_response = client.post(
+            '/api/tasks/',
+            json={'title': 'Weekly meeting', 'description': 'after the Stand-up', 'task_type': 'todo'},
+            headers=auth_headers
+        )
+        assert task_response.status_code == 201
+        assert sorted(task_response.json['tag_ids']) == sorted(tag_ids)
+        log_test_result("test_auto_tagging_overlapping_rules", True)
+    except AssertionError as e:
+        log_test_result("test_auto_tagging_overlapping_rules", False, str(e))
+        raise
+
+def test_tag_rule_rejects_unsafe_patterns(client, auth_headers, test_db):
+    """Test that regex rules which could backtrack exponentially are rejected"""
+    try:
+        tag_id = client.post('/api/tags/', json={'name': 'Safe', 'color': '#800080'}, headers=auth_headers).json['_id']
+        for pattern in ['(a+)+$', '(?:\\w*)*x', '(\\w+)\\1', '(?P<name>a)', 'a' * 201]:
+            rule_response = client.post(
+                '/api/tags/rules',
+                json={'pattern': pattern, 'is_regex': True, 'tag_ids': [tag_id]},
+                headers=auth_headers
+            )
+            assert rule_response.status_code == 400, pattern
+
+        rule_response = client.post(
+            '/api/tags/rules',
+            json={'pattern': '(ab|cd){2,5}', 'is_regex': True, 'tag_ids': [tag_id]},
+            headers=auth_headers
+        )
+        assert rule_response.status_code == 201
+
+        task_response = client.post(
+            '/api/tasks/',
+            json={'title': 'abcdab', 'task_type': 'todo'},
+            headers=auth_headers
+        )
+        assert task_response.status_code == 201
+        assert task_response.json['tag_ids'] == [tag_id]
+        log_test_result("test_tag_rule_rejects_unsafe_patterns", True)
+    except AssertionError as e:
+        log_test_result("test_tag_rule_rejects_unsafe_patterns", False, str(e))
+        raise
+
+def test_task_search(client, auth_headers, test_db):
+    """Test full-text task search with filters"""
+    try:
+        for title, task_type in [('Prepare quarterly report', 'todo'),
+                                 ('Check report comments', 'distraction'),
+                                 ('Water the plants', 'todo')]:
+            client.post('/api/tasks/', json={'title': title, 'task_type': task_type}, headers=auth_headers)
+        
+        # Without the text index search says so instead of failing
+        test_db.tasks.drop_indexes()
+        response = client.get('/api/tasks/search?q=report', headers=auth_headers)
+        assert response.status_code == 503
+        
+        indexes.ensure_indexes(test_db)
+        response = client.get('/api/tasks/search?q=report', headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json['total'] == 2
+        
+        response = client.get('/api/tasks/search?q=report&taskType=todo', headers=auth_headers)
+        assert [task['title'] for task in response.json['items']] == ['Prepare quarterly report']
+        
+        assert client.get('/api/tasks/search', headers=auth_headers).status_code == 400
+        log_test_result("test_task_search", True)
+    except AssertionError as e:
+        log_test_result("test_task_search", False, str(e))
+        raise
+
+
+def test_tag_suggest(app, client, auth_headers, test_db):
+    """Test tag name autocomplete follows tag creation and deletion, with a bounded cache"""
+    cache_size = app.config['TAG_INDEX_CACHE_SIZE']
+    try:
+        for name in ['Urgent', 'Urban', 'Study']:
+            client.post('/api/tags/', json={'name': name, 'color': '#FF0000'}, headers=auth_headers)
+        
+        response = client.get('/api/tags/suggest?prefix=ur', headers=auth_headers)
+        assert response.status_code == 200
+        assert [tag['name'] for tag in response.json] == ['Urban', 'Urgent']
+        
+        tag_id = response.json[0]['_id']
+        client.delete(f'/api/tags/{tag_id}', headers=auth_headers)
+        response = client.get('/api/tags/suggest?prefix=ur', headers=auth_headers)
+        assert [tag['name'] for tag in response.json] == ['Urgent']
+        
+        # Least recently used users are dropped once the cache is full
+        app.config['TAG_INDEX_CACHE_SIZE'] = 2
+        other_users = [ObjectId(), ObjectId()]
+        with app.test_request_context():
+            for user_id in other_users:
+                tag_index.suggest(test_db, user_id, 'ur')
+        assert list(tag_index._tries) == other_users
+        log_test_result("test_tag_suggest", True)
+    except AssertionError as e:
+        log_test_result("test_tag_suggest", False, str(e))
+        raise
+    finally:
+        app.config['TAG_INDEX_CACHE_SIZE'] = cache_size
+
+
+def test_filter_tasks_by_tags(client, auth_headers, test_db):
+    """Test tag attach/detach keeps tagIds in sync for tag filters"""
+    try:
+        urgent = client.post('/api/tags/', json={'name': 'Urgent', 'color': '#FF0000'}, headers=auth_headers).json['_id']
+        work = client.post('/api/tags/', json={'name': 'Work', 'color': '#FF4444'}, headers=auth_headers).json['_id']
+        both = client.post('/api/tasks/', json={'title': 'Ship release', 'task_type': 'todo'}, headers=auth_headers).json['_id']
+        one = client.post('/api/tasks/', json={'title': 'Answer email', 'task_type': 'todo'}, headers=auth_headers).json['_id']
+        
+        for task_id, tag_id in [(both, urgent), (both, work), (one, work)]:
+            response = client.post(f'/api/tasks/{task_id}/tags/{tag_id}', headers=auth_headers)
+            assert response.status_code == 200
+
+        # Malformed ids in the path are a 404, not a server error
+        for path in [f'/api/tasks/not-an-id/tags/{urgent}', f'/api/tasks/{both}/tags/123',
+                     '/api/tasks/complete/not-an-id', '/api/sessions/not-an-id/stop']:
+            assert client.post(path, headers=auth_headers).status_code == 404, path
+        assert client.get('/api/jobs/not-an-id', headers=auth_headers).status_code == 404
+
+        response = client.get(f'/api/tasks/?tags={urgent},{work}&match=all', headers=auth_headers)
+        assert [task['_id'] for task in response.json] == [both]
+        response = client.get(f'/api/tasks/?tags={urgent},{work}&match=any', headers=auth_headers)
+        assert len(response.json) == 2
+        
+        client.delete(f'/api/tasks/{both}/tags/{urgent}', headers=auth_headers)
+        response = client.get(f'/api/tasks/?tags={urgent}', headers=auth_headers)
+        assert response.json == []
+        
+        # Deleting a tag removes it from every task in a background job
+        response = client.delete(f'/api/tags/{work}', headers=auth_headers)
+        assert response.status_code == 202
+        assert run_pending(test_db) == 1
+        assert test_db.tasks.count_documents({'tagIds': {'$ne': []}}) == 0
+        assert test_db.taskTags.count_documents({}) == 0
+        log_test_result("test_filter_tasks_by_tags", True)
+    except AssertionError as e:
+        log_test_result("test_filter_tasks_by_tags", False, str(e))
+        raise
+
+def test_expired_leases_respect_max_attempts(test_db):
+    """Test that a job whose worker died is retried only while it has attempts left"""
+    try:
+        expired = datetime(2000, 1, 1)
+        retried, exhausted = [
+            enqueue(test_db, 'retro_tag', {'user_id': str(ObjectId())}, max_attempts=3)
+            for _ in range(2)
+        ]
+        for job_id, attempts in [(retried, 2), (exhausted, 3)]:
+            test_db.jobs.update_one({'_id': job_id}, {'$set': {
+                'status': 'running', 'attempts': attempts, 'lockedBy': 'dead-worker', 'lockedUntil': expired
+            }})
+        
+        assert run_pending(test_db) == 1
+        assert test_db.jobs.find_one({'_id': retried})['status'] == 'succeeded'
+        job = test_db.jobs.find_one({'_id': exhausted})
+        assert job['status'] == 'failed'
+        assert job['attempts'] == 3
+        assert 'lockedBy' not in job
+        log_test_result("test_expired_leases_respect_max_attempts", True)
+    except AssertionError as e:
+        log_test_result("test_expired_leases_respect_max_attempts", False, str(e))
+        raise
+
+
+def test_audit_log(app, client, auth_headers, test_db):
+    """Test mutations are written to the audit log in the background"""
+    try:
+        task_id = client.post('/api/tasks/', json={'title': 'Audit me', 'task_type': 'todo'}, headers=auth_headers).json['_id']
+        response = client.post(f'/api/tasks/complete/{task_id}', headers=auth_headers)
+        assert response.status_code == 200
+        
+        # w=1, so once flush returns the entries are on the server
+        assert app.config['AUDIT_WRITE_CONCERN'] == 1
+        assert app.audit.flush()
+        entries = list(test_db.auditLogs.find({'entityId': ObjectId(task_id)}).sort('createdAt', 1))
+        assert [entry['action'] for entry in entries] == ['create_task', 'complete_task']
+        assert entries[1]['oldValue'] == {'status': 'pending'}
+        assert entries[1]['newValue'] == {'status': 'completed'}
+        user_id = entries[0]['userId']
+        assert test_db.auditLogs.count_documents({'userId': user_id, 'action': {'$in': ['register', 'login']}}) == 2
+        assert app.audit.stats()['dropped'] == 0
+        log_test_result("test_audit_log", True)
+    except AssertionError as e:
+        log_test_result("test_audit_log", False, str(e))
+        raise
+
+def test_audit_drops_are_logged(app, test_db, caplog):
+    """Test that the flusher reports dropped audit entries with the queue counters"""
+    queue_size = app.config['AUDIT_QUEUE_SIZE']
+    app.config['AUDIT_QUEUE_SIZE'] = 1
+    writer = AuditWriter(app)
+    try:
+        with caplog.at_level(logging.WARNING, logger='audit'):
+            for _ in range(50):
+                writer.record('create_task', 'tasks', ObjectId(), ObjectId())
+            assert writer.flush()
+            deadline = time.monotonic() + 5
+            while not caplog.records and time.monotonic() < deadline:
+                time.sleep(0.05)
+        stats = writer.stats()
+        assert stats['dropped'] > 0
+        assert stats['enqueued'] + stats['dropped'] == 50
+        assert 'Audit queue full' in caplog.records[0].getMessage()
+        log_test_result("test_audit_drops_are_logged", True)
+    except AssertionError as e:
+        log_test_result("test_audit_drops_are_logged", False, str(e))
+        raise
+    finally:
+        writer.close()
+        app.config['AUDIT_QUEUE_SIZE'] = queue_size
+
+
+def test_change_stream_replay(app, client, auth_headers, test_db):
+    """Test a reconnecting stream replays changes since Last-Event-ID"""
+    max_seconds = app.config['STREAM_MAX_SECONDS']
+    max_connections = app.config['STREAM_MAX_CONNECTIONS']
+    app.config['STREAM_MAX_SECONDS'] = 0.2
+    try:
+        task_id = client.post('/api/tasks/', json={'title': 'Stream me', 'task_type': 'todo'}, headers=auth_headers).json['_id']
+        client.post(f'/api/tasks/complete/{task_id}', headers=auth_headers)
+        
+        # Access tokens are no longer taken from the URL
+        token = auth_headers['Authorization'].split()[1]
+        assert client.get(f'/api/stream?jwt={token}').status_code == 401
+        
+        # EventSource authenticates with the stream-only cookie
+        response = client.post('/api/stream/token', headers=auth_headers)
+        assert response.status_code == 200
+        cookie = client.get_cookie(app.config['JWT_ACCESS_COOKIE_NAME'], path='/api/stream')
+        assert cookie is not None and cookie.http_only
+        response = client.get('/api/stream', headers={'Last-Event-ID': 'p:000000000000000'})
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        
+        body = response.get_data(as_text=True)
+        assert 'event: task.completed' in body
+        assert task_id in body
+        
+        # The stream token opens streams and nothing else
+        stream_headers = {'Authorization': f'Bearer {cookie.value}'}
+        assert client.get('/api/tasks/', headers=stream_headers).status_code == 400
+        assert client.post('/api/stream/token', headers=stream_headers).status_code == 400
+        
+        # The connection cap is checked as the stream subscribes
+        app.config['STREAM_MAX_CONNECTIONS'] = 0
+        assert client.get('/api/stream').status_code == 503
+        client.delete_cookie(app.config['JWT_ACCESS_COOKIE_NAME'], path='/api/stream')
+        log_test_result("test_change_stream_replay", True)
+    except AssertionError as e:
+        log_test_result("test_change_stream_replay", False, str(e))
+        raise
+    finally:
+        app.config['STREAM_MAX_SECONDS'] = max_seconds
+        app.config['STREAM_MAX_CONNECTIONS'] = max_connections
+
+def test_poll_replay_keeps_shared_milliseconds(app, client, auth_headers, test_db):
+    """Test that polling ids are unique and replay resends the last id's millisecond"""
+    try:
+        task_ids = [
+            client.post('/api/tasks/', json={'title': title, 'task_type': 'todo'}, headers=auth_headers).json['_id']
+            for title in ['First', 'Second', 'Third']
+        ]
+        # Three writes in the same millisecond
+        same_ms = datetime(2030, 1, 1, 12, 0, 0, 123000)
+        test_db.tasks.update_many({}, {'$set': {'updatedAt': same_ms}})
+        user_id = test_db.tasks.find_one()['userId']
+        
+        events = app.change_feed.replay(user_id, 'p:000000000000000')
+        ids = [event['id'] for event in events]
+        assert len(set(ids)) == 3
+        assert ids == sorted(ids)
+        assert [str(event['doc']['_id']) for event in events] == sorted(task_ids)
+        
+        # Reconnecting after the middle event still gets the other two
+        replayed = app.change_feed.replay(user_id, ids[1])
+        assert [event['id'] for event in replayed] == [ids[0], ids[2]]
+        log_test_result("test_poll_replay_keeps_shared_milliseconds", True)
+    except AssertionError as e:
+        log_test_result("test_poll_replay_keeps_shared_milliseconds", False, str(e))
+        raise
+
+
+def test_session_pause_resume(client, auth_headers, test_db, timer_type):
+    """Test pausing, resuming and stopping a session accumulates active time"""
+    try:
+        session = client.post('/api/sessions/', json={
+            'timer_type_id': timer_type,
+            'work_duration': 25,
+            'break_duration': 5
+        }, headers=auth_headers).json
+        session_id = session['_id']
+        assert session['active_seconds'] == 0
+        
+        response = client.post(f'/api/sessions/{session_id}/pause', headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json['status'] == 'paused'
+        assert response.json['version'] == 2
+        paused_seconds = response.json['active_seconds']
+        assert paused_seconds >= 0
+        
+        # Only active sessions can be paused, only paused ones resumed
+        assert client.post(f'/api/sessions/{session_id}/pause', headers=auth_headers).status_code == 404
+        response = client.post(f'/api/sessions/{session_id}/resume', headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json['status'] == 'active'
+        assert client.post(f'/api/sessions/{session_id}/resume', headers=auth_headers).status_code == 404
+        
+        response = client.post(f'/api/sessions/{session_id}/stop', headers=auth_headers)
+        assert response.status_code == 200
+        stopped = test_db.sessions.find_one({'_id': ObjectId(session_id)})
+        assert stopped['status'] == 'completed'
+        assert stopped['version'] == 4
+        assert stopped['activeSeconds'] >= paused_seconds
+        assert stopped['duration'] == stopped['activeSeconds'] / 60
+        assert client.post(f'/api/sessions/{session_id}/stop', headers=auth_headers).status_code == 404
+        log_test_result("test_session_pause_resume", True)
+    except AssertionError as e:
+        log_test_result("test_session_pause_resume", False, str(e))
+        raise
+
+
+def test_concurrent_writes_keep_every_version(app, client, auth_headers, test_db, test_user):
+    """Test concurrent writes to one document never lose a version increment"""
+    def run_concurrently(request, count=20):
+        def call(_):
+            return request(app.test_client()).status_code
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            return list(pool.map(call, range(count)))
+    
+    try:
+        task_id = client.post('/api/tasks/', json={'title': 'Race', 'task_type': 'todo'}, headers=auth_headers).json['_id']
+        statuses = run_concurrently(lambda c: c.post(f'/api/tasks/complete/{task_id}', headers=auth_headers))
+        assert statuses == [200] * 20
+        assert test_db.tasks.find_one({'_id': ObjectId(task_id)})['version'] == 21
+        
+        user_version = test_db.users.find_one({'email': test_user['email']})['version']
+        credentials = {'email': test_user['email'], 'password': test_user['password']}
+        statuses = run_concurrently(lambda c: c.post('/api/auth/login', json=credentials))
+        assert statuses == [200] * 20
+        statuses = run_concurrently(lambda c: c.put('/api/users/profile', json={'name': 'Racer'}, headers=auth_headers))
+        assert statuses == [200] * 20
+        assert test_db.users.find_one({'email': test_user['email']})['version'] == user_version + 40
+        log_test_result("test_concurrent_writes_keep_every_version", True)
+    except AssertionError as e:
+        log_test_result("test_concurrent_writes_keep_every_version", False, str(e))
+        raise
+
+
+def test_update_profile_duplicate_username(app, client, auth_headers, test_db):
+    """Test a taken username gets a 409, also when several users race for it"""
+    try:
+        indexes.ensure_indexes(test_db)
+        client.post('/api/auth/register', json={
+            'email': 'other@example.com', 'password': 'other123', 'name': 'Other', 'username': 'other'
+        })
+        response = client.put('/api/users/profile', json={'username': 'other'}, headers=auth_headers)
+        assert response.status_code == 409
+        
+        racers = []
+        for n in range(6):
+            credentials = {'email': f'racer{n}@example.com', 'password': 'race123'}
+            client.post('/api/auth/register', json={**credentials, 'name': 'Racer', 'username': f'racer{n}'})
+            token = client.post('/api/auth/login', json=credentials).json['access_token']
+            racers.append({'Authorization': f'Bearer {token}'})
+        
+        def claim(headers):
+            return app.test_client().put('/api/users/profile', json={'username': 'winner'}, headers=headers).status_code
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            statuses = list(pool.map(claim, racers))
+        assert sorted(statuses) == [200] + [409] * 5
+        assert test_db.users.count_documents({'username': 'winner'}) == 1
+        log_test_result("test_update_profile_duplicate_username", True)
+    except AssertionError as e:
+        log_test_result("test_update_profile_duplicate_username", False, str(e))
+        raise
+
+def test_update_profile_partial(client, auth_headers, test_db):
+    """Test partial profile updates change what is sent, and an explicit null clears an optional field"""
+    try:
+        response = client.put('/api/users/profile', json={'username': 'renamed'}, headers=auth_headers)
+        assert response.status_code == 200
+        profile = client.get('/api/users/me', headers=auth_headers).json
+        assert (profile['username'], profile['name']) == ('renamed', 'Test User')
+        
+        response = client.put('/api/users/profile', json={'name': None}, headers=auth_headers)
+        assert response.status_code == 200
+        profile = client.get('/api/users/me', headers=auth_headers).json
+        assert (profile['username'], profile['name']) == ('renamed', '')
+        
+        # Required fields may be left out, but not cleared
+        response = client.put('/api/users/profile', json={'username': None}, headers=auth_headers)
+        assert response.status_code == 400
+        assert 'username' in response.json['errors']
+        log_test_result("test_update_profile_partial", True)
+    except AssertionError as e:
+        log_test_result("test_update_profile_partial", False, str(e))
+        raise
+
+def test_retention_archive_and_restore(client, auth_headers, test_db, tmp_path):
+    """Test expired tasks are archived, deleted and restored intact with their tag links"""
+    try:
+        tag_id = client.post('/api/tags/', json={'name': 'Old', 'color': '#888888'}, headers=auth_headers).json['_id']
+        kept_id, done_id, deleted_id = [
+            client.post('/api/tasks/', json={'title': title, 'task_type': 'todo'}, headers=auth_headers).json['_id']
+            for title in ['Keep me', 'Done long ago', 'Deleted long ago']
+        ]
+        client.post(f'/api/tasks/{done_id}/tags/{tag_id}', headers=auth_headers)
+        client.post(f'/api/tasks/complete/{done_id}', headers=auth_headers)
+        long_ago = datetime(2023, 1, 15)
+        test_db.tasks.update_one({'_id': ObjectId(done_id)}, {'$set': {'updatedAt': long_ago}})
+        test_db.tasks.update_one({'_id': ObjectId(deleted_id)}, {'$set': {'isActive': False, 'updatedAt': long_ago}})
+        expired = [ObjectId(done_id), ObjectId(deleted_id)]
+        before = {doc['_id']: doc for doc in test_db.tasks.find({'_id': {'$in': expired}})}
+        user_id = before[ObjectId(done_id)]['userId']
+        
+        # Completed tasks retire after a year, soft-deleted ones after 30 days
+        policies = retention.load_policies({'tasks': {'aged_days': 365}})
+        assert retention.sweep(test_db, policies, tmp_path, only='tasks', dry_run=True) == {'tasks': 2}
+        assert retention.sweep(test_db, policies, tmp_path, only='tasks') == {'tasks': 2}
+        assert test_db.tasks.distinct('_id') == [ObjectId(kept_id)]
+        assert test_db.taskTags.count_documents({}) == 0
+        assert (tmp_path / 'tasks' / str(user_id) / '2023-01.ndjson.gz').exists()
+        # Only the live task needs a tombstone; the deleted one already synced as deleted
+        assert [t['key']['_id'] for t in test_db.tombstones.find({'collection': 'tasks'})] == [ObjectId(done_id)]
+        
+        assert retention.restore_user(test_db, user_id, tmp_path) == {'tasks': 2}
+        for task_id, original in before.items():
+            restored = test_db.tasks.find_one({'_id': task_id})
+            assert restored.pop('restoredAt') is not None
+            assert restored == original
+        assert test_db.taskTags.count_documents({'taskId': ObjectId(done_id), 'tagId': ObjectId(tag_id)}) == 1
+        
+        # Restored documents are held back from the next sweep
+        assert retention.sweep(test_db, policies, tmp_path, only='tasks') == {'tasks': 0}
+        log_test_result("test_retention_archive_and_restore", True)
+    except AssertionError as e:
+        log_test_result("test_retention_archive_and_restore", False, str(e))
+        raise
+
+def test_retention_keeps_documents_changed_mid_sweep(client, auth_headers, test_db, tmp_path, monkeypatch):
+    """Test a document changed between read and delete is neither deleted nor archived, and a crashed batch is finished"""
+    try:
+        revived_id, gone_id = [
+            client.post('/api/tasks/', json={'title': title, 'task_type': 'todo'}, headers=auth_headers).json['_id']
+            for title in ['Undeleted meanwhile', 'Deleted long ago']
+        ]
+        long_ago = datetime(2023, 1, 15)
+        test_db.tasks.update_many({}, {'$set': {'isActive': False, 'updatedAt': long_ago}})
+        user_id = test_db.tasks.find_one()['userId']
+        
+        # The user undeletes a task after the sweeper read its batch
+        write_pending = retention.write_pending
+        def undelete_after_read(path, docs):
+            write_pending(path, docs)
+            test_db.tasks.update_one({'_id': ObjectId(revived_id)}, {'$set': {'isActive': True, 'updatedAt': datetime.now()}})
+        monkeypatch.setattr(retention, 'write_pending', undelete_after_read)
+        
+        policies = retention.load_policies()
+        assert retention.sweep(test_db, policies, tmp_path, only='tasks') == {'tasks': 1}
+        assert test_db.tasks.distinct('_id') == [ObjectId(revived_id)]
+        archived = list(retention.read_archive(tmp_path / 'tasks' / str(user_id) / '2023-01.ndjson.gz'))
+        assert [doc['_id'] for doc in archived] == [ObjectId(gone_id)]
+        assert not retention.pending_path(tmp_path, 'tasks').exists()
+        
+        # A sweep that crashed after deleting its batch is archived by the next one
+        monkeypatch.setattr(retention, 'write_pending', write_pending)
+        revived = test_db.tasks.find_one({'_id': ObjectId(revived_id)})
+        write_pending(retention.pending_path(tmp_path, 'tasks'), [revived])
+        test_db.tasks.delete_one({'_id': ObjectId(revived_id)})
+        assert retention.sweep(test_db, policies, tmp_path, only='tasks') == {'tasks': 1}
+        assert retention.restore_user(test_db, user_id, tmp_path) == {'tasks': 2}
+        assert sorted(test_db.tasks.distinct('_id')) == sorted([ObjectId(revived_id), ObjectId(gone_id)])
+        log_test_result("test_retention_keeps_documents_changed_mid_sweep", True)
+    except AssertionError as e:
+        log_test_result("test_retention_keeps_documents_changed_mid_sweep", False, str(e))
+        raise
+
+def test_retention_sweeps_session_history(client, auth_headers, test_db, timer_type, tmp_path):
+    """Test the sessions policy also retires completed sessions kept in the time-series history"""
+    try:
+        session_id = client.post('/api/sessions/', json={'timer_type_id': timer_type}, headers=auth_headers).json['_id']
+        long_ago = datetime(2023, 1, 15)
+        test_db.sessions.update_one({'_id': ObjectId(session_id)}, {'$set': {
+            'status': 'completed', 'startTime': long_ago, 'endTime': long_ago, 'updatedAt': long_ago
+        }})
+        user_id = test_db.sessions.find_one()['userId']
+        assert session_store.archive_completed(test_db) == 1
+        
+        policies = retention.load_policies({'sessions': {'aged_days': 365}})
+        assert retention.sweep(test_db, policies, tmp_path, only='sessions', dry_run=True) == {'sessions': 1}
+        assert retention.sweep(test_db, policies, tmp_path, only='sessions') == {'sessions': 1}
+        assert test_db[session_store.HISTORY].count_documents({}) == 0
+        assert [t['key']['_id'] for t in test_db.tombstones.find({'collection': 'sessions'})] == [ObjectId(session_id)]
+        
+        # Archived in the session shape, so it comes back as a completed session
+        assert retention.restore_user(test_db, user_id, tmp_path) == {'sessions': 1}
+        restored = test_db.sessions.find_one({'_id': ObjectId(session_id)})
+        assert restored['userId'] == user_id
+        assert restored['status'] == 'completed'
+        log_test_result("test_retention_sweeps_session_history", True)
+    except AssertionError as e:
+        log_test_result("test_retention_sweeps_session_history", False, str(e))
+        raise
+
+def test_invalid_payloads_rejected(client, auth_headers, test_db):
+    """Test malformed bodies get a 400 with per-field errors and write nothing"""
+    try:
+        cases = [
+            ('/api/tasks/', {'title': 'No type'}, 'task_type'),
+            ('/api/tasks/', {'title': 'Bad type', 'task_type': 'chore'}, 'task_type'),
+            ('/api/tags/', {'name': 'Red', 'color': 'red'}, 'color'),
+            ('/api/tags/rules', {'pattern': 'x', 'tag_ids': ['not-an-id']}, 'tag_ids'),
+            ('/api/sessions/', {'timer_type_id': str(ObjectId()), 'work_duration': '25', 'break_duration': 5}, 'work_duration')
+        ]
+        for url, body, field in cases:
+            response = client.post(url, json=body, headers=auth_headers)
+            assert response.status_code == 400, url
+            assert field in response.json['errors'], response.json
+        
+        assert test_db.tasks.count_documents({}) == 0
+        assert test_db.tags.count_documents({}) == 0
+        assert test_db.sessions.count_documents({}) == 0
+        log_test_result("test_invalid_payloads_rejected", True)
+    except AssertionError as e:
+        log_test_result("test_invalid_payloads_rejected", False, str(e))
+        raise
+
+
+@pytest.mark.skipif(os.getenv('READ_ROUTING_ENABLED', 'false').lower() != 'true',
+                    reason='needs READ_ROUTING_ENABLED=true and a replica set (a local single-node one is enough)')
+def test_read_your_writes(client, auth_headers, test_db):
+    """Test a write returns a read-after token and routed reads honour it"""
+    try:
+        response = client.post('/api/tasks/', json={'title': 'Fresh', 'task_type': 'todo'}, headers=auth_headers)
+        token = response.headers.get('X-Read-After')
+        assert token
+        
+        response = client.get('/api/tasks/', headers={**auth_headers, 'X-Read-After': token})
+        assert [task['title'] for task in response.json] == ['Fresh']
+        
+        # Each dashboard section reads on its own thread with its own session
+        response = client.get('/api/dashboard', headers={**auth_headers, 'X-Read-After': token})
+        assert [task['title'] for task in response.json['todos']] == ['Fresh']
+        log_test_result("test_read_your_writes", True)
+    except AssertionError as e:
+        log_test_result("test_read_your_writes", False, str(e))
+        raise
+
+def test_raw_lists_match_models(app, client, auth_headers, test_db, timer_type):
+    """Test the raw BSON list path returns exactly what the model path does"""
+    raw_lists_enabled = app.config['LISTS_RAW_BSON']
+    try:
+        tag_id = client.post('/api/tags/', json={'name': 'Urgent', 'color': '#FF0000'}, headers=auth_headers).json['_id']
+        task_id = client.post('/api/tasks/', json={'title': 'Ship release', 'task_type': 'todo'}, headers=auth_headers).json['_id']
+        client.post('/api/tasks/', json={'title': 'Read news', 'task_type': 'distraction', 'description': 'later'}, headers=auth_headers)
+        client.post(f'/api/tasks/{task_id}/tags/{tag_id}', headers=auth_headers)
+        session_id = client.post('/api/sessions/', json={
+            'task_id': task_id,
+            'timer_type_id': timer_type,
+            'work_duration': 25,
+            'break_duration': 5
+        }, headers=auth_headers).json['_id']
+        client.post(f'/api/sessions/{session_id}/stop', headers=auth_headers)
+        client.post('/api/sessions/', json={'timer_type_id': timer_type, 'work_duration': 50, 'break_duration': 10}, headers=auth_headers)
+        
+        for path in ('/api/tasks/', '/api/tags/', '/api/sessions/'):
+            for headers in (auth_headers, {**auth_headers, 'X-Fields': '_id,user_id,created_at'}):
+                app.config['LISTS_RAW_BSON'] = True
+                raw = client.get(path, headers=headers)
+                app.config['LISTS_RAW_BSON'] = False
+                marshalled = client.get(path, headers=headers)
+                assert raw.status_code == marshalled.status_code == 200
+                assert raw.json == marshalled.json, path
+        assert len(raw.json) == 2
+        log_test_result("test_raw_lists_match_models", True)
+    except AssertionError as e:
+        log_test_result("test_raw_lists_match_models", False, str(e))
+        raise
+    finally:
+        app.config['LISTS_RAW_BSON'] = raw_lists_enabled
+
+def test_fields_mask(client, auth_headers, test_db):
+    """Test X-Fields masks model-built responses, and a malformed mask is a 400"""
+    try:
+        task_id = client.post('/api/tasks/', json={'title': 'Masked', 'task_type': 'todo'}, headers=auth_headers).json['_id']
+        
+        response = client.get('/api/tasks/', headers={**auth_headers, 'X-Fields': '_id,title'})
+        assert response.status_code == 200
+        assert response.json == [{'_id': task_id, 'title': 'Masked'}]
+        
+        response = client.get('/api/tasks/todos', headers={**auth_headers, 'X-Fields': 'status'})
+        assert response.json == [{'status': 'pending'}]
+        
+        response = client.get('/api/tasks/', headers={**auth_headers, 'X-Fields': '{title'})
+        assert response.status_code == 400
+        log_test_result("test_fields_mask", True)
+    except AssertionError as e:
+        log_test_result("test_fields_mask", False, str(e))
+        raise
+
+def test_dashboard(client, auth_headers, test_db, test_user, timer_type):
+    """Test the dashboard returns every start-screen section in one response"""
+    try:
+        for title in ('Plan sprint', 'Write report', 'Review PR'):
+            client.post('/api/tasks/', json={'title': title, 'task_type': 'todo'}, headers=auth_headers)
+        client.post('/api/tasks/', json={'title': 'Shipped', 'task_type': 'todo', 'status': 'completed'}, headers=auth_headers)
+        client.post('/api/tasks/', json={'title': 'Read news', 'task_type': 'distraction'}, headers=auth_headers)
+        client.post('/api/tags/', json={'name': 'Work', 'color': '#FF4444'}, headers=auth_headers)
+        session_id = client.post('/api/sessions/', json={
+            'timer_type_id': timer_type,
+            'work_duration': 25,
+            'break_duration': 5
+        }, headers=auth_headers).json['_id']
+        
+        response = client.get('/api/dashboard?todos=2', headers=auth_headers)
+        assert response.status_code == 200
+        dashboard = response.json
+        assert dashboard['profile']['email'] == test_user['email']
+        assert dashboard['active_session']['_id'] == session_id
+        assert [task['title'] for task in dashboard['todos']] == ['Review PR', 'Write report']
+        assert [task['title'] for task in dashboard['distractions']] == ['Read news']
+        assert [tag['name'] for tag in dashboard['tags']] == ['Work']
+        assert dashboard['focus_today']['sessions'] == 1
+        assert dashboard['focus_today']['completed_sessions'] == 0
+        
+        client.post(f'/api/sessions/{session_id}/stop', headers=auth_headers)
+        dashboard = client.get('/api/dashboard', headers=auth_headers).json
+        assert dashboard['active_session'] is None
+        assert len(dashboard['todos']) == 3
+        assert dashboard['focus_today']['completed_sessions'] == 1
+        log_test_result("test_dashboard", True)
+    except AssertionError as e:
+        log_test_result("test_dashboard", False, str(e))
+        raise
+
+def test_dashboard_timeseries(app, client, auth_headers, test_db, timer_type):
+    """Test focus_today counts sessions moved to sessionHistory, once even when caught mid-move"""
+    storage = app.config['SESSIONS_STORAGE']
+    app.config['SESSIONS_STORAGE'] = 'timeseries'
+    try:
+        def start_and_stop():
+            session_id = client.post('/api/sessions/', json={
+                'timer_type_id': timer_type,
+                'work_duration': 25,
+                'break_duration': 5
+            }, headers=auth_headers).json['_id']
+            client.post(f'/api/sessions/{session_id}/stop', headers=auth_headers)
+            return ObjectId(session_id)
+        
+        start_and_stop()
+        start_and_stop()
+        assert session_store.archive_completed(test_db) == 2
+        
+        # A move interrupted between the insert and the delete
+        session_id = start_and_stop()
+        test_db[session_store.HISTORY].insert_one(
+            session_store.to_measurement(test_db.sessions.find_one({'_id': session_id}))
+        )
+        running_id = client.post('/api/sessions/', json={'timer_type_id': timer_type}, headers=auth_headers).json['_id']
+        
+        dashboard = client.get('/api/dashboard', headers=auth_headers).json
+        assert test_db.sessions.count_documents({}) == 2
+        assert dashboard['active_session']['_id'] == running_id
+        assert dashboard['focus_today']['sessions'] == 4
+        assert dashboard['focus_today']['completed_sessions'] == 3
+        assert dashboard['focus_today']['focus_seconds'] >= 0
+        log_test_result("test_dashboard_timeseries", True)
+    except AssertionError as e:
+        log_test_result("test_dashboard_timeseries", False, str(e))
+        raise
+    finally:
+        app.config['SESSIONS_STORAGE'] = storage
+
+def test_delta_sync(app, client, auth_headers, test_db):
+    """Test sync returns a snapshot, then only changes and tombstones since the cursor"""
+    overlap = app.config['SYNC_OVERLAP_SECONDS']
+    app.config['SYNC_OVERLAP_SECONDS'] = 0
+    try:
+        task_id = client.post('/api/tasks/', json={'title': 'Plan sprint', 'task_type': 'todo'}, headers=auth_headers).json['_id']
+        client.post('/api/tasks/', json={'title': 'Write report', 'task_type': 'todo'}, headers=auth_headers)
+        tag_id = client.post('/api/tags/', json={'name': 'Work', 'color': '#FF4444'}, headers=auth_headers).json['_id']
+        client.post(f'/api/tasks/{task_id}/tags/{tag_id}', headers=auth_headers)
+        # Cursors have millisecond precision and changes at the cursor are
+        # sent again, so the writes must land in an earlier millisecond
+        time.sleep(0.01)
+        
+        snapshot = client.get('/api/sync', headers=auth_headers).json
+        assert snapshot['reset'] is True
+        assert len(snapshot['changes']['tasks']) == 2
+        assert snapshot['changes']['task_tags'] == [{
+            'task_id': task_id, 'tag_id': tag_id, 'created_at': snapshot['changes']['task_tags'][0]['created_at']
+        }]
+        
+        delta = client.get(f"/api/sync?since={snapshot['cursor']}", headers=auth_headers).json
+        assert delta['reset'] is False
+        assert all(not items for items in delta['changes'].values())
+        
+        # A detach leaves a link tombstone; deleting the tag soft-deletes it
+        client.delete(f'/api/tasks/{task_id}/tags/{tag_id}', headers=auth_headers)
+        client.delete(f'/api/tags/{tag_id}', headers=auth_headers)
+        new_id = client.post('/api/tasks/', json={'title': 'Review PR', 'task_type': 'todo'}, headers=auth_headers).json['_id']
+        
+        delta = client.get(f"/api/sync?since={snapshot['cursor']}", headers=auth_headers).json
+        assert {task['_id'] for task in delta['changes']['tasks']} == {task_id, new_id}
+        assert [tag['_id'] for tag in delta['deleted']['tags']] == [tag_id]
+        assert [(link['task_id'], link['tag_id']) for link in delta['deleted']['task_tags']] == [(task_id, tag_id)]
+        
+        assert client.get('/api/sync?since=yesterday', headers=auth_headers).status_code == 400
+        assert client.get('/api/sync?since=0', headers=auth_headers).json['reset'] is True
+        log_test_result("test_delta_sync", True)
+    except AssertionError as e:
+        log_test_result("test_delta_sync", False, str(e))
+        raise
+    finally:
+        app.config['SYNC_OVERLAP_SECONDS'] = overlap
+
+def test_timer_types_cached(app, client, auth_headers, test_db, timer_type):
+    """Test timer types are served from the cache and fill in session durations"""
+    try:
+        response = client.get('/api/timer-types', headers=auth_headers)
+        assert response.status_code == 200
+        assert [(t['_id'], t['work_duration'], t['break_duration']) for t in response.json] == [(timer_type, 25, 5)]
+        assert 'max-age' in response.headers['Cache-Control']
+        assert 'private' in response.headers['Cache-Control']
+        assert 'public' not in response.headers['Cache-Control']
+        response = client.get('/api/timer-types', headers={**auth_headers, 'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+        
+        # Durations left out come from the timer type; unknown types are refused
+        session = client.post('/api/sessions/', json={'timer_type_id': timer_type, 'break_duration': 10}, headers=auth_headers).json
+        assert (session['work_duration'], session['break_duration']) == (25, 10)
+        response = client.post('/api/sessions/', json={'timer_type_id': str(ObjectId())}, headers=auth_headers)
+        assert response.status_code == 400
+        
+        # Unknown ids force an early check, but not more often than the limit
+        cache = app.timer_types
+        checks = []
+        fingerprint = cache._fingerprint
+        cache._fingerprint = lambda db: checks.append(db) or fingerprint(db)
+        forced_seconds = app.config['REFERENCE_FORCED_CHECK_SECONDS']
+        try:
+            app.config['REFERENCE_FORCED_CHECK_SECONDS'] = 3600
+            for _ in range(5):
+                client.post('/api/sessions/', json={'timer_type_id': str(ObjectId())}, headers=auth_headers)
+            assert checks == []
+            
+            # A type added since the last check is found by the forced one
+            app.config['REFERENCE_FORCED_CHECK_SECONDS'] = 0
+            added = test_db.timerTypes.insert_one({
+                'typeName': 'Sprint', 'workDuration': 50, 'breakDuration': 10, 'isActive': True, 'version': 1
+            }).inserted_id
+            response = client.post('/api/sessions/', json={'timer_type_id': str(added)}, headers=auth_headers)
+            assert response.status_code == 201
+            assert len(checks) == 1
+        finally:
+            del cache._fingerprint
+            app.config['REFERENCE_FORCED_CHECK_SECONDS'] = forced_seconds
+        
+        # Deactivating bumps the version; the next check reloads
+        test_db.timerTypes.update_one({'_id': ObjectId(timer_type)}, {'$set': {'isActive': False}, '$inc': {'version': 1}})
+        check_seconds = app.config['REFERENCE_CHECK_SECONDS']
+        app.config['REFERENCE_CHECK_SECONDS'] = 0
+        try:
+            assert [t['type_name'] for t in client.get('/api/timer-types', headers=auth_headers).json] == ['Sprint']
+        finally:
+            app.config['REFERENCE_CHECK_SECONDS'] = check_seconds
+        log_test_result("test_timer_types_cached", True)
+    except AssertionError as e:
+        log_test_result("test_timer_types_cached", False, str(e))
+        raise
+
+def test_export_admin_only(client, auth_headers, test_db, test_user):
+    """Test only admins can schedule the Parquet export, one run at a time"""
+    try:
+        response = client.post('/api/exports', json={}, headers=auth_headers)
+        assert response.status_code == 403
+        assert test_db.jobs.count_documents({}) == 0
+        
+        test_db.users.update_one({'email': test_user['email']}, {'$set': {'userType': 'admin'}})
+        response = client.post('/api/exports', json={'collections': ['sessions']}, headers=auth_headers)
+        assert response.status_code == 202
+        job = test_db.jobs.find_one({'_id': ObjectId(response.json['job_id'])})
+        assert job['type'] == 'analytics_export'
+        assert job['payload']['collections'] == ['sessions']
+        assert client.post('/api/exports', json={}, headers=auth_headers).status_code == 409
+        
+        response = client.get('/api/exports', headers=auth_headers)
+        assert response.status_code == 200
+        assert [state['collection'] for state in response.json] == ['sessions', 'tasks']
+        log_test_result("test_export_admin_only", True)
+    except AssertionError as e:
+        log_test_result("test_export_admin_only", False, str(e))
+        raise
+
+def test_profiler_admin_only(app, auth_headers, test_db, test_user, tmp_path, monkeypatch):
+    """Test only an admin's request is profiled when it asks to be"""
+    # The profiler hooks in at startup, so it needs an app of its own
+    monkeypatch.setenv('PROFILING_ENABLED', 'true')
+    monkeypatch.setenv('PROFILING_DIR', str(tmp_path))
+    profiled = create_app()
+    profiled.config.update({'TESTING': True, 'JWT_SECRET_KEY': app.config['JWT_SECRET_KEY']})
+    profiled.mongo = app.mongo
+    client = profiled.test_client()
+    try:
+        response = client.get('/api/tasks/', headers={**auth_headers, 'X-Profile-Request': '1'})
+        assert response.status_code == 200
+        assert 'X-Profile-Id' not in response.headers
+        assert not list(tmp_path.iterdir())
+        
+        test_db.users.update_one({'email': test_user['email']}, {'$set': {'userType': 'admin'}})
+        response = client.get('/api/tasks/', headers=auth_headers)
+        assert 'X-Profile-Id' not in response.headers
+        
+        response = client.get('/api/tasks/', headers={**auth_headers, 'X-Profile-Request': '1'})
+        assert response.status_code == 200
+        profile_id = response.headers['X-Profile-Id']
+        assert (tmp_path / f"{profile_id}.collapsed").exists()
+        with open(tmp_path / f"{profile_id}.json") as f:
+            assert json.load(f)['status'] == 200
+        
+        # Another app with profiling on reuses the registered timer
+        create_app()
+        timers = [listener for listener in monitoring._LISTENERS.command_listeners
+                  if isinstance(listener, profiling.MongoCommandTimer)]
+        assert len(timers) == 1
+        log_test_result("test_profiler_admin_only", True)
+    except AssertionError as e:
+        log_test_result("test_profiler_admin_only", False, str(e))
+        raise
+
+
+def test_analytics_export_and_report(test_db, tmp_path, monkeypatch):
+    """Test incremental Parquet exports, a failed run, the writer's file cap and the reports over the output"""
+    pytest.importorskip('pyarrow')
+    pytest.importorskip('pandas')
+    import analytics_report
+    try:
+        user_id = ObjectId()
+        first_run = datetime(2024, 6, 15, 12, 0)
+        def session(minutes, updated_at, version=1):
+            start = first_run - timedelta(hours=5)
+            return {
+                '_id': ObjectId(), 'userId': user_id, 'timerTypeId': ObjectId(), 'taskId': None,
+                'status': 'completed', 'startTime': start, 'endTime': start + timedelta(minutes=minutes),
+                'workDuration': 25, 'breakDuration': 5, 'activeSeconds': minutes * 60.0, 'isActive': True,
+                'createdAt': start, 'updatedAt': updated_at, 'version': version
+            }
+        exported = session(20, first_run - timedelta(hours=2))
+        in_flight = session(25, first_run - timedelta(seconds=30))
+        test_db.sessions.insert_many([exported, in_flight])
+        test_db.tasks.insert_one({
+            '_id': ObjectId(), 'userId': user_id, 'title': 'Report', 'description': '', 'taskType': 'todo',
+            'status': 'completed', 'tagIds': [], 'isActive': True, 'version': 2,
+            'createdAt': first_run - timedelta(hours=5), 'updatedAt': first_run - timedelta(hours=2)
+        })
+        options = {'shards': 4, 'storage': 'timeseries', 'lag_seconds': 60}
+        
+        # Writes within the lag window are left for the next run
+        summary = analytics_export.export_collection(test_db, 'sessions', tmp_path, now=first_run.replace(tzinfo=timezone.utc), **options)
+        assert summary['rows'] == 1
+        assert summary['watermark'] == (first_run - timedelta(seconds=60)).replace(tzinfo=timezone.utc).isoformat()
+        assert analytics_export.export_collection(test_db, 'tasks', tmp_path, now=first_run.replace(tzinfo=timezone.utc), **options)['rows'] == 1
+        
+        # The next run picks up the write in flight, the update and the history
+        second_run = (first_run + timedelta(hours=1)).replace(tzinfo=timezone.utc)
+        test_db.sessions.update_one({'_id': exported['_id']}, {'$set': {
+            'activeSeconds': 1800.0, 'updatedAt': first_run + timedelta(minutes=10), 'version': 2
+        }})
+        archived = session(10, first_run + timedelta(minutes=20))
+        test_db[session_store.HISTORY].insert_one(session_store.to_measurement(archived))
+        summary = analytics_export.export_collection(test_db, 'sessions', tmp_path, now=second_run, **options)
+        assert summary['rows'] == 3
+        state = analytics_export.read_state(tmp_path, 'sessions')
+        
+        # A failed run removes its files and keeps the watermark
+        def failing_commit(writer):
+            writer.flush()
+            raise OSError('disk full')
+        monkeypatch.setattr(analytics_export.PartitionWriter, 'commit', failing_commit)
+        test_db.sessions.update_one({'_id': in_flight['_id']}, {'$set': {'updatedAt': first_run + timedelta(hours=1)}})
+        with pytest.raises(OSError):
+            analytics_export.export_collection(test_db, 'sessions', tmp_path, now=second_run + timedelta(hours=1), **options)
+        monkeypatch.undo()
+        assert not list(tmp_path.glob('**/*.tmp'))
+        assert analytics_export.read_state(tmp_path, 'sessions') == state
+        
+        # Re-exported rows count once, at their latest version
+        report = analytics_report.report(tmp_path)
+        assert report['totals']['sessions'] == 3
+        assert report['totals']['tasks'] == report['totals']['completed_tasks'] == 1
+        percentiles = report['completion_percentiles']
+        assert percentiles.loc['p50', 'session_focus_minutes'] == 25
+        assert percentiles.loc['p50', 'task_hours_to_complete'] == 3
+        assert report['focus_by_hour']['focus_minutes'].sum() == 30 + 25 + 10
+        
+        # At most max_open_files writers are open; a partition reopened
+        # after being closed gets another part file
+        pa, pq = analytics_export._arrow()
+        writer = analytics_export.PartitionWriter(pa, pq, tmp_path / 'capped' / 'sessions', 'sessions', 'run', max_open_files=2)
+        keys = [('month=2024-06', f'shard={shard:02d}') for shard in range(3)]
+        for key in keys * 2:
+            writer.add(key, session(5, first_run))
+            writer.flush()
+            assert len(writer.writers) <= 2
+        assert writer.commit() == 6
+        names = sorted(path.name for path in (tmp_path / 'capped' / 'sessions').glob('**/*.parquet'))
+        assert names == ['part-run-1.parquet'] * 3 + ['part-run.parquet'] * 3
+        log_test_result("test_analytics_export_and_report", True)
+    except AssertionError as e:
+        log_test_result("test_analytics_export_and_report", False, str(e))
+        raise
@@ -0,0 +1,36 @@
+# src/tombstones.py
+"""
+Tombstones for hard deletes.
+
+Soft-deleted documents (isActive: False) are their own tombstones: delta
+sync finds them by updatedAt like any other change. Documents removed
+outright (taskTags links on detach, documents purged by retention) leave a
+small record here instead, so /api/sync can tell offline clients to drop
+them:
+
+    {userId, collection, key, deletedAt}
+
+key is {'_id': ...} for tasks, tags and sessions and {'taskId', 'tagId'}
+for taskTags. Tombstones expire SYNC_TOMBSTONE_DAYS after deletedAt (TTL
+index, see database/init.py); a sync cursor older than that gets a full
+snapshot instead of a delta.
+"""
+from datetime import datetime, timezone
+
+COLLECTION = 'tombstones'
+
+
+def record(db, user_id, collection, keys, now=None):
+    """Remember that the documents identified by keys were deleted"""
+    if not keys:
+        return
+    now = now or datetime.now(timezone.utc)
+    db[COLLECTION].insert_many(
+        [{'userId': user_id, 'collection': collection, 'key': key, 'deletedAt': now} for key in keys],
+        ordered=False
+    )
+
+
+def since(db, user_id, when, session=None):
+    """Tombstones of the user's documents deleted at or after when"""
+    return db[COLLECTION].find({'userId': user_id, 'deletedAt': {'$gte': when}}, session=session)
@@ -0,0 +1,253 @@
+# src/validation.py
+"""
+Request body validation compiled from the restx models.
+
+Schema(model) walks the model's fields once, when the route module is
+imported, and builds one decoder per field (type, enum, pattern, length
+and range checks with regexes precompiled) plus a frozen slotted
+dataclass to hold the result. Schema.load() then validates the JSON body
+and decodes it into that struct in a single pass, before the handler
+touches the database. Failures answer 400 with the same shape restx uses:
+
+    {"message": "Input payload validation failed",
+     "errors": {"task_type": "'chore' is not one of ['todo', 'distraction']"}}
+
+Fields declared with ObjectIdField decode straight to bson ObjectIds, as
+do URL segments declared <objectid:name> (ObjectIdConverter).
+"""
+from dataclasses import field, make_dataclass
+from datetime import datetime, timezone
+import re
+
+from bson.objectid import ObjectId
+from flask import request
+from flask_restx import abort, fields
+from werkzeug.routing import BaseConverter
+
+OBJECT_ID_PATTERN = '^[0-9a-fA-F]{24}$'
+
+
+class ObjectIdField(fields.String):
+    """String field carrying an ObjectId; decodes to bson.ObjectId"""
+    __schema_format__ = 'objectid'
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('pattern', OBJECT_ID_PATTERN)
+        super().__init__(*args, **kwargs)
+
+
+class ObjectIdConverter(BaseConverter):
+    """URL converter for ObjectId path segments; anything else is a 404"""
+    regex = OBJECT_ID_PATTERN[1:-1]
+
+    def to_python(self, value):
+        return ObjectId(value)
+
+    def to_url(self, value):
+        return str(value)
+
+
+class ValidationError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class Invalid(Exception):
+    """Raised by a field decoder; the message is reported for that field"""
+
+
+def _string(spec):
+    pattern = re.compile(spec.pattern) if getattr(spec, 'pattern', None) else None
+    enum = list(spec.enum) if getattr(spec, 'enum', None) else None
+    min_length = getattr(spec, 'min_length', None)
+    max_length = getattr(spec, 'max_length', None)
+    to_object_id = isinstance(spec, ObjectIdField)
+
+    def decode(value):
+        if not isinstance(value, str):
+            raise Invalid(f"{value!r} is not of type 'string'")
+        if enum is not None and value not in enum:
+            raise Invalid(f"{value!r} is not one of {enum}")
+        if pattern is not None and not pattern.search(value):
+            raise Invalid(f"{value!r} does not match {pattern.pattern!r}")
+        if min_length is not None and len(value) < min_length:
+            raise Invalid(f"{value!r} is too short")
+        if max_length is not None and len(value) > max_length:
+            raise Invalid(f"{value!r} is too long")
+        return ObjectId(value) if to_object_id else value
+    return decode
+
+
+def _number(spec, types, type_name):
+    minimum = getattr(spec, 'minimum', None)
+    maximum = getattr(spec, 'maximum', None)
+
+    def decode(value):
+        # bool is an int subclass, but true is not a duration
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise Invalid(f"{value!r} is not of type '{type_name}'")
+        if minimum is not None and value < minimum:
+            raise Invalid(f"{value!r} is less than the minimum of {minimum}")
+        if maximum is not None and value > maximum:
+            raise Invalid(f"{value!r} is greater than the maximum of {maximum}")
+        return value
+    return decode
+
+
+def _boolean(spec):
+    def decode(value):
+        if not isinstance(value, bool):
+            raise Invalid(f"{value!r} is not of type 'boolean'")
+        return value
+    return decode
+
+
+def _datetime(spec):
+    def decode(value):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise Invalid(f"{value!r} is not a 'date-time'")
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    return decode
+
+
+def _list(spec):
+    item = _decoder(spec.container)
+    min_items = getattr(spec, 'min_items', None)
+    max_items = getattr(spec, 'max_items', None)
+
+    def decode(value):
+        if not isinstance(value, list):
+            raise Invalid(f"{value!r} is not of type 'array'")
+        if min_items is not None and len(value) < min_items:
+            raise Invalid(f"{value!r} is too short")
+        if max_items is not None and len(value) > max_items:
+            raise Invalid(f"{value!r} is too long")
+        decoded = []
+        for index, entry in enumerate(value):
+            try:
+                decoded.append(item(entry))
+            except Invalid as e:
+                raise Invalid(f"[{index}]: {e}")
+        return decoded
+    return decode
+
+
+def _nested(spec):
+    schema = Schema(spec.model)
+
+    def decode(value):
+        if not isinstance(value, dict):
+            raise Invalid(f"{value!r} is not of type 'object'")
+        try:
+            return schema.decode(value)
+        except ValidationError as e:
+            raise Invalid('; '.join(f"{name}: {error}" for name, error in e.errors.items()))
+    return decode
+
+
+def _raw(spec):
+    return lambda value: value
+
+
+def _decoder(spec):
+    if isinstance(spec, type):
+        spec = spec()
+    if isinstance(spec, fields.String):
+        return _string(spec)
+    if isinstance(spec, fields.Integer):
+        return _number(spec, int, 'integer')
+    if isinstance(spec, (fields.Float, fields.Arbitrary)):
+        return _number(spec, (int, float), 'number')
+    if isinstance(spec, fields.Boolean):
+        return _boolean(spec)
+    if isinstance(spec, fields.DateTime):
+        return _datetime(spec)
+    if isinstance(spec, fields.List):
+        return _list(spec)
+    if isinstance(spec, fields.Nested):
+        return _nested(spec)
+    return _raw(spec)
+
+
+def _annotation(spec):
+    if isinstance(spec, type):
+        spec = spec()
+    if isinstance(spec, ObjectIdField):
+        return ObjectId
+    for restx_type, python_type in ((fields.String, str), (fields.Integer, int), (fields.Float, float),
+                                    (fields.Boolean, bool), (fields.DateTime, datetime), (fields.List, list)):
+        if isinstance(spec, restx_type):
+            return python_type
+    return object
+
+
+class Schema:
+    """Validator and decoder for one restx model, compiled once"""
+
+    def __init__(self, model):
+        self.name = model.name
+        # (name, required, default, decoder) in model order
+        self.fields = []
+        # resolved includes fields inherited from parent models
+        items = list(model.resolved.items())
+        for name, spec in items:
+            instance = spec() if isinstance(spec, type) else spec
+            default = instance.default
+            self.fields.append((name, bool(instance.required), default() if callable(default) else default, _decoder(instance)))
+        self.struct = make_dataclass(
+            model.name,
+            [(name, _annotation(spec), field(default=None)) for name, spec in items]
+            # Names of the fields the body contained, null or not (see provided)
+            + [('_present', tuple, field(default=(), repr=False, compare=False))],
+            frozen=True,
+            slots=True
+        )
+
+    def decode(self, data, partial=False):
+        """
+        Validate a dict and return the struct; raises ValidationError.
+
+        With partial=True required fields may be left out (absent fields
+        are None), for updates that change only what they are given. An
+        explicit null clears an optional field; provided() tells it apart
+        from a field that was left out.
+        """
+        values = {}
+        errors = {}
+        present = []
+        for name, required, default, decode in self.fields:
+            value = data.get(name)
+            if partial and name in data:
+                present.append(name)
+            if value is None:
+                if required and not partial:
+                    errors[name] = f"'{name}' is a required property"
+                elif required and name in data:
+                    errors[name] = f"'{name}' cannot be null"
+                values[name] = None if partial else default
+                continue
+            try:
+                values[name] = decode(value)
+            except Invalid as e:
+                errors[name] = str(e)
+        if errors:
+            raise ValidationError(errors)
+        return self.struct(**values, _present=tuple(present))
+
+    def load(self, partial=False):
+        """Decode the current request's JSON body, aborting with 400 if it is invalid"""
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            abort(400, 'Request body must be a JSON object')
+        try:
+            return self.decode(data, partial)
+        except ValidationError as e:
+            abort(400, 'Input payload validation failed', errors=e.errors)
+
+
+def provided(body):
+    """The fields of a partially decoded body that were actually sent, explicit nulls included"""
+    return {name: getattr(body, name) for name in body._present}
@@ -0,0 +1,37 @@
+"""
+The API's domain models (backend/src/models.py), shared with the seeds and
+migrations so every document they write has exactly the shape the API reads.
+
+The backend source is found next to this directory (../backend/src) or, in
+the backend container, where docker-compose mounts it (/app/src, with this
+directory at /database). Set BACKEND_SRC to point somewhere else.
+
+    from app_models import models
+"""
+import importlib
+import os
+import sys
+
+DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CANDIDATES = [
+    os.getenv('BACKEND_SRC'),
+    os.path.join(DATABASE_DIR, '..', 'backend', 'src'),
+    '/app/src'
+]
+
+
+def backend_src():
+    """Directory holding the backend's models.py"""
+    for path in CANDIDATES:
+        if path and os.path.isfile(os.path.join(path, 'models.py')):
+            return os.path.abspath(path)
+    raise ImportError("Cannot find backend/src/models.py; set BACKEND_SRC to the backend's src directory")
+
+
+_src = backend_src()
+# Appended rather than prepended so database/ modules keep their names
+if _src not in sys.path:
+    sys.path.append(_src)
+
+models = importlib.import_module('models')
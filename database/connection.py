@@ -0,0 +1,32 @@
+from pymongo import MongoClient
+import os
+from dotenv import load_dotenv
+
+def mongo_settings():
+    """
+    Read the MongoDB connection settings from the environment.
+
+    Returns a plain dict so it can be handed to worker processes, which
+    each build their own client from it.
+    """
+    load_dotenv()
+
+    MONGO_HOST = os.getenv('MONGO_HOST', 'localhost')
+    MONGO_PORT = os.getenv('MONGO_PORT', '27017')
+    MONGO_DB = os.getenv('MONGO_DB', 'productivity_app')
+
+    return {
+        'uri': f"mongodb://{MONGO_HOST}:{MONGO_PORT}",
+        'db': MONGO_DB
+    }
+
+def get_client(settings=None, **kwargs):
+    """Create a MongoClient from the shared settings"""
+    settings = settings or mongo_settings()
+    return MongoClient(settings['uri'], **kwargs)
+
+def get_database(client=None, settings=None):
+    """Return the configured database, creating a client if none is given"""
+    settings = settings or mongo_settings()
+    client = client or get_client(settings)
+    return client[settings['db']]
@@ -1,8 +1,10 @@
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, TEXT
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
 
+from app_models import models
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -21,7 +23,7 @@ def init_database():
         db = client[MONGO_DB]
         
         # Create collections with validators
-        collections = ['users', 'sessions', 'timerTypes', 'tasks', 'tags', 'taskTags', 'auditLogs']
+        collections = ['users', 'sessions', 'timerTypes', 'tasks', 'tags', 'taskTags', 'tagRules', 'auditLogs', 'jobs', 'tombstones']
         for collection in collections:
             if collection not in db.list_collection_names():
                 db.create_collection(collection)
@@ -37,17 +39,62 @@ def init_database():
         
         db.tasks.create_index([('userId', ASCENDING)])
         db.tasks.create_index([('status', ASCENDING)])
+        db.tasks.create_index([('userId', ASCENDING), ('isActive', ASCENDING), ('tagIds', ASCENDING)])
+        db.tasks.create_index(
+            [('title', TEXT), ('description', TEXT)],
+            weights={'title': 3, 'description': 1},
+            name='task_text_search'
+        )
+        
+        db.taskTags.create_index([('taskId', ASCENDING), ('tagId', ASCENDING)], unique=True)
+        db.taskTags.create_index([('tagId', ASCENDING)])
+        
+        db.tagRules.create_index([('userId', ASCENDING), ('isActive', ASCENDING)])
+        
+        db.jobs.create_index([('status', ASCENDING), ('runAt', ASCENDING)])
+        db.jobs.create_index([('userId', ASCENDING)])
+        # Finished jobs are kept for a week so clients can still poll them
+        db.jobs.create_index([('finishedAt', ASCENDING)], expireAfterSeconds=7 * 24 * 3600)
+        
+        # Change feed polling fallback (standalone mongod without change
+        # streams) and delta sync
+        for collection in ('tasks', 'tags', 'sessions'):
+            db[collection].create_index([('userId', ASCENDING), ('updatedAt', ASCENDING)])
+            # Delta sync also picks up documents restored from the archive
+            db[collection].create_index(
+                [('userId', ASCENDING), ('restoredAt', ASCENDING)],
+                partialFilterExpression={'restoredAt': {'$exists': True}}
+            )
+        
+        # Incremental analytics exports scan every user's changes by updatedAt
+        for collection in ('tasks', 'sessions'):
+            db[collection].create_index([('updatedAt', ASCENDING)])
+        
+        # Hard deletes for delta sync; kept as long as sync cursors stay valid
+        db.tombstones.create_index([('userId', ASCENDING), ('deletedAt', ASCENDING)])
+        db.tombstones.create_index(
+            [('deletedAt', ASCENDING)],
+            expireAfterSeconds=int(os.getenv('SYNC_TOMBSTONE_DAYS', '30')) * 24 * 3600
+        )
+        
+        db.auditLogs.create_index([('userId', ASCENDING), ('createdAt', ASCENDING)])
+        # Audit entries expire after AUDIT_RETENTION_DAYS (default 90)
+        db.auditLogs.create_index(
+            [('createdAt', ASCENDING)],
+            expireAfterSeconds=int(os.getenv('AUDIT_RETENTION_DAYS', '90')) * 24 * 3600
+        )
         
         # Create initial timer types
+        now = datetime.now(timezone.utc)
         default_timer_types = [
-            {
-                'typeName': 'Pomodoro',
-                'description': 'Standard 25/5 minute work/break cycle',
-                'isActive': True,
-                'createdAt': datetime.now(timezone.utc),
-                'updatedAt': datetime.now(timezone.utc),
-                'version': 1
-            }
+            models.TimerType(
+                'Pomodoro',
+                description='Standard 25/5 minute work/break cycle',
+                work_duration=25,
+                break_duration=5,
+                created_at=now,
+                updated_at=now
+            ).to_bson()
         ]
         
         if db.timerTypes.count_documents({}) == 0:
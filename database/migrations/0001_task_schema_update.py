@@ -0,0 +1,12 @@
+# Add the taskType field (default to 'todo') and remove the old priority field
+
+description = "Add taskType to tasks and drop priority"
+collection = 'tasks'
+query = {'taskType': {'$exists': False}}
+fields = ['taskType', 'updatedAt']
+unset = ['priority']
+
+def migrate(db, tasks, now):
+    for task in tasks:
+        task.task_type = 'todo'  # Default all existing tasks to todo
+        task.updated_at = now
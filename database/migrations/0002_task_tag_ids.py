@@ -0,0 +1,14 @@
+# Backfill the denormalized tagIds array on tasks from the taskTags collection
+
+description = "Backfill tasks.tagIds from taskTags"
+collection = 'tasks'
+query = {'tagIds': {'$exists': False}}
+fields = ['tagIds']
+
+def migrate(db, tasks, now):
+    tag_ids = {task.id: [] for task in tasks}
+    for link in db.taskTags.find({'taskId': {'$in': list(tag_ids)}}, {'taskId': 1, 'tagId': 1}):
+        tag_ids[link['taskId']].append(link['tagId'])
+
+    for task in tasks:
+        task.tag_ids = sorted(tag_ids[task.id])
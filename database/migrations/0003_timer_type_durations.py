@@ -0,0 +1,21 @@
+# Give timer types default work/break durations, which session starts now
+# fall back on when the client leaves them out
+
+description = "Add workDuration and breakDuration to timer types"
+collection = 'timerTypes'
+query = {'workDuration': {'$exists': False}}
+fields = ['workDuration', 'breakDuration', 'updatedAt']
+
+# typeName -> (work, break) minutes; other types are left for an admin
+DURATIONS = {
+    'Pomodoro': (25, 5)
+}
+
+def migrate(db, timer_types, now):
+    # The runner bumps the version, which lets the API processes' cache
+    # notice the change
+    for timer_type in timer_types:
+        if timer_type.type_name not in DURATIONS:
+            continue
+        timer_type.work_duration, timer_type.break_duration = DURATIONS[timer_type.type_name]
+        timer_type.updated_at = now
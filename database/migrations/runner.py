@@ -0,0 +1,208 @@
+"""
+Versioned, batched and resumable migration runner.
+
+Migrations are modules in this package named NNNN_description.py and run
+in numeric order. Each module defines:
+
+    description      one-line summary
+    collection       collection the migration walks
+    query            filter selecting the documents that still need migrating
+    migrate(db, items, now)
+                     changes a batch of matches in place; items are the
+                     API's models (app_models) for the collection
+    fields           document fields the migration writes
+    unset            optional; fields to remove from every migrated document
+
+Each migrated document gets $set on those of `fields` whose to_bson() value
+differs from what is stored, $unset on the `unset` fields it has, and its
+version bumped so the API's caches and conditional requests notice. For a
+change the models cannot express a migration may define, instead of
+migrate,
+    build_operations(db, docs, now)
+                     returns bulk write operations for a whole batch
+
+Matching documents are streamed from a cursor in _id order and written with
+bulk_write one batch at a time. After every batch the last _id is saved to
+the schemaMigrations collection, so an interrupted run resumes where it
+stopped. Completed migrations are recorded there and never run again.
+
+Run from the database directory:
+    python -m migrations.runner status
+    python -m migrations.runner up --dry-run
+    python -m migrations.runner up --batch-size 500 --max-rate 2000
+"""
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+import argparse
+import importlib
+import os
+import re
+import time
+
+from app_models import models
+from connection import get_database
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATION_PATTERN = re.compile(r'^(\d{4})_\w+\.py$')
+
+
+def discover():
+    """Return migration modules in version order"""
+    names = sorted(
+        name[:-3] for name in os.listdir(MIGRATIONS_DIR)
+        if MIGRATION_PATTERN.match(name)
+    )
+    return [(name, importlib.import_module(f"migrations.{name}")) for name in names]
+
+
+def load(model, doc):
+    try:
+        return model.from_bson(doc)
+    except KeyError as e:
+        raise RuntimeError(f"{model.__name__} {doc['_id']} is missing required field {e}") from None
+
+
+def model_update(doc, item, fields, unset=()):
+    """Update writing the migrated model's `fields` over the stored document, or None if nothing changed"""
+    migrated = item.to_bson()
+    changes = {
+        field: migrated[field] for field in fields
+        if field in migrated and (field not in doc or doc[field] != migrated[field])
+    }
+    removed = {field: '' for field in unset if field in doc}
+    if not changes and not removed:
+        return None
+    update = {'$inc': {'version': 1}}
+    if changes:
+        update['$set'] = changes
+    if removed:
+        update['$unset'] = removed
+    return update
+
+
+def batch_operations(db, migration, docs, now):
+    if hasattr(migration, 'build_operations'):
+        return migration.build_operations(db, docs, now)
+    model = models.MODELS[migration.collection]
+    items = [load(model, doc) for doc in docs]
+    migration.migrate(db, items, now)
+    operations = []
+    for doc, item in zip(docs, items):
+        update = model_update(doc, item, migration.fields, getattr(migration, 'unset', ()))
+        if update:
+            operations.append(UpdateOne({'_id': doc['_id']}, update))
+    return operations
+
+
+def run_migration(db, name, migration, batch_size, pause, max_rate):
+    state = db.schemaMigrations.find_one({'_id': name}) or {}
+    query = migration.query
+    if state.get('lastId') is not None:
+        query = {'$and': [migration.query, {'_id': {'$gt': state['lastId']}}]}
+        print(f"  Resuming after {state['lastId']} ({state.get('processed', 0)} already processed)")
+
+    now = datetime.now(timezone.utc)
+    db.schemaMigrations.update_one(
+        {'_id': name},
+        {
+            '$set': {'description': migration.description, 'status': 'running', 'updatedAt': now},
+            '$setOnInsert': {'startedAt': now, 'processed': 0}
+        },
+        upsert=True
+    )
+
+    processed = state.get('processed', 0)
+    resumed_from = processed
+    started = time.time()
+    cursor = db[migration.collection].find(query).sort('_id', 1).batch_size(batch_size)
+    batch = []
+
+    def flush(batch):
+        operations = batch_operations(db, migration, batch, datetime.now(timezone.utc))
+        if operations:
+            db[migration.collection].bulk_write(operations, ordered=False)
+        # Checkpoint only after the batch is durably written
+        db.schemaMigrations.update_one(
+            {'_id': name},
+            {
+                '$set': {'lastId': batch[-1]['_id'], 'updatedAt': datetime.now(timezone.utc)},
+                '$inc': {'processed': len(batch)}
+            }
+        )
+        return len(batch)
+
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) < batch_size:
+            continue
+        processed += flush(batch)
+        batch = []
+        print(f"  {processed} documents migrated")
+
+        # Throttle to limit impact on live traffic
+        if pause:
+            time.sleep(pause)
+        if max_rate:
+            ahead = (processed - resumed_from) / max_rate - (time.time() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+
+    if batch:
+        processed += flush(batch)
+
+    db.schemaMigrations.update_one(
+        {'_id': name},
+        {
+            '$set': {'status': 'applied', 'appliedAt': datetime.now(timezone.utc), 'updatedAt': datetime.now(timezone.utc)},
+            '$unset': {'lastId': ''}
+        }
+    )
+    return processed
+
+
+def status(db):
+    records = {record['_id']: record for record in db.schemaMigrations.find()}
+    for name, migration in discover():
+        record = records.get(name, {})
+        print(f"{name:<40} {record.get('status', 'pending'):<10} {migration.description}")
+
+
+def up(db, dry_run=False, only=None, batch_size=500, pause=0.0, max_rate=None):
+    applied = {
+        record['_id'] for record in db.schemaMigrations.find({'status': 'applied'}, {'_id': 1})
+    }
+    pending = [(name, m) for name, m in discover() if name not in applied and (not only or name == only)]
+
+    if not pending:
+        print("No pending migrations.")
+        return
+
+    for name, migration in pending:
+        if dry_run:
+            count = db[migration.collection].count_documents(migration.query)
+            print(f"[dry run] {name}: {count} {migration.collection} documents would be migrated")
+            continue
+
+        print(f"Applying {name}: {migration.description}")
+        started = time.time()
+        processed = run_migration(db, name, migration, batch_size, pause, max_rate)
+        print(f"Applied {name}: {processed} documents in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run versioned database migrations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('status', help='Show applied and pending migrations')
+    up_parser = subparsers.add_parser('up', help='Apply pending migrations in order')
+    up_parser.add_argument('--dry-run', action='store_true', help='Only report how many documents each migration would touch')
+    up_parser.add_argument('--only', help='Apply a single migration by name')
+    up_parser.add_argument('--batch-size', type=int, default=500)
+    up_parser.add_argument('--pause-ms', type=int, default=0, help='Sleep between batches')
+    up_parser.add_argument('--max-rate', type=float, help='Maximum documents per second')
+    args = parser.parse_args()
+
+    db = get_database()
+    if args.command == 'status':
+        status(db)
+    else:
+        up(db, args.dry_run, args.only, args.batch_size, args.pause_ms / 1000, args.max_rate)
@@ -0,0 +1,286 @@
+"""
+Generate production-sized synthetic data.
+
+Unlike the sample seeds, which insert a handful of users, this produces
+configurable cardinalities (100k users and tens of millions of sessions by
+default) with skewed per-user activity. Output is deterministic for a given
+--seed and --now: every user is generated from its own RNG, and ObjectIds and
+the password salt are derived from the seed, so the same data comes out
+regardless of --workers. No session starts or ends after --now. Documents
+are built with the API's models (app_models), so they have the same shape
+as the ones the API writes.
+
+Run from the database directory:
+    python -m seeds.generate_synthetic --users 100000 --workers 8
+    python -m seeds.generate_synthetic --users 1000 --days 30 --seed 7 --now 2024-06-01 --clear
+"""
+from bson.objectid import ObjectId
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from werkzeug.security import SALT_CHARS
+import argparse
+import hashlib
+import os
+import random
+import struct
+import time
+
+from app_models import models
+from connection import get_client, get_database, mongo_settings
+
+COLLECTIONS = ['users', 'tags', 'tasks', 'taskTags', 'sessions']
+
+TAG_POOL = [
+    ('Work', '#FF4444'), ('Study', '#4444FF'), ('Personal', '#44FF44'),
+    ('Urgent', '#FF0000'), ('Important', '#FFA500'), ('Meeting', '#800080'),
+    ('Project', '#008080'), ('Research', '#FFD700'), ('Health', '#00AA88'),
+    ('Errands', '#888888'), ('Reading', '#AA00AA'), ('Finance', '#0088FF')
+]
+
+TASK_TEMPLATES = [
+    "Review {} documentation", "Prepare presentation for {}", "Update weekly report for {}",
+    "Schedule meeting with {}", "Debug {} issue", "Write test cases for {}",
+    "Refactor {} code", "Create backup of {}", "Deploy {} to staging", "Read chapter on {}"
+]
+TASK_SUBJECTS = [
+    "Frontend", "Backend", "Database", "API", "Mobile App", "Q4 Goals", "Design",
+    "Authentication", "Dashboard", "Reports", "Login", "Navigation", "Production"
+]
+
+# Set in each worker process by _init_worker
+_worker = {}
+
+
+def object_id(seed, kind, *parts, at=None):
+    """Deterministic ObjectId whose timestamp prefix matches `at`"""
+    digest = hashlib.blake2b(f"{seed}:{kind}:{':'.join(map(str, parts))}".encode(), digest_size=8).digest()
+    timestamp = int(at.timestamp()) if at else 0
+    return ObjectId(struct.pack('>I', timestamp & 0xFFFFFFFF) + digest)
+
+
+def password_hash(password, seed):
+    """
+    Werkzeug scrypt hash with a salt derived from the seed, so reruns store
+    the same hash; check_password_hash reads it like any other.
+    """
+    rng = random.Random(f"{seed}:password")
+    salt = ''.join(rng.choice(SALT_CHARS) for _ in range(16))
+    n, r, p = 2**15, 8, 1
+    digest = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p, maxmem=132 * n * r * p)
+    return f"scrypt:{n}:{r}:{p}${salt}${digest.hex()}"
+
+
+def _init_worker(settings, options):
+    _worker['db'] = get_database(get_client(settings), settings)
+    _worker['options'] = options
+
+
+def generate_user(index, options):
+    """Build every document belonging to one user, keyed by collection"""
+    seed = options['seed']
+    rng = random.Random(seed * 1_000_003 + index)
+    now = options['now']
+
+    # Pareto-distributed activity: most users are light, a few are very heavy
+    activity = min(rng.paretovariate(options['skew']), options['max_activity'])
+    created_at = now - timedelta(days=options['days'] + rng.randint(0, 365))
+
+    user_id = object_id(seed, 'user', index, at=created_at)
+    docs = {name: [] for name in COLLECTIONS}
+    docs['users'].append(models.User(
+        email=f"synthetic{index}@example.com",
+        username=f"synthetic_{index}",
+        password=options['password_hash'],
+        name=f"Synthetic User {index}",
+        created_at=created_at,
+        updated_at=created_at,
+        last_login_at=now - timedelta(minutes=rng.randint(0, options['days'] * 1440)),
+        id=user_id
+    ).to_bson())
+
+    tag_ids = []
+    for n, (name, color) in enumerate(rng.sample(TAG_POOL, min(len(TAG_POOL), options['tags_per_user']))):
+        tag_id = object_id(seed, 'tag', index, n, at=created_at)
+        tag_ids.append(tag_id)
+        docs['tags'].append(models.Tag(
+            user_id, name, color,
+            is_active=rng.random() > 0.05,
+            created_at=created_at,
+            updated_at=created_at,
+            id=tag_id
+        ).to_bson())
+
+    task_ids = []
+    for n in range(int(options['tasks_per_user'] * activity)):
+        task_created = created_at + timedelta(seconds=rng.randint(0, int((now - created_at).total_seconds())))
+        status = rng.choices(['pending', 'active', 'completed'], weights=[0.4, 0.1, 0.5])[0]
+        task_id = object_id(seed, 'task', index, n, at=task_created)
+        task_tag_ids = rng.sample(tag_ids, min(len(tag_ids), rng.randint(0, 3)))
+        task_ids.append(task_id)
+        docs['tasks'].append(models.Task(
+            user_id,
+            title=rng.choice(TASK_TEMPLATES).format(rng.choice(TASK_SUBJECTS)),
+            description=rng.choice(TASK_TEMPLATES).format(rng.choice(TASK_SUBJECTS)),
+            task_type=rng.choices(['todo', 'distraction'], weights=[0.8, 0.2])[0],
+            status=status,
+            tag_ids=sorted(task_tag_ids),
+            is_active=rng.random() > 0.1,
+            created_at=task_created,
+            updated_at=task_created,
+            id=task_id
+        ).to_bson())
+        for tag_id in task_tag_ids:
+            docs['taskTags'].append({
+                'taskId': task_id,
+                'tagId': tag_id,
+                'createdAt': task_created,
+                'version': 1
+            })
+
+    sessions_per_day = options['sessions_per_day'] * activity
+    timer_type_ids = options['timer_type_ids']
+    for days_ago in range(options['days']):
+        day = now - timedelta(days=days_ago)
+        # Roughly a third of days have no sessions at all
+        if rng.random() < 0.3:
+            continue
+        for n in range(max(0, round(rng.gauss(sessions_per_day, sessions_per_day / 3)))):
+            start_time = day.replace(hour=rng.randint(6, 22), minute=rng.randint(0, 59), second=rng.randint(0, 59))
+            work_duration = rng.choice([25, 25, 25, 50, 90])
+            status = rng.choices(['completed', 'paused', 'active'], weights=[0.9, 0.05, 0.05])[0]
+            end_time = start_time + timedelta(minutes=work_duration)
+            # Today's later hours have not happened yet
+            if end_time > now:
+                continue
+            completed = status == 'completed'
+            docs['sessions'].append(models.Session(
+                user_id,
+                timer_type_id=rng.choice(timer_type_ids),
+                task_id=rng.choice(task_ids) if task_ids and rng.random() < 0.6 else None,
+                status=status,
+                start_time=start_time,
+                end_time=end_time if completed else None,
+                work_duration=work_duration,
+                break_duration=work_duration // 5,
+                active_seconds=work_duration * 60 if completed else 0,
+                segment_start=start_time if status == 'active' else None,
+                paused_at=start_time if status == 'paused' else None,
+                created_at=start_time,
+                updated_at=start_time,
+                id=object_id(seed, 'session', index, days_ago, n, at=start_time)
+            ).to_bson())
+
+    return docs
+
+
+def generate_range(user_range):
+    """Worker entry point: generate and insert a contiguous range of users"""
+    db = _worker['db']
+    options = _worker['options']
+    batch_size = options['batch_size']
+    buffers = {name: [] for name in COLLECTIONS}
+    counts = dict.fromkeys(COLLECTIONS, 0)
+
+    def flush(name):
+        if buffers[name]:
+            db[name].insert_many(buffers[name], ordered=False)
+            counts[name] += len(buffers[name])
+            buffers[name] = []
+
+    for index in range(*user_range):
+        for name, docs in generate_user(index, options).items():
+            buffers[name].extend(docs)
+            if len(buffers[name]) >= batch_size:
+                flush(name)
+
+    for name in COLLECTIONS:
+        flush(name)
+    return counts
+
+
+def generate(users, workers, chunk_users, clear, now, **options):
+    settings = mongo_settings()
+    db = get_database(settings=settings)
+
+    if clear:
+        for name in COLLECTIONS:
+            db[name].delete_many({})
+            print(f"Cleared collection: {name}")
+
+    timer_type_ids = [t['_id'] for t in db.timerTypes.find({}, {'_id': 1}).sort('_id', 1)]
+    if not timer_type_ids:
+        timer_type_ids = [db.timerTypes.insert_one(models.TimerType(
+            'Pomodoro',
+            description='Standard 25/5 minute work/break cycle',
+            work_duration=25,
+            break_duration=5,
+            created_at=now,
+            updated_at=now,
+            id=object_id(options['seed'], 'timerType', 0, at=now)
+        ).to_bson()).inserted_id]
+
+    options['now'] = now
+    options['timer_type_ids'] = timer_type_ids
+    # Hashing is deliberately slow, so every synthetic user shares one hash
+    options['password_hash'] = password_hash('synthetic123', options['seed'])
+
+    ranges = [(start, min(users, start + chunk_users)) for start in range(0, users, chunk_users)]
+    totals = dict.fromkeys(COLLECTIONS, 0)
+    started = time.time()
+
+    print(f"Generating {users} users with {workers} workers (seed={options['seed']}, now={now.isoformat()})")
+    with Pool(workers, initializer=_init_worker, initargs=(settings, options)) as pool:
+        for done, counts in enumerate(pool.imap_unordered(generate_range, ranges), start=1):
+            for name, count in counts.items():
+                totals[name] += count
+            elapsed = time.time() - started
+            inserted = sum(totals.values())
+            print(f"[{done}/{len(ranges)}] {inserted:,} docs in {elapsed:.1f}s "
+                  f"({inserted / elapsed:,.0f} docs/sec)")
+
+    elapsed = time.time() - started
+    print("\n=== Synthetic Data Generation Completed ===")
+    for name in COLLECTIONS:
+        print(f"{name}: {totals[name]:,}")
+    print(f"Total: {sum(totals.values()):,} docs in {elapsed:.1f}s "
+          f"({sum(totals.values()) / elapsed:,.0f} docs/sec)")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate production-sized synthetic data')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--days', type=int, default=90, help='Days of session history per user')
+    parser.add_argument('--sessions-per-day', type=float, default=3.5, help='Mean sessions per active day for a typical user')
+    parser.add_argument('--tasks-per-user', type=float, default=40, help='Mean tasks for a typical user')
+    parser.add_argument('--tags-per-user', type=int, default=6)
+    parser.add_argument('--skew', type=float, default=2.0, help='Pareto shape of per-user activity; lower is more skewed')
+    parser.add_argument('--max-activity', type=float, default=50.0, help='Cap on the activity multiplier of the heaviest users')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--now', type=datetime.fromisoformat,
+                        help='Generate data as of this UTC time (default: midnight today); pass it to reproduce a run')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--batch-size', type=int, default=5000, help='Documents per insert_many call')
+    parser.add_argument('--chunk-users', type=int, default=500, help='Users handed to a worker at a time')
+    parser.add_argument('--clear', action='store_true', help='Clear generated collections first')
+    args = parser.parse_args()
+
+    now = args.now or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+
+    generate(
+        users=args.users,
+        workers=args.workers,
+        chunk_users=args.chunk_users,
+        clear=args.clear,
+        now=now,
+        seed=args.seed,
+        days=args.days,
+        sessions_per_day=args.sessions_per_day,
+        tasks_per_user=args.tasks_per_user,
+        tags_per_user=args.tags_per_user,
+        skew=args.skew,
+        max_activity=args.max_activity,
+        batch_size=args.batch_size
+    )
@@ -4,6 +4,8 @@ import os
 from dotenv import load_dotenv
 import random
 
+from app_models import models
+
 def create_sample_sessions():
     load_dotenv()
     
@@ -40,22 +42,23 @@ def create_sample_sessions():
                     minute=random.randint(0, 59)
                 )
                 
-                session = {
-                    "userId": user['_id'],
-                    "timerTypeId": random.choice(timer_types)['_id'],
-                    "startTime": start_time,
-                    "workDuration": 25,  # Standard Pomodoro duration
-                    "breakDuration": 5,
-                    "status": status,
-                    "isActive": True,
-                    "createdAt": datetime.now(timezone.utc),
-                    "updatedAt": datetime.now(timezone.utc),
-                    "version": 1
-                }
-                
-                # Add endTime for completed sessions
-                if status == 'completed':
-                    session["endTime"] = start_time + timedelta(minutes=25)
+                # Completed sessions ran for their full work period
+                completed = status == 'completed'
+                session = models.Session(
+                    user_id=user['_id'],
+                    timer_type_id=random.choice(timer_types)['_id'],
+                    status=status,
+                    start_time=start_time,
+                    end_time=start_time + timedelta(minutes=25) if completed else None,
+                    work_duration=25,  # Standard Pomodoro duration
+                    break_duration=5,
+                    active_seconds=25 * 60 if completed else 0,
+                    # Running sessions track their current segment, like a real start
+                    segment_start=start_time if status == 'active' else None,
+                    paused_at=start_time if status == 'paused' else None,
+                    created_at=datetime.now(timezone.utc),
+                    updated_at=datetime.now(timezone.utc)
+                ).to_bson()
                 
                 sample_sessions.append(session)
     
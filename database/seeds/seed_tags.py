@@ -1,8 +1,10 @@
 from pymongo import MongoClient
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
 
+from app_models import models
+
 def create_sample_tags():
     load_dotenv()
     
@@ -14,90 +16,45 @@ def create_sample_tags():
     client = MongoClient(f"mongodb://{MONGO_HOST}:{MONGO_PORT}")
     db = client[MONGO_DB]
     
+    # Tags belong to a user, so every sample user gets the full set
+    users = list(db.users.find({"userType": "user"}))
+    
+    if not users:
+        raise Exception("Please ensure users exist before creating tags")
+    
     # Sample tags data with color codes
     sample_tags = [
-        {
-            "name": "Work",
-            "color": "#FF4444",  # Red
-            "isActive": True,
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "version": 1
-        },
-        {
-            "name": "Study",
-            "color": "#4444FF",  # Blue
-            "isActive": True,
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "version": 1
-        },
-        {
-            "name": "Personal",
-            "color": "#44FF44",  # Green
-            "isActive": True,
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "version": 1
-        },
-        {
-            "name": "Urgent",
-            "color": "#FF0000",  # Bright Red
-            "isActive": True,
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "version": 1
-        },
-        {
-            "name": "Important",
-            "color": "#FFA500",  # Orange
-            "isActive": True,
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "version": 1
-        },
-        {
-            "name": "Meeting",
-            "color": "#800080",  # Purple
-            "isActive": True,
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "version": 1
-        },
-        {
-            "name": "Project",
-            "color": "#008080",  # Teal
-            "isActive": True,
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "version": 1
-        },
-        {
-            "name": "Research",
-            "color": "#FFD700",  # Gold
-            "isActive": True,
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "version": 1
-        }
+        ("Work", "#FF4444"),  # Red
+        ("Study", "#4444FF"),  # Blue
+        ("Personal", "#44FF44"),  # Green
+        ("Urgent", "#FF0000"),  # Bright Red
+        ("Important", "#FFA500"),  # Orange
+        ("Meeting", "#800080"),  # Purple
+        ("Project", "#008080"),  # Teal
+        ("Research", "#FFD700")  # Gold
     ]
     
     try:
         # Insert tags if they don't exist
-        for tag in sample_tags:
-            db.tags.update_one(
-                {"name": tag["name"]},
-                {"$setOnInsert": tag},
-                upsert=True
-            )
+        now = datetime.now(timezone.utc)
+        for user in users:
+            for name, color in sample_tags:
+                tag = models.Tag(user['_id'], name, color, created_at=now, updated_at=now)
+                db.tags.update_one(
+                    {"userId": user['_id'], "name": name},
+                    {"$setOnInsert": tag.to_bson()},
+                    upsert=True
+                )
         
         # Count and print the number of tags
         tag_count = db.tags.count_documents({})
         print(f"Sample tags created successfully! Total tags: {tag_count}")
         
-        # Return tag IDs for use in task tags
-        return {tag["name"]: db.tags.find_one({"name": tag["name"]})["_id"] 
-                for tag in sample_tags}
+        # Return each user's tag IDs for use in task tags
+        return {
+            user['_id']: {tag['name']: tag['_id'] for tag in db.tags.find({"userId": user['_id']})}
+            for user in users
+        }
         
     except Exception as e:
         print(f"Error creating sample tags: {str(e)}")
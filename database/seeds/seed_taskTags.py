@@ -1,9 +1,11 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
 import random
-import re
+
+import app_models  # noqa: F401 - puts backend/src on sys.path
+from autotag import RuleMatcher
 
 def create_sample_task_tags():
     load_dotenv()
@@ -23,8 +25,10 @@ def create_sample_task_tags():
     if not tasks or not tags:
         raise Exception("Please ensure tasks and tags exist before creating task-tag relationships")
     
-    # Create a dictionary of tag names to their IDs for easy lookup
-    tag_dict = {tag['name']: tag['_id'] for tag in tags}
+    # Tags belong to a user: user ID -> tag name -> tag ID
+    tag_dict = {}
+    for tag in tags:
+        tag_dict.setdefault(tag.get('userId'), {})[tag['name']] = tag['_id']
     
     # Rules for automatic tag assignment
     tag_rules = {
@@ -37,6 +41,12 @@ def create_sample_task_tags():
         r'Frontend|Backend|API': ['Project', 'Work'],
     }
     
+    # The API's matcher: all rules combined, and overlapping ones all apply
+    matcher = RuleMatcher([
+        {'pattern': pattern, 'isRegex': True, 'tagIds': tag_names}
+        for pattern, tag_names in tag_rules.items()
+    ])
+    
     # Add specific rules based on task type
     task_type_tags = {
         'todo': ['Work', 'Study'],
@@ -49,11 +59,9 @@ def create_sample_task_tags():
     for task in tasks:
         task_tags = set()  # Use set to avoid duplicate tags for the same task
         
-        # Apply tag rules based on task description
-        description = task['description'].lower()
-        for pattern, tag_names in tag_rules.items():
-            if re.search(pattern, description, re.IGNORECASE):
-                task_tags.update(tag_names)
+        # Apply tag rules based on task title and description
+        text = f"{task.get('title', '')}\n{task.get('description', '')}"
+        task_tags.update(matcher.match(text))
         
         # Add tags based on task type
         if 'taskType' in task:
@@ -66,11 +74,13 @@ def create_sample_task_tags():
         if not task_tags:
             task_tags.add(random.choice(['Work', 'Personal', 'Project']))
         
-        # Create task-tag relationships
+        # Create task-tag relationships with the task owner's tags
+        user_tags = tag_dict.get(task['userId'], {})
+        task_tags = {name for name in task_tags if name in user_tags}
         for tag_name in task_tags:
             task_tag = {
                 "taskId": task['_id'],
-                "tagId": tag_dict[tag_name],
+                "tagId": user_tags[tag_name],
                 "createdAt": datetime.now(timezone.utc),
                 "version": 1
             }
@@ -84,15 +94,25 @@ def create_sample_task_tags():
             result = db.taskTags.insert_many(sample_task_tags)
             print(f"Created {len(result.inserted_ids)} task-tag relationships")
             
+            # Mirror the relationships on each task's denormalized tagIds array
+            task_tag_ids = {}
+            for task_tag in sample_task_tags:
+                task_tag_ids.setdefault(task_tag['taskId'], []).append(task_tag['tagId'])
+            db.tasks.bulk_write([
+                UpdateOne({'_id': task_id}, {'$set': {'tagIds': sorted(tag_ids)}})
+                for task_id, tag_ids in task_tag_ids.items()
+            ])
+            
             # Print statistics
             print("\nTask-Tag Statistics:")
             print(f"Average tags per task: {sum(task_tag_count.values()) / len(task_tag_count):.1f}")
             print(f"Total task-tag relationships: {len(sample_task_tags)}")
             
             # Print tag usage statistics
+            tag_names = {tag['_id']: tag['name'] for tag in tags}
             tag_usage = {}
             for task_tag in sample_task_tags:
-                tag_name = next(tag['name'] for tag in tags if tag['_id'] == task_tag['tagId'])
+                tag_name = tag_names[task_tag['tagId']]
                 tag_usage[tag_name] = tag_usage.get(tag_name, 0) + 1
             
             print("\nTag Usage:")
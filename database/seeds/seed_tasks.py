@@ -4,6 +4,8 @@ import os
 from dotenv import load_dotenv
 import random
 
+from app_models import models
+
 def create_sample_tasks():
     load_dotenv()
     
@@ -58,7 +60,7 @@ def create_sample_tasks():
             template = random.choice(task_templates)
             
             # Replace template variables
-            description = template.format(
+            title = template.format(
                 project=random.choice(projects),
                 topic=random.choice(topics),
                 team=random.choice(teams),
@@ -71,21 +73,15 @@ def create_sample_tasks():
             # Decide if this is a todo or distraction (80% todo, 20% distraction)
             task_type = random.choices(task_types, weights=[0.8, 0.2])[0]
             
-            task = {
-                "userId": user['_id'],
-                "description": description,
-                "isCompleted": random.choice([True, False, False, False]),  # 25% completion rate
-                "taskType": task_type, 
-                "status": random.choice(['pending', 'active', 'completed']),
-                "isActive": True,
-                "createdAt": datetime.now(timezone.utc),
-                "updatedAt": datetime.now(timezone.utc),
-                "version": 1
-            }
-            
-            # Ensure completed tasks have isCompleted=True
-            if task["status"] == "completed":
-                task["isCompleted"] = True
+            # Completion is tracked by status alone, as the API does
+            task = models.Task(
+                user_id=user['_id'],
+                title=title,
+                task_type=task_type,
+                status=random.choice(['pending', 'active', 'completed']),
+                created_at=datetime.now(timezone.utc),
+                updated_at=datetime.now(timezone.utc)
+            ).to_bson()
             
             sample_tasks.append(task)
     
@@ -101,7 +97,7 @@ def create_sample_tasks():
                 total_tasks = db.tasks.count_documents({"userId": user['_id']})
                 completed_tasks = db.tasks.count_documents({
                     "userId": user['_id'],
-                    "isCompleted": True
+                    "status": "completed"
                 })
                 todo_tasks = db.tasks.count_documents({
                     "userId": user['_id'],
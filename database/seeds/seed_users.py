@@ -4,6 +4,8 @@ import os
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash, check_password_hash
 
+from app_models import models
+
 def create_sample_users():
     load_dotenv()
     
@@ -15,41 +17,23 @@ def create_sample_users():
     client = MongoClient(f"mongodb://{MONGO_HOST}:{MONGO_PORT}")
     db = client[MONGO_DB]
     
-    # Sample users data
+    # Sample users data, built with the API's model so the documents match
+    # what registration stores
+    now = datetime.now(timezone.utc)
     sample_users = [
-        {
-            "username": "admin_user",
-            "password": generate_password_hash("admin123"),
-            "userType": "admin",
-            "isActive": True,
-            "email": "admin@example.com",
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "lastLoginAt": None,
-            "version": 1
-        },
-        {
-            "username": "test_user1",
-            "password": generate_password_hash("test123"),
-            "userType": "user",
-            "isActive": True,
-            "email": "user1@example.com",
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "lastLoginAt": None,
-            "version": 1
-        },
-        {
-            "username": "test_user2",
-            "password": generate_password_hash("test456"),
-            "userType": "user",
-            "isActive": True,
-            "email": "user2@example.com",
-            "createdAt": datetime.now(timezone.utc),
-            "updatedAt": datetime.now(timezone.utc),
-            "lastLoginAt": None,
-            "version": 1
-        }
+        models.User(
+            email=email,
+            username=username,
+            password=generate_password_hash(password),
+            user_type=user_type,
+            created_at=now,
+            updated_at=now
+        ).to_bson()
+        for username, email, password, user_type in [
+            ("admin_user", "admin@example.com", "admin123", "admin"),
+            ("test_user1", "user1@example.com", "test123", "user"),
+            ("test_user2", "user2@example.com", "test456", "user")
+        ]
     ]
     
     try: